@@ -1,4 +1,13 @@
-from .span_to_tag import span_to_tag, tokenize, io_to_scheme
+from .label_vocabulary import LabelVocabulary
+from .spacy_registry import SpacyModelRegistry, spacy_registry
+from .tokenization_cache import TokenizationCache, set_tokenization_cache
+from .span_to_tag import (
+    span_to_tag,
+    span_to_tag_batch,
+    tokenize,
+    io_to_scheme,
+    TagRuns,
+)
 from .data_objects import Span, InputSample
 from .validation import (
     split_dataset,
@@ -15,8 +24,15 @@ load_dotenv()  # take environment variables from .env.
 
 __all__ = [
     "span_to_tag",
+    "span_to_tag_batch",
     "tokenize",
     "io_to_scheme",
+    "TagRuns",
+    "LabelVocabulary",
+    "SpacyModelRegistry",
+    "spacy_registry",
+    "TokenizationCache",
+    "set_tokenization_cache",
     "Span",
     "InputSample",
     "split_dataset",
@@ -11,6 +11,11 @@ from spacy.training import iob_to_biluo
 from tqdm import tqdm
 
 from presidio_evaluator import span_to_tag, tokenize
+from presidio_evaluator.span_to_tag import (
+    annotate_tokens,
+    get_spacy,
+    tokenize_batch,
+)
 
 SPACY_PRESIDIO_ENTITIES = dict(
     ORG="ORGANIZATION",
@@ -215,7 +220,8 @@ class InputSample(object):
         :param full_text: The raw text of this sample
         :param masked: Masked/Templated version of the raw text
         :param spans: List of spans for entities
-        :param create_tags_from_span: True if tags (tokens+tags) should be added
+        :param create_tags_from_span: True if tags (tokens+tags) should be added.
+        If tokens are provided, they are used instead of tokenizing full_text
         :param scheme: IO, BIO or BILUO. Only applicable if span_to_tag=True
         :param tokens: spaCy Doc object
         :param tags: list of strings representing the label for each token,
@@ -246,7 +252,9 @@ class InputSample(object):
         self.start_indices = start_indices if start_indices else []
 
         if create_tags_from_span:
-            tokens, tags, start_indices = self.get_tags(scheme, token_model_version)
+            tokens, tags, start_indices = self.get_tags(
+                scheme, token_model_version, tokens=tokens if tokens else None
+            )
             self.tokens = tokens
             self.tags = tags
             self.start_indices = start_indices
@@ -273,18 +281,23 @@ class InputSample(object):
         return cls(**data, create_tags_from_span=True, **kwargs)
 
     def get_tags(
-        self, scheme: str = "IOB", model_version: str = "en_core_web_sm"
+        self,
+        scheme: str = "IOB",
+        model_version: str = "en_core_web_sm",
+        tokens: Optional[Doc] = None,
     ) -> Tuple[Doc, List[str], List[int]]:
         """Extract the tokens, tags, and start_indices from the spans.
 
         :param scheme: IO, BIO or BILUO
         :param model_version: The name of the spaCy model to use for tokenization
+        :param tokens: Optional spaCy Doc of full_text, to avoid tokenizing it again
         :return: tokens, tags, start_indices
         """
         start_positions = [span.start_position for span in self.spans]
         end_positions = [span.end_position for span in self.spans]
         tags = [span.entity_type for span in self.spans]
-        tokens = tokenize(self.full_text, model_version)
+        if tokens is None:
+            tokens = tokenize(self.full_text, model_version)
 
         labels = span_to_tag(
             scheme=scheme,
@@ -313,7 +326,13 @@ class InputSample(object):
         conll = []
 
         if len(self.tokens) == 0:
-            self.tokens, self.tags = self.get_tags(model_version=tokenizer)
+            self.tokens, self.tags, self.start_indices = self.get_tags(
+                model_version=tokenizer
+            )
+
+        # Tokens are created by the tokenizer only, add POS tags when needed
+        if isinstance(self.tokens, Doc):
+            self.tokens = annotate_tokens(self.tokens, model_version=tokenizer)
 
         for i, token in enumerate(self.tokens):
             if translate_tags:
@@ -457,7 +476,7 @@ class InputSample(object):
             dataset.sort(key=template_sort)
 
         if not spacy_pipeline:
-            spacy_pipeline = spacy.load("en_core_web_sm")
+            spacy_pipeline = get_spacy("en_core_web_sm")
 
         spacy_dataset = [
             sample.to_spacy(entities=entities, translate_tags=translate_tags)
@@ -594,6 +613,8 @@ class InputSample(object):
         )
 
     def to_flair(self):
+        if isinstance(self.tokens, Doc):
+            self.tokens = annotate_tokens(self.tokens)
         for i, token in enumerate(self.tokens):
             return f"{token} {token.pos_} {self.tags[i]}"
 
@@ -627,12 +648,18 @@ class InputSample(object):
 
     @staticmethod
     def read_dataset_json(
-        filepath: Union[Path, str] = None, length: Optional[int] = None, **kwargs
+        filepath: Union[Path, str] = None,
+        length: Optional[int] = None,
+        batch_size: int = 1000,
+        n_process: int = 1,
+        **kwargs,
     ) -> List["InputSample"]:
         """
         Reads an existing dataset, stored in json into a list of InputSample objects
         :param filepath: Path to json file
         :param length: Number of records to return (would return 0-length)
+        :param batch_size: Number of texts to tokenize per batch (see spaCy's nlp.pipe)
+        :param n_process: Number of processes to tokenize with (see spaCy's nlp.pipe)
         :return: List[InputSample]
         """
         with open(filepath, "r", encoding="utf-8") as f:
@@ -641,9 +668,17 @@ class InputSample(object):
         if length:
             dataset = dataset[:length]
 
+        docs = tokenize_batch(
+            (row["full_text"] for row in dataset),
+            model_version=kwargs.get("token_model_version", "en_core_web_sm"),
+            batch_size=batch_size,
+            n_process=n_process,
+        )
         input_samples = [
-            InputSample.from_json(row, **kwargs)
-            for row in tqdm(dataset, desc="tokenizing input")
+            InputSample.from_json(row, tokens=doc, **kwargs)
+            for row, doc in tqdm(
+                zip(dataset, docs), total=len(dataset), desc="tokenizing input"
+            )
         ]
 
         return input_samples
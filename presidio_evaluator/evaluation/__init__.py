@@ -1,13 +1,14 @@
 from .model_error import ModelError, ErrorType
-from .evaluation_result import EvaluationResult
+from .evaluation_result import EvaluationResult, ConfusionMatrix
 from .base_evaluator import BaseEvaluator
 from .plotter import Plotter
 from .token_evaluator import TokenEvaluator, Evaluator
 from .span_evaluator import SpanEvaluator
-from .skipwords import get_skip_words
+from .skipwords import get_skip_words, SkipWordIndex
 
 __all__ = [
     "EvaluationResult",
+    "ConfusionMatrix",
     "BaseEvaluator",
     "ErrorType",
     "ModelError",
@@ -15,5 +16,6 @@ __all__ = [
     "SpanEvaluator",
     "TokenEvaluator",
     "Evaluator",
-    "get_skip_words"
+    "get_skip_words",
+    "SkipWordIndex",
 ]
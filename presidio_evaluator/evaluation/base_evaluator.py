@@ -1,14 +1,20 @@
+import copy
+import os
+import random
 from abc import ABC, abstractmethod
 from collections import Counter
-from typing import List, Optional, Dict, Union, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Dict, Union, Tuple
 
 import numpy as np
 import pandas as pd
 from presidio_analyzer import AnalyzerEngine
 
-from presidio_evaluator import InputSample
+from presidio_evaluator import InputSample, LabelVocabulary
 from presidio_evaluator.evaluation import EvaluationResult, ModelError, ErrorType
-from presidio_evaluator.evaluation.skipwords import get_skip_words
+from presidio_evaluator.evaluation.skipwords import get_skip_words, SkipWordIndex
+from presidio_evaluator.label_vocabulary import split_tag
 from presidio_evaluator.models import BaseModel, PresidioAnalyzerWrapper
 
 GENERIC_ENTITIES = ("PII", "ID", "PII", "PHI", "ID_NUM", "NUMBER", "NUM", "GENERIC_PII")
@@ -58,6 +64,8 @@ class BaseEvaluator(ABC):
         )
 
         self.skip_words = skip_words if skip_words else get_skip_words()
+        self.skip_word_index = SkipWordIndex(self.skip_words)
+        self.vocabulary = LabelVocabulary()
 
     def compare(
         self, input_sample: InputSample, prediction: List[str]
@@ -70,7 +78,6 @@ class BaseEvaluator(ABC):
 
         """
         annotation = input_sample.tags
-        tokens = input_sample.tokens
 
         if len(annotation) != len(prediction):
             print(
@@ -79,118 +86,124 @@ class BaseEvaluator(ABC):
             )
             return Counter(), []
 
-        results = Counter()
-        mistakes = []
-
-        new_annotation = annotation.copy()
+        annotation_labels = self.vocabulary.encode(annotation)
+        prediction_labels = self.vocabulary.encode(prediction)
 
         if self.compare_by_io:
-            new_annotation = self._to_io(new_annotation)
-            prediction = self._to_io(prediction)
+            annotation_labels = self.vocabulary.to_io(annotation_labels)
+            prediction_labels = self.vocabulary.to_io(prediction_labels)
 
         # Ignore annotations that aren't in the list of
         # requested entities.
         if self.entities_to_keep:
-            prediction = self._adjust_per_entities(prediction)
-            new_annotation = self._adjust_per_entities(new_annotation)
-
-        for i in range(0, len(new_annotation)):
-            cur_token = tokens[i]
-            cur_prediction = prediction[i]
-            cur_annotation = new_annotation[i]
-            results[(cur_annotation, cur_prediction)] += 1
-
-            if self.verbose:
-                print("Annotation:", cur_annotation)
-                print("Prediction:", cur_prediction)
-                print(results)
-
-            # check if there was an error
-            is_error = cur_annotation != cur_prediction
-
-            if is_error:
-                reverted = self.__revert_known_errors(
-                    cur_annotation, cur_prediction, cur_token, results
+            prediction_labels = self._adjust_per_entities(prediction_labels)
+            annotation_labels = self._adjust_per_entities(annotation_labels)
+
+        return self.compare_labels(
+            annotation_labels=annotation_labels,
+            prediction_labels=prediction_labels,
+            input_sample=input_sample,
+        )
+
+    def compare_labels(
+        self,
+        annotation_labels: np.ndarray,
+        prediction_labels: np.ndarray,
+        input_sample: InputSample,
+    ) -> Tuple[Counter, List[ModelError]]:
+        """
+        Compares integer-encoded annotation and prediction labels
+        (see self.vocabulary) of one sample.
+        Tokens are counted in a confusion matrix. Mismatches on skip words,
+        or where one side is a generic entity, are corrected and
+        not reported as errors.
+        :param annotation_labels: Array of annotated labels, one per token
+        :param prediction_labels: Array of predicted labels, one per token
+        :param input_sample: The sample the labels belong to
+        :return: Counter of (annotation, prediction) pairs and a list of ModelErrors
+        """
+        tokens = input_sample.tokens
+        outside = LabelVocabulary.OUTSIDE
+        generic_labels = self.vocabulary.encode(self.generic_entities)
+        n_labels = self.vocabulary.n_labels
+
+        mismatches = np.flatnonzero(annotation_labels != prediction_labels)
+        mismatch_annotations = annotation_labels[mismatches]
+        mismatch_predictions = prediction_labels[mismatches]
+
+        is_skip_word = self.skip_word_index.mask(tokens[i] for i in mismatches)
+        generic_prediction = np.isin(mismatch_predictions, generic_labels) & (
+            mismatch_annotations != outside
+        )
+        generic_annotation = (
+            np.isin(mismatch_annotations, generic_labels)
+            & (mismatch_predictions != outside)
+            & ~generic_prediction
+        )
+
+        # Each token counts once, corrections remove the mismatch
+        # and count the generic entity as the specific one
+        pair_codes = annotation_labels * n_labels + prediction_labels
+        counts = np.bincount(pair_codes, minlength=n_labels * n_labels)
+        removed = (
+            is_skip_word.astype(np.int64) + generic_prediction + generic_annotation
+        )
+        counts -= np.bincount(
+            pair_codes[mismatches], weights=removed, minlength=n_labels * n_labels
+        ).astype(np.int64)
+        counts += np.bincount(
+            mismatch_annotations[generic_prediction] * (n_labels + 1),
+            minlength=n_labels * n_labels,
+        )
+        counts += np.bincount(
+            mismatch_predictions[generic_annotation] * (n_labels + 1),
+            minlength=n_labels * n_labels,
+        )
+
+        results = Counter()
+        codes = np.flatnonzero(counts)
+        annotations = self.vocabulary.decode(codes // n_labels)
+        predictions = self.vocabulary.decode(codes % n_labels)
+        for annotation, prediction, count in zip(
+            annotations, predictions, counts[codes].tolist()
+        ):
+            results[(annotation, prediction)] = count
+
+        if self.verbose:
+            print(results)
+
+        mistakes = []
+        reverted = is_skip_word | generic_prediction | generic_annotation
+        error_indices = mismatches[~reverted]
+        error_annotations = self.vocabulary.decode(annotation_labels[error_indices])
+        error_predictions = self.vocabulary.decode(prediction_labels[error_indices])
+        for i, cur_annotation, cur_prediction in zip(
+            error_indices.tolist(), error_annotations, error_predictions
+        ):
+            if cur_prediction == "O":
+                error_type = ErrorType.FN
+            elif cur_annotation == "O":
+                error_type = ErrorType.FP
+            else:
+                error_type = ErrorType.WrongEntity
+            mistakes.append(
+                ModelError(
+                    error_type=error_type,
+                    annotation=cur_annotation,
+                    prediction=cur_prediction,
+                    token=tokens[i],
+                    full_text=input_sample.full_text,
+                    metadata=input_sample.metadata,
                 )
-                if reverted:
-                    # This isn't really an error, continue.
-                    continue
-
-                if prediction[i] == "O":
-                    mistakes.append(
-                        ModelError(
-                            error_type=ErrorType.FN,
-                            annotation=cur_annotation,
-                            prediction=cur_prediction,
-                            token=cur_token,
-                            full_text=input_sample.full_text,
-                            metadata=input_sample.metadata,
-                        )
-                    )
-                elif new_annotation[i] == "O":
-                    mistakes.append(
-                        ModelError(
-                            error_type=ErrorType.FP,
-                            annotation=cur_annotation,
-                            prediction=cur_prediction,
-                            token=cur_token,
-                            full_text=input_sample.full_text,
-                            metadata=input_sample.metadata,
-                        )
-                    )
-                else:
-                    mistakes.append(
-                        ModelError(
-                            error_type=ErrorType.WrongEntity,
-                            annotation=cur_annotation,
-                            prediction=cur_prediction,
-                            token=cur_token,
-                            full_text=input_sample.full_text,
-                            metadata=input_sample.metadata,
-                        )
-                    )
+            )
 
         return results, mistakes
 
-    def __revert_known_errors(
-        self,
-        current_annotation: str,
-        current_prediction: str,
-        current_token: str,
-        results: Counter[Tuple[str, str]],
-    ) -> bool:
-        reverted = False
-
-        if str(current_token).lower().strip() in self.skip_words:
-            # Ignore cases where the token is a skip word
-            results[(current_annotation, current_prediction)] -= 1
-            reverted = True
-
-        if current_prediction in self.generic_entities and current_annotation != "O":
-            # Ignore cases where the prediction is generic
-            results[(current_annotation, current_prediction)] -= 1
-            # Add a result which assumes the generic equals the specific
-            results[(current_annotation, current_annotation)] += 1
-            reverted = True
-
-        elif current_annotation in self.generic_entities and current_prediction != "O":
-            # Ignore cases where the prediction is generic
-            results[(current_annotation, current_prediction)] -= 1
-            # Add a result which assumes the generic equals the specific
-            results[(current_prediction, current_prediction)] += 1
-            reverted = True
-
-        # Remove temporary keys which should not be counted
-        if results[(current_annotation, current_prediction)] == 0:
-            del results[(current_annotation, current_prediction)]
-
-        return reverted
-
-    def _adjust_per_entities(self, tags: List[str]) -> List[str]:
-        if self.entities_to_keep:
-            return [tag if tag in self.entities_to_keep else "O" for tag in tags]
-        else:
-            return tags
+    def _adjust_per_entities(self, labels: np.ndarray) -> np.ndarray:
+        # Tags are kept only if they are one of entities_to_keep as is,
+        # so prefixed tags are only kept when comparing by IO
+        keep = np.isin(labels, self.vocabulary.encode(self.entities_to_keep))
+        return np.where(keep, labels, LabelVocabulary.OUTSIDE)
 
     @staticmethod
     def _to_io(tags: List[str]) -> List[str]:
@@ -201,7 +214,7 @@ class BaseEvaluator(ABC):
         :param tags: the input tags in BILUO/IOB/BIO format
         :return: a new list of IO tags
         """
-        return [tag[2:] if "-" in tag else tag for tag in tags]
+        return [split_tag(tag)[1] for tag in tags]
 
     def evaluate_sample(
         self, sample: InputSample, prediction: List[str]
@@ -240,6 +253,238 @@ class BaseEvaluator(ABC):
         predictions = self.model.batch_predict(dataset, **kwargs)
         print("Finished running model on dataset")
 
+        evaluation_results.extend(self._evaluate_predictions(dataset, predictions))
+
+        return evaluation_results
+
+    def evaluate_iter(
+        self, dataset: Iterable[InputSample], chunk_size: int = 1000, **kwargs
+    ) -> Iterator[EvaluationResult]:
+        """Evaluate a dataset lazily, yielding one EvaluationResult per sample.
+
+        The model predicts chunk_size samples at a time, and each chunk is
+        compared before the next one is predicted, so only one chunk of
+        predictions is held in memory.
+
+        :param dataset: An iterable of InputSample samples, containing the ground truth tags
+        :param chunk_size: Number of samples to pass to the model's batch_predict at once
+        :param kwargs: Additional arguments for the model's predict method
+        """
+        samples = iter(dataset)
+        while True:
+            chunk = list(islice(samples, chunk_size))
+            if not chunk:
+                return
+            predictions = self.model.batch_predict(chunk, **kwargs)
+            yield from self._evaluate_predictions(chunk, predictions)
+
+    def evaluate_stream(
+        self,
+        dataset: Iterable[InputSample],
+        chunk_size: int = 1000,
+        beta: float = 2.0,
+        keep_errors: bool = True,
+        n_samples_to_keep: int = 0,
+        seed: int = 42,
+        **kwargs,
+    ) -> Tuple[EvaluationResult, List[EvaluationResult]]:
+        """Evaluate and score a dataset in bounded memory.
+
+        Samples are evaluated with evaluate_iter and folded into a running
+        aggregate of counts, which is scored once the dataset is exhausted.
+        Per-sample results are dropped after being counted,
+        except for a uniform random sample of n_samples_to_keep of them.
+
+        :param dataset: An iterable of InputSample samples, containing the ground truth tags
+        :param chunk_size: Number of samples to pass to the model's batch_predict at once
+        :param beta: The beta parameter for F-beta score calculation
+        :param keep_errors: Whether to keep the model errors in the aggregate result
+        :param n_samples_to_keep: Number of per-sample results to keep (reservoir sampling)
+        :param seed: Seed for the sampling of per-sample results
+        :param kwargs: Additional arguments for the model's predict method
+        :return: The scored EvaluationResult (as returned by calculate_score),
+        and the sampled per-sample results
+        """
+        aggregate = EvaluationResult()
+        kept_samples = []
+        rng = random.Random(seed)
+
+        evaluation_results = self.evaluate_iter(
+            dataset, chunk_size=chunk_size, **kwargs
+        )
+        for i, evaluation_result in enumerate(evaluation_results):
+            aggregate += self._count_sample(evaluation_result)
+            if not keep_errors:
+                aggregate.model_errors = []
+
+            if i < n_samples_to_keep:
+                kept_samples.append(evaluation_result)
+            elif n_samples_to_keep:
+                j = rng.randint(0, i)
+                if j < n_samples_to_keep:
+                    kept_samples[j] = evaluation_result
+
+        return self._score_counts(aggregate, beta=beta), kept_samples
+
+    def calculate_score_for_score_thresholds(
+        self,
+        dataset: List[InputSample],
+        score_thresholds: Iterable[float],
+        beta: float = 2.0,
+        **kwargs,
+    ) -> Dict[float, EvaluationResult]:
+        """Score a Presidio Analyzer for several score thresholds with one analyzer run.
+
+        The analyzer runs once with a score threshold of 0, and the predictions
+        for each threshold are derived by filtering its results by score.
+
+        :param dataset: A list of InputSample samples, containing the ground truth tags
+        :param score_thresholds: The analyzer score thresholds to score with
+        :param beta: The beta parameter for F-beta score calculation
+        :param kwargs: Additional arguments for the analyzer's analyze method
+        :return: A dictionary of {score_threshold: EvaluationResult}
+        """
+        if not isinstance(self.model, PresidioAnalyzerWrapper):
+            raise ValueError(
+                "Score threshold sweeps are only supported for PresidioAnalyzerWrapper"
+            )
+
+        print(f"Running model {self.model.__class__.__name__} on dataset...")
+        analyzer_results = self.model.analyze_dataset(dataset, **kwargs)
+        print("Finished running model on dataset")
+
+        scores = {}
+        for score_threshold in score_thresholds:
+            predictions = self.model.results_to_tags(
+                dataset=dataset,
+                analyzer_results=analyzer_results,
+                score_threshold=score_threshold,
+            )
+            evaluation_results = list(self._evaluate_predictions(dataset, predictions))
+            scores[score_threshold] = self.calculate_score(
+                evaluation_results, beta=beta
+            )
+        return scores
+
+    def calculate_score_per_recognizer(
+        self,
+        dataset: List[InputSample],
+        beta: float = 2.0,
+        n_jobs: int = 1,
+        **kwargs,
+    ) -> Tuple[
+        EvaluationResult,
+        Dict[str, EvaluationResult],
+        Dict[str, EvaluationResult],
+        Dict[str, str],
+    ]:
+        """Attribute a Presidio Analyzer's performance to its recognizers.
+
+        The NLP engine processes each sample, and each recognizer analyzes it,
+        only once. The scores of each recognizer alone, and of the analyzer without
+        each recognizer (leave-one-out), are then calculated from these results,
+        combining the results of each subset of recognizers like the analyzer does
+        (context enhancement, score threshold, removal of duplicates and allow list).
+        Each subset's score approximates the score of an analyzer configured
+        with these recognizers only:
+        the combination replays AnalyzerEngine's protected
+        ``_enhance_using_context`` and ``_remove_allow_list`` steps,
+        so it may diverge from future presidio-analyzer versions,
+        and when no ``score_threshold`` is set, the engine's
+        ``default_score_threshold`` is applied instead of
+        any per-recognizer thresholds.
+        Recognizers are identified by their id, as several recognizers
+        may share a name (e.g. ad-hoc PatternRecognizers).
+
+        :param dataset: A list of InputSample samples, containing the ground truth tags
+        :param beta: The beta parameter for F-beta score calculation
+        :param n_jobs: Number of processes to derive the tags and scores with (-1 for all CPUs)
+        :param kwargs: Additional arguments for the analyzer's analyze method
+        :return: The score of the analyzer, the score of each recognizer alone,
+        the score of the analyzer without each recognizer,
+        and the name of each recognizer, all keyed by recognizer id
+        """
+        if not isinstance(self.model, PresidioAnalyzerWrapper):
+            raise ValueError(
+                "Recognizer attribution is only supported for PresidioAnalyzerWrapper"
+            )
+
+        recognizers = self.model.get_recognizers(**kwargs)
+        subsets = [((), True)]
+        subsets += [((recognizer.id,), False) for recognizer in recognizers]
+        subsets += [((recognizer.id,), True) for recognizer in recognizers]
+
+        print(f"Running model {self.model.__class__.__name__} on dataset...")
+        subset_results = self.model.analyze_recognizer_subsets(
+            dataset, subsets, **kwargs
+        )
+        print("Finished running model on dataset")
+
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs == 1:
+            state = (self, dataset, beta)
+            scores = [_score_subset(state, results) for results in subset_results]
+        else:
+            # The analyzer is not needed for scoring, and might not be picklable
+            subset_evaluator = copy.copy(self)
+            subset_evaluator.model = copy.copy(self.model)
+            subset_evaluator.model.analyzer_engine = None
+            with ProcessPoolExecutor(
+                max_workers=n_jobs,
+                initializer=_init_recognizer_subset_worker,
+                initargs=(subset_evaluator, dataset, beta),
+            ) as executor:
+                scores = list(executor.map(_score_recognizer_subset, subset_results))
+
+        ids = [recognizer.id for recognizer in recognizers]
+        n_recognizers = len(recognizers)
+        recognizer_scores = dict(zip(ids, scores[1 : n_recognizers + 1]))
+        ablation_scores = dict(zip(ids, scores[n_recognizers + 1 :]))
+        recognizer_names = {rec.id: rec.name for rec in recognizers}
+        return scores[0], recognizer_scores, ablation_scores, recognizer_names
+
+    @staticmethod
+    def scores_to_curve(
+        scores: Dict[float, EvaluationResult], beta: float = 2.0
+    ) -> pd.DataFrame:
+        """Return the precision, recall and F-beta of each entity per threshold.
+
+        :param scores: A dictionary of {threshold: EvaluationResult}, as returned by
+        calculate_score_for_score_thresholds or SpanEvaluator.calculate_score_for_thresholds
+        :param beta: The beta parameter for per-entity F-beta score calculation
+        :return: A pandas DataFrame with the columns threshold, entity, precision,
+        recall and f_beta. The "PII" entity holds the scores over all entities
+        """
+        rows = []
+        for threshold, result in scores.items():
+            for entity, precision in result.entity_precision_dict.items():
+                recall = result.entity_recall_dict[entity]
+                rows.append(
+                    {
+                        "threshold": threshold,
+                        "entity": entity,
+                        "precision": precision,
+                        "recall": recall,
+                        "f_beta": BaseEvaluator.f_beta(precision, recall, beta),
+                    }
+                )
+            rows.append(
+                {
+                    "threshold": threshold,
+                    "entity": "PII",
+                    "precision": result.pii_precision,
+                    "recall": result.pii_recall,
+                    "f_beta": result.pii_f,
+                }
+            )
+        return pd.DataFrame(
+            rows, columns=["threshold", "entity", "precision", "recall", "f_beta"]
+        )
+
+    def _evaluate_predictions(
+        self, dataset: Iterable[InputSample], predictions: Iterable[List[str]]
+    ) -> Iterator[EvaluationResult]:
         for prediction, sample in zip(predictions, dataset):
             # Remove entities not requested (in model.entities_to_keep))
             prediction = self.model.filter_tags_in_supported_entities(prediction)
@@ -247,12 +492,20 @@ class BaseEvaluator(ABC):
             # Switch to requested labeling scheme (IO/BIO/BILUO)
             prediction = self.model.to_scheme(prediction)
 
-            evaluation_result = self.evaluate_sample(
-                sample=sample, prediction=prediction
-            )
-            evaluation_results.append(evaluation_result)
+            yield self.evaluate_sample(sample=sample, prediction=prediction)
 
-        return evaluation_results
+    def _count_sample(self, evaluation_result: EvaluationResult) -> EvaluationResult:
+        """
+        Return the counts of one sample's evaluation result, to be merged
+        into a running aggregate (see evaluate_stream).
+        """
+        return evaluation_result
+
+    def _score_counts(
+        self, evaluation_result: EvaluationResult, beta: float
+    ) -> EvaluationResult:
+        """Calculate the scores of an aggregate of counts (see evaluate_stream)."""
+        return self.calculate_score([evaluation_result], beta=beta)
 
     @staticmethod
     def align_entity_types(
@@ -456,3 +709,31 @@ class BaseEvaluator(ABC):
             return np.nan
 
         return ((1 + beta**2) * precision * recall) / (((beta**2) * precision) + recall)
+
+
+_SubsetState = Tuple[BaseEvaluator, List[InputSample], float]
+_recognizer_subset_state: Optional[_SubsetState] = None
+
+
+def _init_recognizer_subset_worker(
+    evaluator: BaseEvaluator, dataset: List[InputSample], beta: float
+) -> None:
+    global _recognizer_subset_state
+    _recognizer_subset_state = (evaluator, dataset, beta)
+
+
+def _score_recognizer_subset(analyzer_results: List[list]) -> EvaluationResult:
+    return _score_subset(_recognizer_subset_state, analyzer_results)
+
+
+def _score_subset(
+    state: _SubsetState,
+    analyzer_results: List[list],
+) -> EvaluationResult:
+    """Score the analyzer's results of a subset of recognizers."""
+    evaluator, dataset, beta = state
+    predictions = evaluator.model.results_to_tags(
+        dataset=dataset, analyzer_results=analyzer_results
+    )
+    evaluation_results = list(evaluator._evaluate_predictions(dataset, predictions))
+    return evaluator.calculate_score(evaluation_results, beta=beta)
@@ -1,8 +1,9 @@
 import json
 from collections import Counter, defaultdict
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Tuple
+from typing import Iterable, List, Optional, Dict, Tuple
 
+import numpy as np
 import pandas as pd
 
 from presidio_evaluator.evaluation import ModelError
@@ -31,6 +32,78 @@ class PIIEvaluationMetrics:
     false_positives: int = 0
     false_negatives: int = 0
 
+
+class ConfusionMatrix:
+    """Dense confusion matrix over an entity index.
+
+    :param entities: The entities (or tags) indexing the rows and columns
+    :param counts: Square array, where counts[i, j] is the number of times
+    entities[i] was annotated and entities[j] was predicted
+    """
+
+    def __init__(self, entities: List[str], counts: np.ndarray):
+        self.entities = list(entities)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self._index = {entity: i for i, entity in enumerate(self.entities)}
+
+    @classmethod
+    def from_counter(cls, results: Counter) -> "ConfusionMatrix":
+        """Create a confusion matrix from a Counter of {(actual, predicted): count}."""
+        entities = list(dict.fromkeys(entity for pair in results for entity in pair))
+        index = {entity: i for i, entity in enumerate(entities)}
+        counts = np.zeros((len(entities), len(entities)), dtype=np.int64)
+        if results:
+            rows = np.fromiter((index[actual] for actual, _ in results), dtype=np.int64)
+            columns = np.fromiter(
+                (index[predicted] for _, predicted in results), dtype=np.int64
+            )
+            np.add.at(
+                counts,
+                (rows, columns),
+                np.fromiter(results.values(), dtype=np.int64),
+            )
+        return cls(entities, counts)
+
+    def to_counter(self) -> Counter:
+        """Return the non-zero counts as a Counter of {(actual, predicted): count}."""
+        rows, columns = np.nonzero(self.counts)
+        return Counter(
+            {
+                (self.entities[i], self.entities[j]): int(self.counts[i, j])
+                for i, j in zip(rows, columns)
+            }
+        )
+
+    def annotated(self) -> Dict[str, int]:
+        """Number of annotations per entity (row sums)."""
+        return dict(zip(self.entities, self.counts.sum(axis=1).tolist()))
+
+    def predicted(self) -> Dict[str, int]:
+        """Number of predictions per entity (column sums)."""
+        return dict(zip(self.entities, self.counts.sum(axis=0).tolist()))
+
+    def reindex(self, entities: Iterable[str]) -> np.ndarray:
+        """
+        Return the counts for the given entities, in the given order.
+        Entities missing from the index have zero counts.
+        """
+        n_entities = len(self.entities)
+        # Missing entities point to an extra row and column of zeros
+        positions = np.array(
+            [self._index.get(entity, n_entities) for entity in entities],
+            dtype=np.int64,
+        )
+        padded = np.zeros((n_entities + 1, n_entities + 1), dtype=np.int64)
+        padded[:n_entities, :n_entities] = self.counts
+        return padded[np.ix_(positions, positions)]
+
+    def __getitem__(self, pair: Tuple[str, str]) -> int:
+        actual, predicted = pair
+        if actual not in self._index or predicted not in self._index:
+            return 0
+        return int(self.counts[self._index[actual], self._index[predicted]])
+
+
 @dataclass
 class EvaluationResult:
     def __init__(
@@ -54,7 +127,8 @@ class EvaluationResult:
         tokens: Optional[List[str]] = None,
         actual_tags: Optional[List[str]] = None,
         predicted_tags: Optional[List[str]] = None,
-        start_indices: List[int] = None
+        start_indices: List[int] = None,
+        confusion_matrix: Optional[ConfusionMatrix] = None,
     ):
         """
         Holds the output of a comparison between ground truth and predicted
@@ -80,6 +154,8 @@ class EvaluationResult:
         :param actual_tags: List of actual tags
         :param predicted_tags: List of predicted tags
         :param start_indices: List of start indices of tokens in the text
+        :param confusion_matrix: Dense version of results. If None,
+        it is created from results when accessed
         """
 
         self.results = results if results else Counter()
@@ -135,6 +211,102 @@ class EvaluationResult:
         self.actual_tags = actual_tags
         self.predicted_tags = predicted_tags
         self.start_indices = start_indices if start_indices is not None else []
+        self._confusion_matrix = confusion_matrix
+
+    @property
+    def confusion_matrix(self) -> ConfusionMatrix:
+        """
+        The confusion matrix as a dense array over an entity index.
+        results is the Counter view of the same counts.
+        """
+        if self._confusion_matrix is None:
+            return ConfusionMatrix.from_counter(self.results)
+        return self._confusion_matrix
+
+    @confusion_matrix.setter
+    def confusion_matrix(self, value: Optional[ConfusionMatrix]) -> None:
+        self._confusion_matrix = value
+
+    def merge(self, other: "EvaluationResult") -> "EvaluationResult":
+        """
+        Combine two evaluation results into a new one.
+
+        Counts are added: the confusion matrix (results), the per_type counts,
+        the pii_* counts and n. Model errors are concatenated.
+        Merging is associative, with EvaluationResult() as the identity,
+        so results of independently scored shards can be combined in any grouping.
+        Metrics (precision, recall, F) are not merged: they are reset,
+        and should be computed from the merged counts by the evaluator
+        (e.g. SpanEvaluator._create_evaluation_result).
+        Sample-level fields (text, tokens and tags) are not kept.
+
+        :param other: The EvaluationResult to merge with this one
+        :return: A new EvaluationResult
+        """
+        merged = EvaluationResult()
+        merged += self
+        merged += other
+        return merged
+
+    def __add__(self, other: "EvaluationResult") -> "EvaluationResult":
+        return self.merge(other)
+
+    def __iadd__(self, other: "EvaluationResult") -> "EvaluationResult":
+        """Merge other into this result, in place (see merge)."""
+        # update() keeps zero and negative counts, unlike Counter's +
+        self.results.update(other.results)
+        self._confusion_matrix = None
+
+        if other.model_errors is not None:
+            if self.model_errors is None:
+                self.model_errors = []
+            self.model_errors.extend(other.model_errors)
+
+        for entity, other_metrics in other.per_type.items():
+            if entity not in self.per_type:
+                self.per_type[entity] = PIIEvaluationMetrics()
+            metrics = self.per_type[entity]
+            metrics.num_predicted += other_metrics.num_predicted
+            metrics.num_annotated += other_metrics.num_annotated
+            metrics.true_positives += other_metrics.true_positives
+            metrics.false_positives += other_metrics.false_positives
+            metrics.false_negatives += other_metrics.false_negatives
+
+        for counter in (
+            "pii_predicted",
+            "pii_annotated",
+            "pii_true_positives",
+            "pii_false_positives",
+            "pii_false_negatives",
+        ):
+            setattr(
+                self,
+                counter,
+                (getattr(self, counter) or 0) + (getattr(other, counter) or 0),
+            )
+        if other.n is not None:
+            self.n = (self.n or 0) + other.n
+
+        self._reset_metrics()
+        return self
+
+    def _reset_metrics(self) -> None:
+        self.pii_recall = None
+        self.pii_precision = None
+        self.pii_f = None
+        self._entity_recall_dict = {}
+        self._entity_precision_dict = {}
+        self._n_dict = {}
+        for metrics in self.per_type.values():
+            metrics.precision = 0.0
+            metrics.recall = 0.0
+            metrics.f_beta = 0.0
+
+        self.text = None
+        self.tokens = None
+        self.actual_tags = None
+        self.predicted_tags = None
+        self.start_indices = []
 
     @property
     def entity_precision_dict(self) -> Dict[str, float]:
@@ -245,23 +417,25 @@ class EvaluationResult:
             metrics_dict.update(self.n_dict)
         return metrics_dict
 
-    def to_confusion_matrix(self) -> Tuple[List[str], List[List[int]]]:
+    def _confusion_entities(self) -> List[str]:
         entities = list(self.n_dict.keys())
         if "O" in entities:
             entities = [ent for ent in entities if ent != "O"]
         entities = sorted(entities)
         entities.append("O")
-        confusion_matrix = [[0] * len(entities) for _ in range(len(entities))]
-        for i, actual in enumerate(entities):
-            for j, predicted in enumerate(entities):
-                confusion_matrix[i][j] = self.results[(actual, predicted)]
+        return entities
+
+    def to_confusion_matrix(self) -> Tuple[List[str], List[List[int]]]:
+        entities = self._confusion_entities()
+        confusion_matrix = self.confusion_matrix.reindex(entities)
 
-        return entities, confusion_matrix
+        return entities, confusion_matrix.tolist()
 
     def to_confusion_df(self) -> pd.DataFrame:
-        entities, confmatrix = self.to_confusion_matrix()
+        entities = self._confusion_entities()
+        confmatrix = self.confusion_matrix.reindex(entities)
 
-        conf_df = pd.DataFrame(confmatrix, columns=entities).set_axis(entities)
+        conf_df = pd.DataFrame(confmatrix, index=entities, columns=entities)
 
         precision_df = pd.DataFrame(self.entity_precision_dict, index=["precision"])
         recall_series = pd.Series(self.entity_recall_dict)
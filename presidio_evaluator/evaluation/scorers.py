@@ -12,6 +12,7 @@ from presidio_evaluator.models import (
     PresidioAnalyzerWrapper,
     BaseModel,
 )
+from presidio_evaluator.spacy_registry import spacy_registry
 
 
 def score_model(
@@ -80,9 +81,12 @@ def score_presidio_recognizer(
     labeling_scheme: str = "BILUO",
     with_nlp_artifacts: bool = False,
     verbose: bool = False,
+    spacy_model_name: str = "en_core_web_lg",
 ) -> EvaluationResult:
     """
     Run data through one EntityRecognizer and gather results and stats
+    :param spacy_model_name: spaCy model used by the NLP engine,
+    taken from the shared spaCy model registry
     """
 
     if not input_samples:
@@ -99,16 +103,23 @@ def score_presidio_recognizer(
         input_samples, entities_mapping=PresidioAnalyzerWrapper.presidio_entities_map
     )
 
-    model = PresidioRecognizerWrapper(
-        recognizer=recognizer,
-        entities_to_keep=entities_to_keep,
-        labeling_scheme=labeling_scheme,
-        nlp_engine=SpacyNlpEngine(),
-        with_nlp_artifacts=with_nlp_artifacts,
-    )
-    return score_model(
-        model=model,
-        entities_to_keep=entities_to_keep,
-        input_samples=updated_samples,
-        verbose=verbose,
+    nlp_engine = SpacyNlpEngine(
+        models=[{"lang_code": "en", "model_name": spacy_model_name}]
     )
+    nlp_engine.nlp = {"en": spacy_registry.acquire(spacy_model_name)}
+    try:
+        model = PresidioRecognizerWrapper(
+            recognizer=recognizer,
+            entities_to_keep=entities_to_keep,
+            labeling_scheme=labeling_scheme,
+            nlp_engine=nlp_engine,
+            with_nlp_artifacts=with_nlp_artifacts,
+        )
+        return score_model(
+            model=model,
+            entities_to_keep=entities_to_keep,
+            input_samples=updated_samples,
+            verbose=verbose,
+        )
+    finally:
+        spacy_registry.release(spacy_model_name)
@@ -1,5 +1,8 @@
-from typing import List
 import string
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
 
 from spacy.lang.en.stop_words import STOP_WORDS
 
@@ -85,3 +88,48 @@ def get_skip_words() -> List[str]:
     skip_words.extend(STOP_WORDS)
 
     return list(set(skip_words))
+
+
+class SkipWordIndex:
+    """
+    Set of skip words with a memoized token normalization.
+
+    Tokens are normalized (lowercased and stripped) once, and the normalized
+    form and its skip word membership are stored per distinct token,
+    so repeated tokens across a dataset are looked up in O(1).
+
+    :param skip_words: Words to skip, as returned by get_skip_words()
+    """
+
+    def __init__(self, skip_words: Iterable[str]):
+        self.skip_words = frozenset(skip_words)
+        # token -> (normalized token, is skip word)
+        self._table: Dict[str, Tuple[str, bool]] = {}
+
+    def _lookup(self, token: str) -> Tuple[str, bool]:
+        entry = self._table.get(token)
+        if entry is None:
+            normalized = sys.intern(token.lower().strip())
+            entry = (normalized, normalized in self.skip_words)
+            self._table[token] = entry
+        return entry
+
+    def normalize(self, token: str) -> str:
+        """Return the lowercased and stripped form of a token."""
+        return self._lookup(str(token))[0]
+
+    def __contains__(self, token: str) -> bool:
+        return self._lookup(str(token))[1]
+
+    def __len__(self) -> int:
+        return len(self.skip_words)
+
+    def mask(self, tokens: Iterable[str]) -> np.ndarray:
+        """
+        Return a boolean array, True for each token which is a skip word.
+        :param tokens: Token strings (or spaCy Tokens)
+        """
+        lookup = self._lookup
+        return np.fromiter(
+            (lookup(str(token))[1] for token in tokens), dtype=bool
+        )
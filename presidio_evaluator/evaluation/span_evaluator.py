@@ -1,9 +1,19 @@
-from typing import List, Optional, Union, Set, Tuple
+import copy
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union, Set, Tuple
+
+import numpy as np
 import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 from presidio_analyzer import AnalyzerEngine
 
 from presidio_evaluator.evaluation import BaseEvaluator, ModelError, ErrorType
+from presidio_evaluator import InputSample, tokenize
 from presidio_evaluator.data_objects import Span
 from presidio_evaluator.evaluation.evaluation_result import (
     EvaluationResult,
@@ -16,6 +26,8 @@ class SpanEvaluator(BaseEvaluator):
     Evaluates PII detection using span-based fuzzy matching with character-level Intersection over Union (IoU).
     """
 
+    SHARDS_PER_JOB = 4
+
     def __init__(
         self,
         model: Union[BaseModel, AnalyzerEngine],
@@ -26,6 +38,7 @@ class SpanEvaluator(BaseEvaluator):
         skip_words: Optional[List] = None,
         iou_threshold: float = 0.9,
         char_based: bool = True,
+        matching: str = "greedy",
     ):
         """
         Initialize the SpanEvaluator for evaluating pii entities detection results.
@@ -37,6 +50,10 @@ class SpanEvaluator(BaseEvaluator):
                          If None, uses skip words from skipwords.py (default: None).
                          Pass an empty list ([]) to disable skip word removal entirely.
         :param char_based: If True, calculate IoU at the character-level, else, calculate iou at the token-level.
+        :param matching: How predictions are matched to annotations.
+        "greedy" matches each annotation, in order, to the unmatched prediction
+        with the highest IoU. "optimal" finds the assignment maximizing the total
+        IoU of the matches above iou_threshold (Hungarian algorithm).
         """
         super().__init__(
             model=model,
@@ -47,8 +64,12 @@ class SpanEvaluator(BaseEvaluator):
             skip_words=skip_words,
         )
 
+        if matching not in ("greedy", "optimal"):
+            raise ValueError("matching should be either 'greedy' or 'optimal'")
+
         self.iou_threshold = iou_threshold
         self.char_based = char_based
+        self.matching = matching
 
     def _normalize_tokens(
         self, tokens: List[str], start_indices: Optional[List[int]] = None
@@ -68,12 +89,12 @@ class SpanEvaluator(BaseEvaluator):
             start_indices = [None] * len(tokens)  # placeholder
         normalized = []
         normalized_indices = []
+        skip_word_index = self.skip_word_index
         for token, start in zip(tokens, start_indices):
-            token = token.lower()
             # Skip if token is in skip words list
-            if token in self.skip_words:
+            if token in skip_word_index:
                 continue
-            normalized.append(token)
+            normalized.append(skip_word_index.normalize(token))
             normalized_indices.append(start)
 
         if not start_indices:
@@ -81,68 +102,87 @@ class SpanEvaluator(BaseEvaluator):
 
         return normalized, normalized_indices
 
-    def _merge_adjacent_spans(self, spans: List[Span], df: pd.DataFrame) -> List[Span]:
+    def _merge_adjacent_spans(
+        self,
+        spans: List[Span],
+        tokens: List[str],
+        non_skip_counts: Optional[np.ndarray] = None,
+    ) -> List[Span]:
         """
         Merge adjacent spans of the same entity type if separated only by skip words / punctuation.
 
         :param spans: List of Span objects to potentially merge
-        :param df: DataFrame containing the tokens and their positions
+        :param tokens: The sentence's tokens, which the spans' token positions refer to
+        :param non_skip_counts: Prefix counts of non skip word tokens
+        (see _count_non_skip_tokens). Computed from tokens if not provided.
         :return: List of merged Span objects
         """
         if not spans:
             return []
+        if non_skip_counts is None:
+            non_skip_counts = self._count_non_skip_tokens(tokens)
+
         spans = sorted(spans, key=lambda x: x.start_position)
-        merged = []
-        current = spans[0]
 
+        # Group runs of adjacent spans in one pass, then create one span per group
+        groups = [[spans[0]]]
         for next_span in spans[1:]:
+            current = groups[-1][-1]
             if (
                 current.entity_type == next_span.entity_type
-                and self._are_spans_adjacent(current, next_span, df)
+                and self._are_spans_adjacent(current, next_span, non_skip_counts)
             ):
-                merged_tokens = [current.entity_value, next_span.entity_value]
-                merged_normalized_text = (
-                        current.normalized_tokens + next_span.normalized_tokens
-                )
-                current = Span(
-                    entity_type=current.entity_type,
-                    entity_value=" ".join(merged_tokens),
-                    start_position=current.start_position,
-                    end_position=next_span.end_position,
-                    normalized_start_index=min(
-                        current.normalized_start_index, next_span.normalized_start_index
-                    ),
-                    normalized_end_index=max(
-                        current.normalized_end_index, next_span.normalized_end_index
-                    ),
-                    normalized_tokens=merged_normalized_text,
-                    token_start=current.token_start,
-                    token_end=next_span.token_end,
-                )
+                groups[-1].append(next_span)
             else:
-                merged.append(current)
-                current = next_span
+                groups.append([next_span])
+
+        return [self.__merge_spans(group) for group in groups]
+
+    @staticmethod
+    def __merge_spans(group: List[Span]) -> Span:
+        if len(group) == 1:
+            return group[0]
+        first, last = group[0], group[-1]
+        return Span(
+            entity_type=first.entity_type,
+            entity_value=" ".join(span.entity_value for span in group),
+            start_position=first.start_position,
+            end_position=last.end_position,
+            normalized_start_index=min(span.normalized_start_index for span in group),
+            normalized_end_index=max(span.normalized_end_index for span in group),
+            normalized_tokens=[
+                token for span in group for token in span.normalized_tokens
+            ],
+            token_start=first.token_start,
+            token_end=last.token_end,
+        )
 
-        merged.append(current)
-        return merged
+    def _count_non_skip_tokens(self, tokens: List[str]) -> np.ndarray:
+        """
+        Prefix counts of tokens which are not skip words:
+        element i is the number of non skip word tokens in tokens[:i].
 
-    def _are_spans_adjacent(self, span1: Span, span2: Span, df: pd.DataFrame) -> bool:
+        :param tokens: The sentence's tokens
+        """
+        is_skip_word = self.skip_word_index.mask(tokens)
+        return np.concatenate(([0], np.cumsum(~is_skip_word)))
+
+    @staticmethod
+    def _are_spans_adjacent(
+        span1: Span, span2: Span, non_skip_counts: np.ndarray
+    ) -> bool:
         """
         Check if two spans are adjacent, i.e., separated only by skipwords / punctuation or whitespace tokens.
 
         :param span1: First Span object
         :param span2: Second Span object
-        :param df: DataFrame containing the tokens
+        :param non_skip_counts: Prefix counts of non skip word tokens in the sentence
+        (see _count_non_skip_tokens)
         :return: True if spans are adjacent, False otherwise
         """
-        # Slice tokens between span1 and span2 using the row indices
-        between_tokens = df.loc[
-            span1.token_end : span2.token_start - 1, "token"
-        ].tolist()
-        non_skip_tokens = [
-            tok for tok in between_tokens if tok.lower().strip() not in self.skip_words
-        ]
-        return len(non_skip_tokens) == 0
+        if span2.token_start <= span1.token_end:
+            return True
+        return non_skip_counts[span2.token_start] == non_skip_counts[span1.token_end]
 
     @staticmethod
     def calculate_iou(
@@ -179,17 +219,165 @@ class SpanEvaluator(BaseEvaluator):
 
         return iou
 
+    def calculate_overlaps(
+        self, annotation_spans: List[Span], prediction_spans: List[Span]
+    ) -> "SpanOverlaps":
+        """
+        Find the prediction spans with a positive IoU with each annotation span,
+        ignoring entity types, and their IoU. Values are identical to calculate_iou.
+        Only overlapping pairs are compared and stored, using a sorted interval index
+        of the predictions, so time and memory grow with the number of overlaps
+        rather than with annotations x predictions.
+
+        :param annotation_spans: List of annotation Span objects
+        :param prediction_spans: List of prediction Span objects
+        """
+        return _PredictionIndex(prediction_spans, self.char_based).overlaps(
+            annotation_spans
+        )
+
+    def _match_spans(
+        self,
+        annotation_spans: List[Span],
+        prediction_spans: List[Span],
+        overlaps: Optional["SpanOverlaps"] = None,
+        iou_threshold: Optional[float] = None,
+    ) -> List[Tuple[Optional[Span], float, bool]]:
+        """
+        Match annotation spans to the prediction spans overlapping them.
+
+        :param annotation_spans: List of annotation Span objects
+        :param prediction_spans: List of prediction Span objects
+        :param overlaps: The spans' overlaps, if already calculated
+        (see calculate_overlaps)
+        :param iou_threshold: IoU threshold to match with. Default is self.iou_threshold
+        :return: For each annotation, its best prediction (None if no prediction
+        overlaps), their IoU and whether they are matched
+        """
+        if not prediction_spans:
+            return [(None, 0.0, False) for _ in annotation_spans]
+
+        if iou_threshold is None:
+            iou_threshold = self.iou_threshold
+        if overlaps is None:
+            overlaps = self.calculate_overlaps(annotation_spans, prediction_spans)
+
+        if self.matching == "optimal":
+            assignment = self._optimal_assignment(
+                overlaps, len(annotation_spans), len(prediction_spans), iou_threshold
+            )
+            matches = []
+            for i in range(len(annotation_spans)):
+                predictions, ious = overlaps.of(i)
+                if i in assignment:
+                    j, iou = assignment[i]
+                    matches.append((prediction_spans[j], iou, True))
+                elif len(predictions):
+                    best = int(np.argmax(ious))  # first best prediction
+                    matches.append(
+                        (prediction_spans[predictions[best]], float(ious[best]), False)
+                    )
+                else:
+                    matches.append((None, 0.0, False))
+            return matches
+
+        # Greedy: predictions with the same type and position can only match once
+        keys = {}
+        key_ids = np.array(
+            [
+                keys.setdefault(
+                    (span.entity_type, span.start_position, span.end_position),
+                    len(keys),
+                )
+                for span in prediction_spans
+            ]
+        )
+        matched_keys = np.zeros(len(keys), dtype=bool)
+        matches = []
+        for i in range(len(annotation_spans)):
+            predictions, ious = overlaps.of(i)
+            available_iou = np.where(matched_keys[key_ids[predictions]], 0.0, ious)
+            best = int(np.argmax(available_iou)) if len(predictions) else 0
+            if len(predictions) and available_iou[best] > 0:
+                j = int(predictions[best])  # first best prediction
+                best_iou = float(available_iou[best])
+                is_match = best_iou >= iou_threshold
+                if is_match:
+                    matched_keys[key_ids[j]] = True
+                matches.append((prediction_spans[j], best_iou, is_match))
+            else:
+                matches.append((None, 0.0, False))
+        return matches
+
+    @staticmethod
+    def _optimal_assignment(
+        overlaps: "SpanOverlaps",
+        n_annotations: int,
+        n_predictions: int,
+        iou_threshold: float,
+    ) -> Dict[int, Tuple[int, float]]:
+        """
+        Find the assignment of predictions to annotations maximizing the total IoU
+        of the matches above iou_threshold. Pairs below the threshold don't
+        contribute, so the matching graph is split into its connected clusters,
+        and each cluster is assigned separately on its own small IoU matrix.
+
+        :return: The assigned prediction of each matched annotation, and their IoU
+        """
+        rows = np.repeat(np.arange(n_annotations), np.diff(overlaps.offsets))
+        eligible = overlaps.ious >= iou_threshold
+        rows = rows[eligible]
+        columns = overlaps.predictions[eligible]
+        ious = overlaps.ious[eligible]
+        if not len(rows):
+            return {}
+
+        # Annotations are nodes 0..A-1, predictions are nodes A..A+P-1
+        n_nodes = n_annotations + n_predictions
+        graph = coo_matrix(
+            (np.ones(len(rows)), (rows, n_annotations + columns)),
+            shape=(n_nodes, n_nodes),
+        )
+        _, labels = connected_components(graph, directed=False)
+        pair_labels = labels[rows]
+        order = np.argsort(pair_labels, kind="stable")
+        boundaries = np.flatnonzero(np.diff(pair_labels[order])) + 1
+
+        assignment = {}
+        for cluster in np.split(order, boundaries):
+            annotations, local_rows = np.unique(rows[cluster], return_inverse=True)
+            predictions, local_columns = np.unique(
+                columns[cluster], return_inverse=True
+            )
+            weights = np.zeros((len(annotations), len(predictions)))
+            weights[local_rows, local_columns] = ious[cluster]
+            assigned_rows, assigned_columns = linear_sum_assignment(
+                weights, maximize=True
+            )
+            for row, column in zip(assigned_rows, assigned_columns):
+                if weights[row, column] > 0:
+                    assignment[int(annotations[row])] = (
+                        int(predictions[column]),
+                        float(weights[row, column]),
+                    )
+        return assignment
+
     def _process_sentence_spans(
-        self, sentence_df: pd.DataFrame
+        self,
+        tokens: List[str],
+        annotations: List[str],
+        predictions: List[str],
+        start_indices: List[int],
     ) -> Tuple[List[Span], List[Span]]:
-        annotation_spans = self._create_spans(df=sentence_df, column="annotation")
-        prediction_spans = self._create_spans(df=sentence_df, column="prediction")
+        annotation_spans = self._create_spans(tokens, annotations, start_indices)
+        prediction_spans = self._create_spans(tokens, predictions, start_indices)
 
+        non_skip_counts = self._count_non_skip_tokens(tokens)
         annotation_spans = self._merge_adjacent_spans(
-            spans=annotation_spans, df=sentence_df
+            spans=annotation_spans, tokens=tokens, non_skip_counts=non_skip_counts
         )
         prediction_spans = self._merge_adjacent_spans(
-            spans=prediction_spans, df=sentence_df
+            spans=prediction_spans, tokens=tokens, non_skip_counts=non_skip_counts
         )
 
         return annotation_spans, prediction_spans
@@ -233,71 +421,6 @@ class SpanEvaluator(BaseEvaluator):
 
         return evaluation_result
 
-    @staticmethod
-    def _check_if_matched_already(
-        pred_span: Span, ann_span: Span, matched_preds: set
-    ) -> bool:
-        """
-        Check if a prediction span is valid for matching with an annotation span.
-
-        A prediction is valid if:
-        1. It hasn't already been matched to another annotation
-        2. Its entity type matches the annotation's entity type
-
-        Args:
-            pred_span: The prediction Span to check
-            ann_span: The annotation Span being matched against
-            matched_preds: Set of already matched prediction spans
-
-        Returns:
-            bool: True if the prediction is valid for matching, False otherwise
-        """
-        # Create unique key for the prediction span
-        pred_span_key = (
-            pred_span.entity_type,
-            pred_span.start_position,
-            pred_span.end_position,
-        )
-
-        # Check if prediction is already matched
-        if pred_span_key in matched_preds:
-            return False
-
-        return True
-
-    def _find_best_match(
-        self,
-        ann_span: Span,
-        prediction_spans: List[Span],
-        matched_preds: Set[Tuple[str, int, int]],
-    ) -> Tuple[Optional[Span], float]:
-        """
-        Find the best matching prediction span for a given annotation span.
-
-        :param ann_span: The annotation Span to match against
-        :param prediction_spans: List of prediction Span objects
-        :param matched_preds: Set of already matched prediction spans to avoid duplicates
-        """
-        best_match = None
-        best_iou = 0.0
-
-        for pred_span in prediction_spans:
-            if self._check_if_matched_already(
-                pred_span=pred_span, ann_span=ann_span, matched_preds=matched_preds
-            ):
-                iou = self.calculate_iou(
-                    span1=ann_span,
-                    span2=pred_span,
-                    ignore_entity_type=True,
-                    use_normalized_indices=True,
-                    char_based=self.char_based,
-                )
-                if iou > best_iou:
-                    best_iou = iou
-                    best_match = pred_span
-
-        return best_match, best_iou
-
     def _create_evaluation_result(
         self,
         evaluation_result: EvaluationResult,
@@ -330,6 +453,8 @@ class SpanEvaluator(BaseEvaluator):
         annotation_spans: List[Span],
         prediction_spans: List[Span],
         evaluation_result: EvaluationResult,
+        overlaps: Optional["SpanOverlaps"] = None,
+        iou_threshold: Optional[float] = None,
     ) -> EvaluationResult:
         """
         Match predictions to annotations and calculate metrics.
@@ -337,18 +462,24 @@ class SpanEvaluator(BaseEvaluator):
         :param annotation_spans: List of annotation Span objects
         :param prediction_spans: List of prediction Span objects
         :param evaluation_result: EvaluationResult object to update with matching results
+        :param overlaps: The spans' overlaps, if already calculated
+        :param iou_threshold: IoU threshold to match with. Default is self.iou_threshold
 
         """
         matched_preds = set()
         if not evaluation_result.model_errors:
             evaluation_result.model_errors = []
-        # Process each annotation and find its best matching prediction
-        for ann_span in annotation_spans:
-            best_match, best_iou = self._find_best_match(
-                ann_span, prediction_spans, matched_preds
-            )
-
-            if best_match and best_iou >= self.iou_threshold:
+        matches = self._match_spans(
+            annotation_spans,
+            prediction_spans,
+            overlaps=overlaps,
+            iou_threshold=iou_threshold,
+        )
+        # Process each annotation and its best matching prediction
+        for ann_span, (best_match, best_iou, is_match) in zip(
+            annotation_spans, matches
+        ):
+            if is_match:
                 # Count as true positive
                 evaluation_result.pii_true_positives += 1
 
@@ -468,6 +599,7 @@ class SpanEvaluator(BaseEvaluator):
         evaluation_results: List[EvaluationResult],
         entities: Optional[List[str]] = None,
         beta: float = 2.0,
+        n_jobs: int = 1,
     ) -> EvaluationResult:
         """
         Calculate the evaluation score based on the provided evaluation results (evaluation run).
@@ -476,10 +608,28 @@ class SpanEvaluator(BaseEvaluator):
         :param entities: Optional list of entities to filter the evaluation results by.
         If None, all entities are considered.
         :param beta: The beta parameter for F-beta score calculation. Default is 2.
+        :param n_jobs: Number of processes to score with (-1 for all CPUs).
+        Sentences are split into shards which are counted in parallel,
+        and metrics are computed on the merged counts, so the result is
+        identical to the serial one.
         """
 
-        df = self.get_results_dataframe(evaluation_results=evaluation_results, entities=entities)
-        return self.calculate_score_on_df(df, beta=beta)
+        if not evaluation_results or not evaluation_results[0].tokens:
+            raise ValueError(
+                "The evaluation results should not be empty and must contain tokens. "
+                "Ensure that the input samples have tokens."
+            )
+
+        sentences = (
+            (
+                res.tokens,
+                self._filter_entities(res.actual_tags, entities),
+                self._filter_entities(res.predicted_tags, entities),
+                res.start_indices,
+            )
+            for res in evaluation_results
+        )
+        return self._calculate_score_on_sentences(sentences, beta=beta, n_jobs=n_jobs)
 
     def calculate_score_on_df(
         self, results_df: pd.DataFrame, beta: float = 2
@@ -490,32 +640,346 @@ class SpanEvaluator(BaseEvaluator):
         :param results_df: DataFrame containing sentence_id, tokens, token start indices, annotations and predictions
         :param beta: The beta parameter for F-beta score calculation. Default is 2.
 
+        """
+        sentences = (
+            (
+                sentence_df["token"].tolist(),
+                sentence_df["annotation"].tolist(),
+                sentence_df["prediction"].tolist(),
+                sentence_df["start_indices"].tolist(),
+            )
+            for _, sentence_df in results_df.groupby("sentence_id")
+        )
+        return self._calculate_score_on_sentences(sentences, beta=beta)
+
+    def _calculate_score_on_sentences(
+        self,
+        sentences: Iterable[Tuple[List[str], List[str], List[str], List[int]]],
+        beta: float = 2,
+        n_jobs: int = 1,
+    ) -> EvaluationResult:
+        """
+        Evaluate the predictions against ground truth annotations, sentence by sentence.
+
+        :param sentences: Tuples of (tokens, annotations, predictions, start_indices),
+        one per sentence
+        :param beta: The beta parameter for F-beta score calculation. Default is 2.
+        :param n_jobs: Number of processes to count the sentences with (-1 for all CPUs)
+        """
+        if n_jobs == 1:
+            evaluation_result = self._count_sentences(sentences)
+        else:
+            evaluation_result = self._count_sentences_in_parallel(
+                list(sentences), n_jobs=n_jobs
+            )
+        return self._create_evaluation_result(
+            evaluation_result,
+            evaluation_result.pii_true_positives,
+            evaluation_result.pii_predicted,
+            evaluation_result.pii_annotated,
+            beta,
+        )
+
+    def _count_sentences(
+        self,
+        sentences: Iterable[Tuple[List[str], List[str], List[str], List[int]]],
+    ) -> EvaluationResult:
+        """
+        Match the spans of each sentence and count the results, without computing metrics.
+        Results counted on different sentences can be combined with EvaluationResult.merge.
+
+        :param sentences: Tuples of (tokens, annotations, predictions, start_indices),
+        one per sentence
         """
 
         evaluation_result = EvaluationResult()
 
         # Process each sentence
-        for _, sentence_df in results_df.groupby("sentence_id"):
+        for tokens, annotations, predictions, start_indices in sentences:
             # Get and process spans for the sentence
             annotation_spans, prediction_spans = self._process_sentence_spans(
-                sentence_df
+                tokens, annotations, predictions, start_indices
             )
 
-            # Update total counts
-            evaluation_result.pii_annotated += len(annotation_spans)
-            evaluation_result.pii_predicted += len(prediction_spans)
-
-            # Update per-entity type counts
-            evaluation_result = self._update_per_type_counts(
+            evaluation_result = self._count_sentence_spans(
                 annotation_spans, prediction_spans, evaluation_result
             )
 
-            # Match predictions with annotations and update metrics
-            evaluation_result = self._match_predictions_with_annotations(
+        return evaluation_result
+
+    def _count_sentence_spans(
+        self,
+        annotation_spans: List[Span],
+        prediction_spans: List[Span],
+        evaluation_result: EvaluationResult,
+        overlaps: Optional["SpanOverlaps"] = None,
+        iou_threshold: Optional[float] = None,
+    ) -> EvaluationResult:
+        """
+        Count the spans of one sentence and their matches into evaluation_result.
+
+        :param annotation_spans: The sentence's (merged) annotation spans
+        :param prediction_spans: The sentence's (merged) prediction spans
+        :param evaluation_result: EvaluationResult object to update
+        :param overlaps: The spans' overlaps, if already calculated
+        :param iou_threshold: IoU threshold to match with. Default is self.iou_threshold
+        """
+        # Update total counts
+        evaluation_result.pii_annotated += len(annotation_spans)
+        evaluation_result.pii_predicted += len(prediction_spans)
+
+        # Update per-entity type counts
+        evaluation_result = self._update_per_type_counts(
+            annotation_spans, prediction_spans, evaluation_result
+        )
+
+        # Match predictions with annotations and update metrics
+        return self._match_predictions_with_annotations(
+            annotation_spans,
+            prediction_spans,
+            evaluation_result,
+            overlaps=overlaps,
+            iou_threshold=iou_threshold,
+        )
+
+    def calculate_score_for_thresholds(
+        self,
+        evaluation_results: List[EvaluationResult],
+        iou_thresholds: Iterable[float],
+        entities: Optional[List[str]] = None,
+        beta: float = 2.0,
+    ) -> Dict[float, EvaluationResult]:
+        """
+        Calculate the evaluation score for several IoU thresholds in one pass.
+        Spans are extracted, merged and their overlaps calculated once per sentence,
+        and only the matching is repeated for each threshold.
+        Each result is identical to calculate_score with iou_threshold set to the threshold.
+
+        :param evaluation_results: List of EvaluationResult objects containing the results of the evaluation run,
+        specifically `actual_tags` and `predicted_tags`.
+        :param iou_thresholds: The IoU thresholds to score with
+        :param entities: Optional list of entities to filter the evaluation results by.
+        If None, all entities are considered.
+        :param beta: The beta parameter for F-beta score calculation. Default is 2.
+        :return: A dictionary of {iou_threshold: EvaluationResult}
+        """
+        if not evaluation_results or not evaluation_results[0].tokens:
+            raise ValueError(
+                "The evaluation results should not be empty and must contain tokens. "
+                "Ensure that the input samples have tokens."
+            )
+
+        counts = {threshold: EvaluationResult() for threshold in iou_thresholds}
+        for res in evaluation_results:
+            annotation_spans, prediction_spans = self._process_sentence_spans(
+                res.tokens,
+                self._filter_entities(res.actual_tags, entities),
+                self._filter_entities(res.predicted_tags, entities),
+                res.start_indices,
+            )
+            overlaps = None
+            if annotation_spans and prediction_spans:
+                overlaps = self.calculate_overlaps(annotation_spans, prediction_spans)
+            for threshold, evaluation_result in counts.items():
+                self._count_sentence_spans(
+                    annotation_spans,
+                    prediction_spans,
+                    evaluation_result,
+                    overlaps=overlaps,
+                    iou_threshold=threshold,
+                )
+
+        return {
+            threshold: self._score_counts(evaluation_result, beta=beta)
+            for threshold, evaluation_result in counts.items()
+        }
+
+    def evaluate_spans(
+        self,
+        dataset: List[InputSample],
+        predictions: Optional[List[List[Span]]] = None,
+        entities: Optional[List[str]] = None,
+        beta: float = 2.0,
+        normalize: bool = True,
+        **kwargs,
+    ) -> EvaluationResult:
+        """
+        Evaluate predicted spans directly against the samples' annotated spans,
+        without translating either into tags.
+        The model should implement predict_spans (or batch_predict_spans).
+
+        :param dataset: A list of InputSample samples, containing the ground truth spans
+        :param predictions: Predicted spans of each sample.
+        If None, they are predicted with the model's batch_predict_spans
+        :param entities: Optional list of entities to filter the spans by.
+        If None, all entities are considered.
+        :param beta: The beta parameter for F-beta score calculation. Default is 2.
+        :param normalize: If True, spans are mapped to the sample's tokens, skip words
+        are removed and adjacent spans are merged, like the spans created from tags.
+        Tokenization is only needed in this case, and uses the sample's tokens if
+        available, or the tokenization cache otherwise.
+        If False, IoU is calculated on the spans' character offsets as they are.
+        :param kwargs: Additional arguments for the model's batch_predict_spans method
+        """
+        if not normalize and not self.char_based:
+            raise ValueError(
+                "Token-level IoU requires tokens. Use normalize=True or char_based=True"
+            )
+
+        if predictions is None:
+            print(f"Running model {self.model.__class__.__name__} on dataset...")
+            predictions = self.model.batch_predict_spans(dataset, **kwargs)
+            print("Finished running model on dataset")
+
+        evaluation_result = EvaluationResult()
+        for sample, prediction in zip(dataset, predictions):
+            annotation_spans = self._filter_spans(sample.spans, entities)
+            prediction_spans = self._filter_spans(
+                self.model.filter_spans_in_supported_entities(prediction), entities
+            )
+            if normalize:
+                annotation_spans, prediction_spans = self._normalize_sample_spans(
+                    sample, annotation_spans, prediction_spans
+                )
+            else:
+                annotation_spans = self._spans_with_char_indices(annotation_spans)
+                prediction_spans = self._spans_with_char_indices(prediction_spans)
+
+            evaluation_result = self._count_sentence_spans(
                 annotation_spans, prediction_spans, evaluation_result
             )
 
-        # Create and return the final evaluation result
+        return self._score_counts(evaluation_result, beta=beta)
+
+    @staticmethod
+    def _filter_spans(
+        spans: List[Span], entities: Optional[List[str]] = None
+    ) -> List[Span]:
+        """
+        Filter the spans to only include the specified entities.
+        If entities is None, return all spans.
+        """
+        if entities is None:
+            return spans
+        return [span for span in spans if span.entity_type in entities]
+
+    @staticmethod
+    def _spans_with_char_indices(spans: List[Span]) -> List[Span]:
+        """Copy spans, using their character offsets as their normalized indices."""
+        return [
+            Span(
+                entity_type=span.entity_type,
+                entity_value=span.entity_value,
+                start_position=span.start_position,
+                end_position=span.end_position,
+                normalized_tokens=[span.entity_value],
+                normalized_start_index=span.start_position,
+                normalized_end_index=span.end_position,
+            )
+            for span in sorted(spans, key=lambda x: x.start_position)
+        ]
+
+    def _normalize_sample_spans(
+        self,
+        sample: InputSample,
+        annotation_spans: List[Span],
+        prediction_spans: List[Span],
+    ) -> Tuple[List[Span], List[Span]]:
+        """
+        Map the annotated and predicted spans of a sample to its tokens,
+        normalize them and merge adjacent spans.
+        """
+        if sample.tokens and sample.start_indices:
+            tokens = [str(token) for token in sample.tokens]
+            token_starts = np.asarray(sample.start_indices, dtype=np.int64)
+        else:
+            doc = tokenize(sample.full_text)
+            tokens = [token.text for token in doc]
+            token_starts = np.array([token.idx for token in doc], dtype=np.int64)
+        token_ends = token_starts + np.array(
+            [len(token) for token in tokens], dtype=np.int64
+        )
+
+        is_skip_word = self.skip_word_index.mask(tokens)
+        non_skip_counts = np.concatenate(([0], np.cumsum(~is_skip_word)))
+
+        normalized = []
+        for spans in (annotation_spans, prediction_spans):
+            spans = [
+                self._span_to_tokens(
+                    span, tokens, token_starts, token_ends, is_skip_word
+                )
+                for span in spans
+            ]
+            normalized.append(
+                self._merge_adjacent_spans(
+                    spans=[span for span in spans if span],
+                    tokens=tokens,
+                    non_skip_counts=non_skip_counts,
+                )
+            )
+        return normalized[0], normalized[1]
+
+    def _span_to_tokens(
+        self,
+        span: Span,
+        tokens: List[str],
+        token_starts: np.ndarray,
+        token_ends: np.ndarray,
+        is_skip_word: np.ndarray,
+    ) -> Optional[Span]:
+        """
+        Create the normalized version of a span, covering the tokens starting within it
+        (or the token containing it), as span_to_tag would tag them.
+        Returns None if the span only covers skip words.
+        """
+        token_start, token_end = np.searchsorted(
+            token_starts, [span.start_position, span.end_position], side="left"
+        ).tolist()
+        if token_start == token_end:
+            # No token starts within the span, look for the token containing it
+            containing = int(
+                np.searchsorted(token_starts, span.start_position, side="right") - 1
+            )
+            if containing < 0 or token_ends[containing] < span.end_position:
+                return None
+            token_start, token_end = containing, containing + 1
+
+        kept = [i for i in range(token_start, token_end) if not is_skip_word[i]]
+        if not kept:
+            return None
+
+        normalized_tokens = [self.skip_word_index.normalize(tokens[i]) for i in kept]
+        normalized_starts = [int(token_starts[i]) for i in kept]
+        return Span(
+            entity_type=span.entity_type,
+            entity_value=span.entity_value,
+            start_position=span.start_position,
+            end_position=span.end_position,
+            normalized_tokens=normalized_tokens,
+            normalized_start_index=normalized_starts[0],
+            normalized_end_index=self._get_normalized_end_index(
+                normalized_tokens, normalized_starts
+            ),
+            token_start=token_start,
+            token_end=token_end,
+        )
+
+    def _count_sample(self, evaluation_result: EvaluationResult) -> EvaluationResult:
+        return self._count_sentences(
+            [
+                (
+                    evaluation_result.tokens,
+                    evaluation_result.actual_tags,
+                    evaluation_result.predicted_tags,
+                    evaluation_result.start_indices,
+                )
+            ]
+        )
+
+    def _score_counts(
+        self, evaluation_result: EvaluationResult, beta: float
+    ) -> EvaluationResult:
         return self._create_evaluation_result(
             evaluation_result,
             evaluation_result.pii_true_positives,
@@ -524,109 +988,131 @@ class SpanEvaluator(BaseEvaluator):
             beta,
         )
 
-    def _create_spans(self, df: pd.DataFrame, column: str) -> List[Span]:
+    def _count_sentences_in_parallel(
+        self,
+        sentences: List[Tuple[List[str], List[str], List[str], List[int]]],
+        n_jobs: int,
+    ) -> EvaluationResult:
+        """
+        Split the sentences into contiguous shards, count each shard in a process pool
+        and merge the partial results in order.
+
+        :param sentences: Tuples of (tokens, annotations, predictions, start_indices),
+        one per sentence
+        :param n_jobs: Number of processes (-1 for all CPUs)
         """
-        Create spans from a DataFrame column.
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        # A few shards per process balances sentences of uneven length
+        n_shards = min(len(sentences), n_jobs * self.SHARDS_PER_JOB)
+        if n_jobs <= 1 or n_shards <= 1:
+            return self._count_sentences(sentences)
+
+        shard_size = -(-len(sentences) // n_shards)
+        shards = [
+            sentences[i : i + shard_size]
+            for i in range(0, len(sentences), shard_size)
+        ]
 
-        :param df: DataFrame containing the spans.
-        :param column: Name of the column to extract spans from.
+        # Counting does not use the model, which might not be picklable
+        shard_evaluator = copy.copy(self)
+        shard_evaluator.model = None
+
+        evaluation_result = EvaluationResult()
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_shard_worker,
+            initargs=(shard_evaluator,),
+        ) as executor:
+            for shard_result in executor.map(_count_shard, shards):
+                evaluation_result += shard_result
+        return evaluation_result
+
+    def _create_spans(
+        self, tokens: List[str], tags: List[str], start_indices: List[int]
+    ) -> List[Span]:
+        """
+        Create spans from the tags of a sentence.
+        Consecutive tokens with the same (non "O") tag form one span.
+
+        :param tokens: The sentence's tokens
+        :param tags: One tag per token, in IO
+        :param start_indices: Start character index of each token
 
         Returns:
-            List[Span]: List of Span objects created from the DataFrame.
+            List[Span]: List of Span objects created from the tags.
         """
         spans = []
         current_entity_type = None
         current_tokens = []
         current_start_indices = []
-        current_token_start = None  # Add token position tracking
-        curr_char_position = 0
-        token_position = 0  # Add token position counter
-
-
-        for idx,(_, row) in enumerate(df.iterrows()):
-            entity_type = row[column]
-            token = row["token"]
-            token_start = row["start_indices"]
-            token_length = len(token)
-            # If this isn't the first token, add space before it
-            if idx > df.index[0]:
-                curr_char_position += 1  # Account for space between tokens
-
-            token_end = curr_char_position + token_length
+        current_token_start = None
 
-            if entity_type == "O":
-                if current_entity_type and current_tokens:
-                    normalized_tokens, normalized_start_indices = self._normalize_tokens(
-                        current_tokens, current_start_indices
-                    )
-                    if normalized_tokens:
-                        spans.append(
-                            self.__create_span(
-                                entity_type=current_entity_type,
-                                start_indices=current_start_indices,
-                                token_start=current_token_start,
-                                current_tokens=current_tokens,
-                                idx=idx,
-                                normalized_satrt_indices=normalized_start_indices,
-                                normalized_tokens=normalized_tokens,
-                            )
-                        )
-                    current_entity_type = None
-                    current_tokens = []
-                    current_start_indices = []
-                    current_token_start = None
-
-                curr_char_position = token_end
-                token_position += 1  # Increment token position
+        for idx, (token, entity_type, token_start) in enumerate(
+            zip(tokens, tags, start_indices)
+        ):
+            if entity_type == current_entity_type:
+                current_tokens.append(token)
+                current_start_indices.append(token_start)
                 continue
 
-            if entity_type != current_entity_type:
-                if current_entity_type and current_tokens:
-                    normalized_tokens, normalized_start_indices = self._normalize_tokens(
-                        current_tokens, current_start_indices
-                    )
-                    if normalized_tokens:
-                        spans.append(
-                            self.__create_span(
-                                entity_type=current_entity_type,
-                                start_indices=current_start_indices,
-                                token_start=current_token_start,
-                                current_tokens=current_tokens,
-                                idx=idx,
-                                normalized_satrt_indices=normalized_start_indices,
-                                normalized_tokens=normalized_tokens,
-                            )
-                        )
+            self.__close_span(
+                spans,
+                entity_type=current_entity_type,
+                start_indices=current_start_indices,
+                token_start=current_token_start,
+                current_tokens=current_tokens,
+                idx=idx,
+            )
+            if entity_type == "O":
+                current_entity_type = None
+                current_tokens = []
+                current_start_indices = []
+                current_token_start = None
+            else:
                 current_entity_type = entity_type
                 current_tokens = [token]
                 current_start_indices = [token_start]
-                current_token_start = idx  # Set token start position
-
-            else:
-                current_tokens.append(token)
-                current_start_indices.append(token_start)
-            curr_char_position = token_end
-            token_position += 1  # Increment token position
+                current_token_start = idx
 
         # Handle final span
-        if current_entity_type and current_tokens:
-            normalized_tokens, normalized_start_indices = self._normalize_tokens(
-                current_tokens, current_start_indices
-            )
-            if normalized_tokens:
-                spans.append(
-                    self.__create_span(
-                        entity_type=current_entity_type,
-                        start_indices=current_start_indices,
-                        token_start=current_token_start,
-                        current_tokens=current_tokens,
-                        idx=df.index[-1] + 1,
-                        normalized_satrt_indices=normalized_start_indices,
-                        normalized_tokens=normalized_tokens,
-                    )
-                )
+        self.__close_span(
+            spans,
+            entity_type=current_entity_type,
+            start_indices=current_start_indices,
+            token_start=current_token_start,
+            current_tokens=current_tokens,
+            idx=len(tokens),
+        )
         return spans
 
+    def __close_span(
+        self,
+        spans: List[Span],
+        entity_type: Optional[str],
+        start_indices: List[int],
+        token_start: int,
+        current_tokens: List[str],
+        idx: int,
+    ) -> None:
+        if not entity_type or not current_tokens:
+            return
+        normalized_tokens, normalized_start_indices = self._normalize_tokens(
+            current_tokens, start_indices
+        )
+        if normalized_tokens:
+            spans.append(
+                self.__create_span(
+                    entity_type=entity_type,
+                    start_indices=start_indices,
+                    token_start=token_start,
+                    current_tokens=current_tokens,
+                    idx=idx,
+                    normalized_satrt_indices=normalized_start_indices,
+                    normalized_tokens=normalized_tokens,
+                )
+            )
+
     def __create_span(
         self,
         entity_type: str,
@@ -682,3 +1168,165 @@ class SpanEvaluator(BaseEvaluator):
         recall = self.recall(tp=true_positives, num_annotated=num_annotated)
         f_beta = self.f_beta(precision=precision, recall=recall, beta=beta)
         return precision, recall, f_beta
+
+
+_shard_evaluator: Optional[SpanEvaluator] = None
+
+
+def _init_shard_worker(evaluator: SpanEvaluator) -> None:
+    global _shard_evaluator
+    _shard_evaluator = evaluator
+
+
+def _count_shard(
+    sentences: List[Tuple[List[str], List[str], List[str], List[int]]],
+) -> EvaluationResult:
+    return _shard_evaluator._count_sentences(sentences)
+
+
+class SpanOverlaps(NamedTuple):
+    """
+    The predictions with a positive IoU with each annotation, in CSR layout:
+    the predictions overlapping annotation i, in ascending order, and their IoU
+    are at offsets[i]:offsets[i + 1].
+    """
+
+    offsets: np.ndarray
+    predictions: np.ndarray
+    ious: np.ndarray
+
+    def of(self, annotation: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the predictions overlapping an annotation, and their IoU."""
+        lo, hi = self.offsets[annotation], self.offsets[annotation + 1]
+        return self.predictions[lo:hi], self.ious[lo:hi]
+
+
+class _PredictionIndex:
+    """
+    Finds the prediction spans which have a positive IoU with annotation spans.
+
+    For character-based IoU, predictions are sorted by normalized start, and the
+    candidates are those overlapping the annotation's normalized interval.
+    A running maximum of the sorted ends bounds the search from the left.
+    For token-based IoU, candidates share at least one normalized token.
+
+    :param prediction_spans: List of prediction Span objects
+    :param char_based: Whether IoU is calculated on characters or tokens
+    """
+
+    def __init__(self, prediction_spans: List[Span], char_based: bool):
+        self.prediction_spans = prediction_spans
+        self.char_based = char_based
+
+        if char_based:
+            starts, ends = _normalized_bounds(prediction_spans)
+            self.order = np.argsort(starts, kind="stable")
+            self.starts = starts[self.order]
+            self.ends = ends[self.order]
+            self.max_ends = np.maximum.accumulate(self.ends) if len(ends) else ends
+        else:
+            self.spans_per_token = defaultdict(list)
+            for i, span in enumerate(prediction_spans):
+                for token in set(span.normalized_tokens or []):
+                    self.spans_per_token[token].append(i)
+
+    def overlaps(self, annotation_spans: List[Span]) -> SpanOverlaps:
+        """Return the overlapping predictions of each annotation, and their IoU."""
+        if not self.char_based:
+            return self._token_overlaps(annotation_spans)
+
+        ann_starts, ann_ends = _normalized_bounds(annotation_spans)
+        # Sorted predictions starting before the annotation's end, from the first
+        # one whose running maximum end is after the annotation's start
+        first = np.searchsorted(self.max_ends, ann_starts, side="right")
+        last = np.searchsorted(self.starts, ann_ends, side="left")
+        counts = np.maximum(last - first, 0)
+        rows = np.repeat(np.arange(len(annotation_spans)), counts)
+        positions = np.arange(counts.sum()) + np.repeat(
+            first - (np.cumsum(counts) - counts), counts
+        )
+
+        ious = span_iou_matrix(
+            ann_starts[rows, None],
+            ann_ends[rows, None],
+            self.starts[positions, None],
+            self.ends[positions, None],
+        )[:, 0, 0]
+        overlapping = ious > 0
+        rows = rows[overlapping]
+        predictions = self.order[positions[overlapping]]
+        ious = ious[overlapping]
+
+        # Predictions of each annotation in ascending order, so ties go to the first
+        order = np.lexsort((predictions, rows))
+        offsets = np.searchsorted(
+            rows[order], np.arange(len(annotation_spans) + 1), side="left"
+        )
+        return SpanOverlaps(offsets, predictions[order], ious[order])
+
+    def _token_overlaps(self, annotation_spans: List[Span]) -> SpanOverlaps:
+        offsets = [0]
+        predictions = []
+        ious = []
+        for ann_span in annotation_spans:
+            candidates = set()
+            for token in set(ann_span.normalized_tokens or []):
+                candidates.update(self.spans_per_token.get(token, []))
+            for i in sorted(candidates):
+                predictions.append(i)
+                ious.append(
+                    SpanEvaluator.calculate_iou(
+                        ann_span, self.prediction_spans[i], char_based=False
+                    )
+                )
+            offsets.append(len(predictions))
+        return SpanOverlaps(
+            np.array(offsets, dtype=np.int64),
+            np.array(predictions, dtype=np.int64),
+            np.array(ious, dtype=float),
+        )
+
+
+def _normalized_bounds(spans: List[Span]) -> Tuple[np.ndarray, np.ndarray]:
+    bounds = np.array(
+        [(span.normalized_start_index, span.normalized_end_index) for span in spans],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    return bounds[:, 0], bounds[:, 1]
+
+
+def span_iou_matrix(
+    first_starts: np.ndarray,
+    first_ends: np.ndarray,
+    second_starts: np.ndarray,
+    second_ends: np.ndarray,
+) -> np.ndarray:
+    """
+    Character-level IoU between two sets of intervals, with broadcasting.
+    Inputs of shape (..., A) and (..., P) give an output of shape (..., A, P),
+    so a padded batch of sentences can be processed at once
+    (padding intervals with start == end have an IoU of 0).
+
+    :param first_starts: Start positions of the first intervals
+    :param first_ends: End positions of the first intervals
+    :param second_starts: Start positions of the second intervals
+    :param second_ends: End positions of the second intervals
+    """
+    first_starts = np.asarray(first_starts)[..., :, None]
+    first_ends = np.asarray(first_ends)[..., :, None]
+    second_starts = np.asarray(second_starts)[..., None, :]
+    second_ends = np.asarray(second_ends)[..., None, :]
+
+    intersection = np.minimum(first_ends, second_ends) - np.maximum(
+        first_starts, second_starts
+    )
+    union = np.maximum(first_ends, second_ends) - np.minimum(
+        first_starts, second_starts
+    )
+    overlapping = (intersection > 0) & (union != 0)
+    return np.divide(
+        intersection,
+        union,
+        out=np.zeros(np.broadcast(intersection, union).shape, dtype=float),
+        where=overlapping,
+    )
@@ -1,8 +1,15 @@
+import copy
 import warnings
-from collections import Counter
 from typing import Optional, List
 
-from presidio_evaluator.evaluation import BaseEvaluator, EvaluationResult
+import numpy as np
+
+from presidio_evaluator import LabelVocabulary
+from presidio_evaluator.evaluation import (
+    BaseEvaluator,
+    ConfusionMatrix,
+    EvaluationResult,
+)
 
 
 class TokenEvaluator(BaseEvaluator):
@@ -36,47 +43,67 @@ class TokenEvaluator(BaseEvaluator):
         """
 
         # aggregate results
-        all_results = sum([er.results for er in evaluation_results], Counter())
+        aggregated = EvaluationResult()
+        for evaluation_result in evaluation_results:
+            aggregated += self._count_sample(evaluation_result)
+        # Unary + drops the pairs with no occurrences
+        all_results = +aggregated.results
+
+        # Count results in a confusion matrix over the vocabulary's labels
+        pairs = list(all_results.keys())
+        annotated_labels = self.vocabulary.encode([pair[0] for pair in pairs])
+        predicted_labels = self.vocabulary.encode([pair[1] for pair in pairs])
+        if not entities:
+            entity_labels = np.union1d(annotated_labels, predicted_labels)
+            entity_labels = entity_labels[entity_labels != LabelVocabulary.OUTSIDE]
+            entities = self.vocabulary.decode(entity_labels)
+        else:
+            entity_labels = self.vocabulary.encode(entities)
+
+        n_labels = self.vocabulary.n_labels
+        counts = np.zeros((n_labels, n_labels), dtype=np.int64)
+        np.add.at(
+            counts,
+            (annotated_labels, predicted_labels),
+            [all_results[pair] for pair in pairs],
+        )
+        annotated_per_label = counts.sum(axis=1)
+        predicted_per_label = counts.sum(axis=0)
 
         # compute pii_recall per entity
         entity_recall = {}
         entity_precision = {}
         n = {}
-        if not entities:
-            entities1 = list(set([x[0] for x in all_results.keys() if x[0] != "O"]))
-            entities2 = list(set([x[1] for x in all_results.keys() if x[1] != "O"]))
-            entities = list(set(entities1).union(set(entities2)))
-
-        for entity in entities:
+        for entity, label in zip(entities, entity_labels):
             # all annotation of given type
-            annotated = sum([all_results[x] for x in all_results if x[0] == entity])
-            predicted = sum([all_results[x] for x in all_results if x[1] == entity])
+            annotated = int(annotated_per_label[label])
+            predicted = int(predicted_per_label[label])
             n[entity] = annotated
-            tp = all_results[(entity, entity)]
+            tp = int(counts[label, label])
 
             entity_recall[entity] = self.recall(tp=tp, num_annotated=annotated)
 
             entity_precision[entity] = self.precision(tp=tp, num_predicted=predicted)
 
         # compute pii_precision and pii_recall
-        annotated_all = sum([all_results[x] for x in all_results if x[0] != "O"])
-        predicted_all = sum([all_results[x] for x in all_results if x[1] != "O"])
-
-        tp = sum([all_results[x] for x in all_results if (x[0] != "O" and x[1] != "O")])
+        outside = LabelVocabulary.OUTSIDE
+        annotated_all = int(counts.sum() - annotated_per_label[outside])
+        predicted_all = int(counts.sum() - predicted_per_label[outside])
+
+        tp = int(
+            counts.sum()
+            - annotated_per_label[outside]
+            - predicted_per_label[outside]
+            + counts[outside, outside]
+        )
         pii_recall = self.recall(tp=tp, num_annotated=annotated_all)
         pii_precision = self.precision(tp=tp, num_predicted=predicted_all)
 
         pii_f_beta = self.f_beta(pii_precision, pii_recall, beta)
 
-        # aggregate errors
-        errors = []
-        for res in evaluation_results:
-            if res.model_errors:
-                errors.extend(res.model_errors)
-
         evaluation_result = EvaluationResult(
             results=all_results,
-            model_errors=errors,
+            model_errors=aggregated.model_errors or [],
             pii_precision=pii_precision,
             pii_recall=pii_recall,
             entity_recall_dict=entity_recall,
@@ -84,10 +111,27 @@ class TokenEvaluator(BaseEvaluator):
             n_dict=n,
             pii_f=pii_f_beta,
             n=sum(n.values()),
+            confusion_matrix=ConfusionMatrix(
+                entities=self.vocabulary.decode(np.arange(n_labels)), counts=counts
+            ),
         )
 
         return evaluation_result
 
+    def _count_sample(self, evaluation_result: EvaluationResult) -> EvaluationResult:
+        """
+        Return the counts of one sample without its non-positive counts,
+        to be merged into a running aggregate (see evaluate_stream).
+        Reverting a known error (e.g. a skip word predicted as a generic entity)
+        may leave a negative count in a sample, which should not cancel
+        the counts of other samples. Dropping them per sample makes the merged
+        counts independent of the order of the samples.
+        """
+        counts = copy.copy(evaluation_result)
+        # Unary + drops the pairs with zero or negative counts
+        counts.results = +evaluation_result.results
+        return counts
+
 
 class Evaluator(TokenEvaluator):
     """
@@ -0,0 +1,151 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+PREFIXES = ("", "B", "I", "L", "U")
+
+
+def split_tag(tag: str) -> Tuple[str, str]:
+    """
+    Split a tag into its scheme prefix and entity.
+    "B-PERSON" is split into ("B", "PERSON"), "PERSON" into ("", "PERSON").
+    :param tag: A tag in IO, BIO/IOB or BILUO
+    """
+    if len(tag) > 2 and tag[1] == "-" and tag[0] in "BILU":
+        return tag[0], tag[2:]
+    return "", tag
+
+
+class LabelVocabulary:
+    """
+    Encodes tags as small integers, so that tag sequences can be stored
+    and transformed as NumPy arrays.
+    Each (prefix, entity) pair is a label, with
+    label = entity_id * len(PREFIXES) + prefix_id, where the prefix is one of
+    "" (IO), B, I, L or U. "O" is always label 0 and entity 0.
+    Entities are added to the vocabulary when first encoded.
+
+    :param entities: Entities to add to the vocabulary upfront
+    """
+
+    OUTSIDE = 0
+    N_PREFIXES = len(PREFIXES)
+
+    def __init__(self, entities: Optional[Iterable[str]] = None):
+        self._entities: List[str] = []
+        self._entity_ids: Dict[str, int] = {}
+        self._labels: List[str] = []
+        self._label_ids: Dict[str, int] = {}
+        self._label_array: Optional[np.ndarray] = None
+
+        self.entity_id("O")
+        for entity in entities or []:
+            self.entity_id(entity)
+
+    @property
+    def entities(self) -> List[str]:
+        return list(self._entities)
+
+    @property
+    def n_labels(self) -> int:
+        return len(self._labels)
+
+    def entity_id(self, entity: str) -> int:
+        """Return the id of an entity, adding it to the vocabulary if needed."""
+        if entity not in self._entity_ids:
+            self._entity_ids[entity] = len(self._entities)
+            self._entities.append(entity)
+            self._labels.extend(
+                [entity if not prefix else f"{prefix}-{entity}" for prefix in PREFIXES]
+            )
+            self._label_array = None
+        return self._entity_ids[entity]
+
+    def label_id(self, tag: str) -> int:
+        """Return the label of a tag, adding its entity to the vocabulary if needed."""
+        label = self._label_ids.get(tag)
+        if label is None:
+            prefix, entity = split_tag(tag)
+            if entity == "O":
+                prefix = ""
+            label = self.entity_id(entity) * self.N_PREFIXES + PREFIXES.index(prefix)
+            self._label_ids[tag] = label
+        return label
+
+    def encode(self, tags: Iterable[str]) -> np.ndarray:
+        """
+        Encode a list of tags into an array of labels.
+        :param tags: Tags in IO, BIO/IOB or BILUO
+        """
+        label_ids = self._label_ids
+        return np.array(
+            [
+                label_ids[tag] if tag in label_ids else self.label_id(tag)
+                for tag in tags
+            ],
+            dtype=np.int64,
+        )
+
+    def decode(self, labels: np.ndarray) -> List[str]:
+        """
+        Decode an array of labels back into a list of tags.
+        :param labels: Array of labels created by this vocabulary
+        """
+        if self._label_array is None:
+            self._label_array = np.array(self._labels, dtype=object)
+        return self._label_array[np.asarray(labels, dtype=np.int64)].tolist()
+
+    def encode_entities(self, entities: Iterable[str]) -> np.ndarray:
+        """Encode entity names into an array of entity ids."""
+        return np.array([self.entity_id(entity) for entity in entities], dtype=np.int64)
+
+    def to_entities(self, labels: np.ndarray) -> np.ndarray:
+        """Return the entity id of each label."""
+        return labels // self.N_PREFIXES
+
+    def to_io(self, labels: np.ndarray) -> np.ndarray:
+        """
+        Drop the scheme prefixes: B-PERSON, I-PERSON, L-PERSON and U-PERSON
+        all become PERSON.
+        """
+        return labels - labels % self.N_PREFIXES
+
+    def keep_entities(
+        self, labels: np.ndarray, entities: Optional[Iterable[str]]
+    ) -> np.ndarray:
+        """
+        Replace labels of entities not in entities with "O".
+        :param labels: Array of labels
+        :param entities: Entities to keep. If None or empty, all are kept
+        """
+        if not entities:
+            return labels
+        keep = np.isin(self.to_entities(labels), self.encode_entities(entities))
+        return np.where(keep, labels, self.OUTSIDE)
+
+    def to_scheme(self, labels: np.ndarray, scheme: str) -> np.ndarray:
+        """
+        Translate labels to the requested scheme. Prefixes are ignored,
+        so consecutive labels of the same entity are treated as one span.
+        :param labels: Array of labels
+        :param scheme: Requested scheme (IO, BIO/IOB or BILUO)
+        """
+        io_labels = self.to_io(labels)
+        if scheme == "IO" or len(labels) == 0:
+            return io_labels
+
+        entities = self.to_entities(io_labels)
+        run_start = np.ones(len(labels), dtype=bool)
+        run_start[1:] = entities[1:] != entities[:-1]
+        run_end = np.ones(len(labels), dtype=bool)
+        run_end[:-1] = entities[:-1] != entities[1:]
+
+        prefixes = np.full(len(labels), PREFIXES.index("I"), dtype=np.int64)
+        if scheme in ("BILUO", "BILOU"):
+            prefixes[run_end] = PREFIXES.index("L")
+            prefixes[run_start] = PREFIXES.index("B")
+            prefixes[run_start & run_end] = PREFIXES.index("U")
+        else:
+            prefixes[run_start] = PREFIXES.index("B")
+
+        return np.where(entities != 0, io_labels + prefixes, self.OUTSIDE)
@@ -1,6 +1,7 @@
 """Helper scripts for calling different NER models."""
 from .base_model import BaseModel
 from .presidio_analyzer_wrapper import PresidioAnalyzerWrapper
+from .cached_model import CachedModel
 from .presidio_recognizer_wrapper import PresidioRecognizerWrapper
 from .text_analytics_wrapper import TextAnalyticsWrapper
 from .spacy_model import SpacyModel
@@ -11,6 +12,7 @@ __all__ = [
     "BaseModel",
     "PresidioRecognizerWrapper",
     "PresidioAnalyzerWrapper",
+    "CachedModel",
     "TextAnalyticsWrapper",
     "SpacyModel",
     "StanzaModel",
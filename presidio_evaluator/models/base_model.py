@@ -1,8 +1,10 @@
 import copy
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence
 
-from presidio_evaluator import InputSample, io_to_scheme
+from presidio_evaluator import InputSample, LabelVocabulary, Span, tokenize
+from presidio_evaluator.label_vocabulary import split_tag
+from presidio_evaluator.span_to_tag import span_to_tag_batch
 
 
 class BaseModel(ABC):
@@ -31,6 +33,7 @@ class BaseModel(ABC):
         self.entity_mapping = entity_mapping
         self.verbose = verbose
         self.name = self.__class__.__name__
+        self.vocabulary = LabelVocabulary()
 
     @abstractmethod
     def predict(self, sample: InputSample, **kwargs) -> List[str]:
@@ -45,6 +48,22 @@ class BaseModel(ABC):
     def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
         """Perform batch prediction if the model supports it."""
 
+    def predict_spans(self, sample: InputSample, **kwargs) -> List[Span]:
+        """
+        Returns the predicted spans (entity type and character offsets),
+        for models which can be evaluated without translating spans into tags
+        (see SpanEvaluator.evaluate_spans)
+        :param sample: Sample to be evaluated
+        :return: List of predicted Spans
+        """
+        raise NotImplementedError(f"{self.name} does not predict spans")
+
+    def batch_predict_spans(
+        self, dataset: List[InputSample], **kwargs
+    ) -> List[List[Span]]:
+        """Perform batch span prediction. Default is calling predict_spans per sample."""
+        return [self.predict_spans(sample, **kwargs) for sample in dataset]
+
     def align_entity_types(self, sample: InputSample) -> None:
         """
         Translates the sample's tags to the ones requested by the model
@@ -83,7 +102,20 @@ class BaseModel(ABC):
         """
         if not self.entities:
             return tags
-        return [tag if self._tag_in_entities(tag) else "O" for tag in tags]
+        labels = self.vocabulary.encode(tags)
+        return self.vocabulary.decode(
+            self.vocabulary.keep_entities(labels, self.entities)
+        )
+
+    def filter_spans_in_supported_entities(self, spans: List[Span]) -> List[Span]:
+        """
+        Removes spans of unwanted entities.
+        :param spans: List of spans
+        :return: List of spans of entities in self.entities
+        """
+        if not self.entities:
+            return spans
+        return [span for span in spans if span.entity_type in self.entities]
 
     def to_scheme(self, tags: List[str]):
 
@@ -93,9 +125,10 @@ class BaseModel(ABC):
         :return: Tags in labeling scheme
         """
 
-        io_tags = [self._to_io(tag) for tag in tags]
-
-        return io_to_scheme(io_tags=io_tags, scheme=self.labeling_scheme)
+        labels = self.vocabulary.encode(tags)
+        return self.vocabulary.decode(
+            self.vocabulary.to_scheme(labels, self.labeling_scheme)
+        )
 
     def _ignore_unwanted_entities(
         self, dataset: List[InputSample]
@@ -122,9 +155,7 @@ class BaseModel(ABC):
 
     @staticmethod
     def _to_io(tag):
-        if "-" in tag:
-            return tag[2:]
-        return tag
+        return split_tag(tag)[1]
 
     def to_log(self) -> Dict:
         """
@@ -136,16 +167,53 @@ class BaseModel(ABC):
             "entities_to_keep": self.entities,
         }
 
-    def _tag_in_entities(self, tag: str) -> bool:
-        """True if the tag is in the entities to keep."""
-
-        if not self.entities:
-            return True
-
-        if tag == "O":
-            return True
-
-        if tag[1] == "-":  # BIO/BILUO
-            return tag[2:] in self.entities
-        else:  # IO
-            return tag in self.entities
+    @staticmethod
+    def _batch_span_to_tag(
+        scheme: str,
+        dataset: List[InputSample],
+        starts: List[Sequence[int]],
+        ends: List[Sequence[int]],
+        tags: List[Sequence[str]],
+        scores: Optional[List[Sequence[float]]] = None,
+    ) -> List[List[str]]:
+        """
+        Turns the predicted spans of all samples into tags in one batched call.
+        :param scheme: labeling scheme, either BILUO, BIO/IOB or IO
+        :param dataset: Samples the spans were predicted on
+        :param starts: Per sample, list of indices where entities start
+        :param ends: Per sample, list of indices where entities end
+        :param tags: Per sample, list of entity names
+        :param scores: Per sample, score of each span. If None, spans have equal weight
+        :return: List of tags per sample
+        """
+        token_starts = []
+        token_ends = []
+        token_offsets = [0]
+        span_offsets = [0]
+        for sample, sample_starts in zip(dataset, starts):
+            tokens = sample.tokens if sample.tokens else tokenize(sample.full_text)
+            for token in tokens:
+                token_starts.append(token.idx)
+                token_ends.append(token.idx + len(token.text))
+            token_offsets.append(len(token_starts))
+            span_offsets.append(span_offsets[-1] + len(sample_starts))
+
+        flat_scores = None
+        if scores is not None:
+            flat_scores = [
+                score
+                for sample_starts, sample_scores in zip(starts, scores)
+                for score in (sample_scores or [0.5] * len(sample_starts))
+            ]
+
+        return span_to_tag_batch(
+            scheme=scheme,
+            token_starts=token_starts,
+            token_ends=token_ends,
+            token_offsets=token_offsets,
+            starts=[start for sample_starts in starts for start in sample_starts],
+            ends=[end for sample_ends in ends for end in sample_ends],
+            tags=[tag for sample_tags in tags for tag in sample_tags],
+            span_offsets=span_offsets,
+            scores=flat_scores,
+        )
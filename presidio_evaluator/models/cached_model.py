@@ -0,0 +1,272 @@
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from presidio_evaluator import InputSample, Span
+from presidio_evaluator.models import BaseModel
+
+
+class CachedModel(BaseModel):
+    """
+    Wraps a model and persists its predictions in a SQLite database,
+    so that re-running an evaluation does not re-run the model.
+
+    Predictions are keyed by the sha256 of the sample's text (and, for tags,
+    of its tokens and their start indices) and of the model's
+    configuration: its class, its to_log() output, the config passed here
+    and the prediction's kwargs. The models' to_log() describes their settings
+    (e.g. the analyzer's score_threshold or the spaCy pipeline's version),
+    and is computed on each prediction, so changing a setting misses the cache.
+    Anything else affecting the predictions (e.g. retrained weights saved
+    under the same name) should be described in config,
+    otherwise stale predictions would be returned.
+    Once the stored predictions grow beyond max_size_bytes, the least recently
+    used ones are evicted.
+
+    :param model: The model to cache the predictions of
+    :param cache_path: Path of the SQLite database file
+    :param config: Additional configuration identifying the model's predictions
+    :param max_size_bytes: Maximum total size of the stored predictions.
+    None means unbounded
+    """
+
+    # SQLite's default limit on the number of variables in a query
+    MAX_QUERY_VARIABLES = 999
+
+    def __init__(
+        self,
+        model: BaseModel,
+        cache_path: Union[str, Path],
+        config: Optional[Dict[str, Any]] = None,
+        max_size_bytes: Optional[int] = 2**30,
+    ):
+        super().__init__(
+            labeling_scheme=model.labeling_scheme,
+            entities_to_keep=model.entities,
+            entity_mapping=model.entity_mapping,
+            verbose=model.verbose,
+        )
+        self.model = model
+        self.name = model.name
+        self.cache_path = Path(cache_path)
+        self.config = config
+        self.max_size_bytes = max_size_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def predict(self, sample: InputSample, **kwargs) -> List[str]:
+        return self.batch_predict([sample], **kwargs)[0]
+
+    def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
+        return self._cached_predict(
+            dataset, predict=self.model.batch_predict, kind="tags", kwargs=kwargs
+        )
+
+    def predict_spans(self, sample: InputSample, **kwargs) -> List[Span]:
+        return self.batch_predict_spans([sample], **kwargs)[0]
+
+    def batch_predict_spans(
+        self, dataset: List[InputSample], **kwargs
+    ) -> List[List[Span]]:
+        predictions = self._cached_predict(
+            dataset,
+            predict=lambda samples, **kw: [
+                [vars(span) for span in spans]
+                for spans in self.model.batch_predict_spans(samples, **kw)
+            ],
+            kind="spans",
+            kwargs=kwargs,
+        )
+        return [[Span.from_json(span) for span in spans] for spans in predictions]
+
+    def to_log(self) -> Dict:
+        log = self.model.to_log()
+        log["cache_path"] = str(self.cache_path)
+        return log
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def model_key(self, kind: str = "tags", kwargs: Optional[Dict] = None) -> str:
+        """
+        Return the hash identifying the model's predictions.
+        :param kind: Kind of prediction, "tags" or "spans"
+        :param kwargs: Additional arguments for the model's predict method
+        """
+        model_class = self.model.__class__
+        description = {
+            "class": f"{model_class.__module__}.{model_class.__qualname__}",
+            "to_log": self.model.to_log(),
+            "config": self.config,
+            "kind": kind,
+            "kwargs": kwargs or {},
+        }
+        return self._hash(json.dumps(description, sort_keys=True, default=str))
+
+    def clear(self) -> None:
+        """Delete all cached predictions."""
+        connection = self._get_connection()
+        with connection:
+            connection.execute("DELETE FROM predictions")
+        connection.execute("VACUUM")
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __len__(self) -> int:
+        connection = self._get_connection()
+        return connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def __getstate__(self) -> Dict:
+        # Connections can't be pickled, e.g. for sending the model to another process
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes not found on CachedModel, e.g. analyzer_engine
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _sample_key(cls, sample: InputSample, kind: str) -> str:
+        """
+        Return the hash identifying a sample's prediction.
+        Tags are aligned to the sample's tokens,
+        so the tokens are part of the key of tag predictions.
+        """
+        if kind != "tags":
+            return cls._hash(sample.full_text)
+        description = {
+            "text": sample.full_text,
+            "tokens": [str(token) for token in sample.tokens or []],
+            "start_indices": list(sample.start_indices or []),
+        }
+        return cls._hash(json.dumps(description))
+
+    def _cached_predict(
+        self,
+        dataset: List[InputSample],
+        predict: Callable[..., List[Any]],
+        kind: str,
+        kwargs: Dict,
+    ) -> List[Any]:
+        model_key = self.model_key(kind=kind, kwargs=kwargs)
+        keys = [self._sample_key(sample, kind) + model_key for sample in dataset]
+        cached = self._get_many(set(keys))
+
+        # Predict each missing text once, even if it appears multiple times
+        missing = {}
+        for key, sample in zip(keys, dataset):
+            if key in cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing.setdefault(key, sample)
+
+        if missing:
+            predictions = predict(list(missing.values()), **kwargs)
+            new_predictions = dict(zip(missing.keys(), predictions))
+            self._put_many(new_predictions)
+            cached.update(new_predictions)
+
+        return [cached[key] for key in keys]
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.cache_path)
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions ("
+                    "key TEXT PRIMARY KEY, "
+                    "value TEXT NOT NULL, "
+                    "size INTEGER NOT NULL, "
+                    "last_access INTEGER NOT NULL)"
+                )
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS predictions_last_access "
+                    "ON predictions (last_access)"
+                )
+        return self._connection
+
+    @staticmethod
+    def _clock(connection: sqlite3.Connection) -> int:
+        """Logical clock ordering accesses to the stored predictions."""
+        return connection.execute(
+            "SELECT COALESCE(MAX(last_access), 0) + 1 FROM predictions"
+        ).fetchone()[0]
+
+    def _get_many(self, keys: set) -> Dict[str, Any]:
+        connection = self._get_connection()
+        keys = list(keys)
+        found = {}
+        for i in range(0, len(keys), self.MAX_QUERY_VARIABLES):
+            chunk = keys[i : i + self.MAX_QUERY_VARIABLES]
+            rows = connection.execute(
+                "SELECT key, value FROM predictions "
+                f"WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            found.update({key: json.loads(value) for key, value in rows})
+
+        if found:
+            # Mark as recently used, for eviction
+            now = self._clock(connection)
+            with connection:
+                connection.executemany(
+                    "UPDATE predictions SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return found
+
+    def _put_many(self, predictions: Dict[str, Any]) -> None:
+        connection = self._get_connection()
+        now = self._clock(connection)
+        rows = []
+        for key, prediction in predictions.items():
+            value = json.dumps(prediction)
+            rows.append((key, value, len(value.encode("utf-8")), now))
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO predictions (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.max_size_bytes is None:
+            return
+
+        connection = self._get_connection()
+        total_size = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM predictions"
+        ).fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+
+        evicted = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM predictions ORDER BY last_access"
+        ):
+            if total_size <= self.max_size_bytes:
+                break
+            total_size -= size
+            evicted.append((key,))
+        with connection:
+            connection.executemany("DELETE FROM predictions WHERE key = ?", evicted)
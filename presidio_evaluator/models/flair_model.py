@@ -1,7 +1,6 @@
+import weakref
 from typing import List, Dict
 
-import spacy
-
 from presidio_evaluator.data_objects import PRESIDIO_SPACY_ENTITIES
 
 try:
@@ -13,6 +12,7 @@ except ImportError:
 
 from presidio_evaluator import InputSample, tokenize, span_to_tag
 from presidio_evaluator.models import BaseModel
+from presidio_evaluator.spacy_registry import spacy_registry
 
 
 class FlairModel(BaseModel):
@@ -44,8 +44,14 @@ class FlairModel(BaseModel):
             self.model = SequenceTagger.load(model_path)
         else:
             self.model = model
+        self.model_path = model_path
 
-        self.spacy_tokenizer = SpacyTokenizer(model=spacy.load("en_core_web_sm"))
+        spacy_model_name = "en_core_web_sm"
+        self.spacy_model_name = spacy_model_name
+        self.spacy_tokenizer = SpacyTokenizer(
+            model=spacy_registry.acquire(spacy_model_name)
+        )
+        weakref.finalize(self, spacy_registry.release, spacy_model_name)
 
     def predict(self, sample: InputSample, **kwargs) -> List[str]:
         sentence = Sentence(text=sample.full_text, use_tokenizer=self.spacy_tokenizer)
@@ -86,9 +92,41 @@ class FlairModel(BaseModel):
 
         return tags
 
+    def to_log(self) -> Dict:
+        """
+        Returns a dictionary of parameters for logging purposes,
+        including the Flair model's path and its tokenizer's spaCy model.
+        :return:
+        """
+        log = super().to_log()
+        log["model_path"] = self.model_path
+        log["tag_type"] = getattr(self.model, "tag_type", None)
+        log["spacy_model_name"] = self.spacy_model_name
+        return log
+
     def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
-        predictions = []
-        for sample in dataset:
-            predictions.append(self.predict(sample, **kwargs))
+        sentences = [
+            Sentence(text=sample.full_text, use_tokenizer=self.spacy_tokenizer)
+            for sample in dataset
+        ]
+        self.model.predict(sentences)
+
+        starts, ends, tags = [], [], []
+        for sentence, sample in zip(sentences, dataset):
+            ents = sentence.get_spans("ner")
+            # Use spacy tokenization to maintain consistency with other models:
+            if not sample.tokens:
+                sample.tokens = tokenize(sample.full_text)
 
-        return predictions
+            starts.append([ent.start_position for ent in ents])
+            ends.append([ent.end_position for ent in ents])
+            # Flair's tag for PERSON is PER
+            tags.append([ent.tag if ent.tag != "PER" else "PERSON" for ent in ents])
+
+        return self._batch_span_to_tag(
+            scheme="IO",
+            dataset=dataset,
+            starts=starts,
+            ends=ends,
+            tags=tags,
+        )
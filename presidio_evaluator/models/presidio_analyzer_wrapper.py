@@ -1,4 +1,8 @@
-from typing import List, Optional, Dict
+import copy
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from presidio_analyzer import (
     AnalyzerEngine,
@@ -6,12 +10,15 @@ from presidio_analyzer import (
     BatchAnalyzerEngine,
     RecognizerResult,
 )
+from presidio_analyzer.nlp_engine import NlpArtifacts
 
-from presidio_evaluator import InputSample, span_to_tag
+from presidio_evaluator import InputSample, Span, span_to_tag
 from presidio_evaluator.models import BaseModel
 
 
 class PresidioAnalyzerWrapper(BaseModel):
+    SHARDS_PER_JOB = 4
+
     def __init__(
         self,
         analyzer_engine: Optional[AnalyzerEngine] = None,
@@ -24,6 +31,10 @@ class PresidioAnalyzerWrapper(BaseModel):
         ad_hoc_recognizers: Optional[List[EntityRecognizer]] = None,
         context: Optional[List[str]] = None,
         allow_list: Optional[List[str]] = None,
+        batch_size: int = 32,
+        n_process: int = 1,
+        n_jobs: int = 1,
+        analyzer_engine_factory: Optional[Callable[[], AnalyzerEngine]] = None,
     ):
         """
         Evaluation wrapper for the Presidio Analyzer
@@ -40,6 +51,20 @@ class PresidioAnalyzerWrapper(BaseModel):
         :param ad_hoc_recognizers: List of ad-hoc recognizers to be used in the analyze method
         :param context: List of context words to be passed to the analyze method
         :param allow_list: List of allowed values to be passed to the analyze method
+        :param batch_size: Number of texts the NLP engine processes per batch
+        in batch_predict (see spaCy's nlp.pipe)
+        :param n_process: Number of processes the NLP engine uses in batch_predict
+        (see spaCy's nlp.pipe). Only the NLP engine runs in these processes,
+        the recognizers run in the calling process.
+        Ignored when n_jobs > 1, as processes of the pool can't start processes
+        :param n_jobs: Number of processes to shard the texts across in batch_predict
+        (-1 for all CPUs). Each process runs its own AnalyzerEngine end to end,
+        so recognizers run in parallel too. The processes are kept
+        for the wrapper's lifetime (see close)
+        :param analyzer_engine_factory: Function creating an AnalyzerEngine.
+        If provided, each process (see n_jobs) creates its AnalyzerEngine with it,
+        instead of receiving a pickled copy of analyzer_engine.
+        Also used to create analyzer_engine if not provided
         """
         super().__init__(
             entities_to_keep=entities_to_keep,
@@ -53,14 +78,55 @@ class PresidioAnalyzerWrapper(BaseModel):
         self.ad_hoc_recognizers = ad_hoc_recognizers
         self.context = context
         self.allow_list = allow_list
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.n_jobs = n_jobs
+        self.analyzer_engine_factory = analyzer_engine_factory
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_key: Optional[Tuple] = None
 
         if not analyzer_engine:
-            analyzer_engine = AnalyzerEngine()
+            analyzer_engine = (
+                analyzer_engine_factory()
+                if analyzer_engine_factory
+                else AnalyzerEngine()
+            )
 
         self.analyzer_engine = analyzer_engine
 
         self.print_discrepancies()
 
+    @property
+    def analyzer_engine(self) -> Optional[AnalyzerEngine]:
+        return self._analyzer_engine
+
+    @analyzer_engine.setter
+    def analyzer_engine(self, analyzer_engine: Optional[AnalyzerEngine]) -> None:
+        # The batch engine and the process pool are kept for the wrapper's lifetime,
+        # unless the analyzer changes
+        self._analyzer_engine = analyzer_engine
+        self.batch_analyzer = (
+            BatchAnalyzerEngine(analyzer_engine=analyzer_engine)
+            if analyzer_engine
+            else None
+        )
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the process pool analyzing texts with n_jobs > 1, if any."""
+        executor = getattr(self, "_executor", None)
+        if executor is not None:
+            executor.shutdown()
+        self._executor = None
+        self._executor_key = None
+
+    def __getstate__(self) -> Dict:
+        # Process pools can't be pickled, and copies should not share the pool
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["_executor_key"] = None
+        return state
+
     def predict(self, sample: InputSample, **kwargs) -> List[str]:
         self.__update_kwargs(kwargs)
 
@@ -74,14 +140,361 @@ class PresidioAnalyzerWrapper(BaseModel):
     def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
         self.__update_kwargs(kwargs)
         texts = [sample.full_text for sample in dataset]
-        batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer_engine)
-        analyzer_results = batch_analyzer.analyze_iterator(texts=texts, **kwargs)
+        analyzer_results = self.analyze_texts(texts, **kwargs)
+
+        return self.results_to_tags(dataset=dataset, analyzer_results=analyzer_results)
+
+    def predict_spans(self, sample: InputSample, **kwargs) -> List[Span]:
+        self.__update_kwargs(kwargs)
+
+        results = self.analyzer_engine.analyze(
+            text=sample.full_text,
+            **kwargs,
+        )
+        return self.results_to_spans(sample.full_text, results)
+
+    def batch_predict_spans(
+        self, dataset: List[InputSample], **kwargs
+    ) -> List[List[Span]]:
+        self.__update_kwargs(kwargs)
+        texts = [sample.full_text for sample in dataset]
+        analyzer_results = self.analyze_texts(texts, **kwargs)
+
+        return [
+            self.results_to_spans(text, results)
+            for text, results in zip(texts, analyzer_results)
+        ]
+
+    def analyze_dataset(
+        self, dataset: List[InputSample], **kwargs
+    ) -> List[List[RecognizerResult]]:
+        """
+        Run the analyzer on a dataset with a score threshold of 0,
+        keeping the raw RecognizerResults, so that predictions for any
+        score threshold can later be derived with results_to_tags.
+        The analyzer filters low scores before removing duplicates,
+        and duplicates are removed in favor of higher scores,
+        so filtering these results is equivalent to analyzing with a threshold.
+        :param dataset: Samples to analyze
+        :param kwargs: Additional arguments for the analyze method
+        :return: The RecognizerResults of each sample
+        """
+        kwargs["score_threshold"] = 0
+        self.__update_kwargs(kwargs)
+        texts = [sample.full_text for sample in dataset]
+        return [list(results) for results in self.analyze_texts(texts, **kwargs)]
 
-        predictions = []
-        for prediction, sample in zip(analyzer_results, dataset):
-            predictions.append(self.__recognizer_results_to_tags(prediction, sample))
+    def get_recognizers(self, **kwargs) -> List[EntityRecognizer]:
+        """
+        Return the recognizers the analyzer runs, including ad-hoc recognizers.
+        :param kwargs: Additional arguments for the analyze method
+        """
+        self.__update_kwargs(kwargs)
+        return self.analyzer_engine.registry.get_recognizers(
+            language=kwargs["language"],
+            entities=kwargs["entities"],
+            all_fields=not kwargs["entities"],
+            ad_hoc_recognizers=kwargs["ad_hoc_recognizers"],
+        )
+
+    def analyze_recognizer_subsets(
+        self,
+        dataset: List[InputSample],
+        subsets: List[Tuple[Iterable[str], bool]],
+        **kwargs,
+    ) -> List[List[List[RecognizerResult]]]:
+        """
+        Analyze a dataset as if the analyzer only had some of its recognizers,
+        for several subsets of recognizers at once.
+        The NLP engine processes each text, and each recognizer analyzes it, once.
+        The results of each subset are then combined like the analyzer does:
+        context enhancement, score threshold, removal of duplicates and allow list.
+        :param dataset: Samples to analyze
+        :param subsets: Pairs of (recognizer ids, exclude) (see get_recognizers).
+        If exclude is False, only these recognizers are kept,
+        otherwise all but these recognizers
+        :param kwargs: Additional arguments for the analyze method
+        :return: For each subset, the RecognizerResults of each sample
+        """
+        batch_size = kwargs.pop("batch_size", self.batch_size)
+        n_process = kwargs.pop("n_process", self.n_process)
+        self.__update_kwargs(kwargs)
+        language = kwargs["language"]
+        recognizers = self.get_recognizers(**kwargs)
+        entities = kwargs["entities"] or self.analyzer_engine.get_supported_entities(
+            language=language
+        )
+
+        subset_recognizers = []
+        for recognizer_ids, exclude in subsets:
+            recognizer_ids = set(recognizer_ids)
+            subset_recognizers.append(
+                [rec for rec in recognizers if (rec.id in recognizer_ids) != exclude]
+            )
 
-        return predictions
+        subset_results = [[] for _ in subsets]
+        texts = [sample.full_text for sample in dataset]
+        for text, nlp_artifacts in self.analyzer_engine.nlp_engine.process_batch(
+            texts=texts, language=language, batch_size=batch_size, n_process=n_process
+        ):
+            results = self._run_recognizers(text, nlp_artifacts, recognizers, entities)
+            for selected, sample_results in zip(subset_recognizers, subset_results):
+                sample_results.append(
+                    self._combine_recognizer_results(
+                        text, results, nlp_artifacts, selected, **kwargs
+                    )
+                )
+        return subset_results
+
+    def analyze_texts(self, texts: List[str], **kwargs) -> List[List[RecognizerResult]]:
+        """
+        Analyze texts in batches, using the wrapper's batch_size, n_process
+        and n_jobs unless provided in kwargs.
+        With n_jobs > 1, the texts are split into contiguous shards analyzed
+        in a process pool, and the results are returned in the order of texts.
+        The pool and its analyzers are reused by later calls with the same n_jobs,
+        and n_process is ignored.
+        :param texts: Texts to analyze
+        :param kwargs: Additional arguments for the analyze method
+        :return: The RecognizerResults of each text
+        """
+        batch_size = kwargs.pop("batch_size", self.batch_size)
+        n_process = kwargs.pop("n_process", self.n_process)
+        n_jobs = kwargs.pop("n_jobs", self.n_jobs)
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        # A few shards per process balances texts of uneven length
+        n_shards = min(len(texts), n_jobs * self.SHARDS_PER_JOB)
+        if n_jobs <= 1 or n_shards <= 1:
+            return self.batch_analyzer.analyze_iterator(
+                texts=texts, batch_size=batch_size, n_process=n_process, **kwargs
+            )
+
+        shard_size = -(-len(texts) // n_shards)
+        shards = [
+            (texts[i : i + shard_size], batch_size, kwargs)
+            for i in range(0, len(texts), shard_size)
+        ]
+
+        analyzer_results = []
+        for shard_results in self._get_executor(n_jobs).map(_analyze_shard, shards):
+            analyzer_results.extend(shard_results)
+        return analyzer_results
+
+    def _get_executor(self, n_jobs: int) -> ProcessPoolExecutor:
+        """Return the process pool, creating it if needed or if n_jobs changed."""
+        executor_key = (n_jobs, self.analyzer_engine_factory)
+        if self._executor is None or self._executor_key != executor_key:
+            self.close()
+            # Workers create their engine with the factory if possible,
+            # as pickling an AnalyzerEngine copies its NLP models
+            analyzer_engine = (
+                None if self.analyzer_engine_factory else self.analyzer_engine
+            )
+            self._executor = ProcessPoolExecutor(
+                max_workers=n_jobs,
+                initializer=_init_analyzer_worker,
+                initargs=(analyzer_engine, self.analyzer_engine_factory),
+            )
+            self._executor_key = executor_key
+        return self._executor
+
+    def results_to_tags(
+        self,
+        dataset: List[InputSample],
+        analyzer_results: Iterable[List[RecognizerResult]],
+        score_threshold: Optional[float] = None,
+    ) -> List[List[str]]:
+        """
+        Turn the analyzer's results of each sample into IO tags.
+        :param dataset: Samples the results were predicted on
+        :param analyzer_results: RecognizerResults of each sample
+        :param score_threshold: If provided, results with a lower score are ignored
+        :return: List of tags per sample
+        """
+        starts, ends, tags, scores = [], [], [], []
+        for prediction in analyzer_results:
+            if score_threshold is not None:
+                prediction = [res for res in prediction if res.score >= score_threshold]
+            starts.append([res.start for res in prediction])
+            ends.append([res.end for res in prediction])
+            tags.append([res.entity_type for res in prediction])
+            scores.append([res.score for res in prediction])
+
+        return self._batch_span_to_tag(
+            scheme="IO",
+            dataset=dataset,
+            starts=starts,
+            ends=ends,
+            tags=tags,
+            scores=scores,
+        )
+
+    @staticmethod
+    def results_to_spans(
+        text: str,
+        results: List[RecognizerResult],
+        score_threshold: Optional[float] = None,
+    ) -> List[Span]:
+        """
+        Turn the analyzer's results on a text into Spans.
+        :param text: The analyzed text
+        :param results: RecognizerResults of the text
+        :param score_threshold: If provided, results with a lower score are ignored
+        :return: List of Spans, ordered by start position
+        """
+        if score_threshold is not None:
+            results = [res for res in results if res.score >= score_threshold]
+        return [
+            Span(
+                entity_type=res.entity_type,
+                entity_value=text[res.start : res.end],
+                start_position=res.start,
+                end_position=res.end,
+            )
+            for res in sorted(results, key=lambda res: (res.start, res.end))
+        ]
+
+    def to_log(self) -> Dict:
+        """
+        Returns a dictionary of parameters for logging purposes,
+        including the analyzer's settings affecting its predictions.
+        :return:
+        """
+        log = super().to_log()
+        log.update(
+            {
+                "score_threshold": self.score_threshold,
+                "language": self.language,
+                "context": self.context,
+                "allow_list": self.allow_list,
+                "ad_hoc_recognizers": [
+                    recognizer.to_dict() for recognizer in self.ad_hoc_recognizers or []
+                ],
+            }
+        )
+        if self.analyzer_engine:
+            nlp_engine = self.analyzer_engine.nlp_engine
+            log["nlp_engine"] = {
+                "class": type(nlp_engine).__name__,
+                "models": getattr(nlp_engine, "models", None),
+            }
+            log["recognizers"] = sorted(
+                recognizer.name
+                for recognizer in self.analyzer_engine.registry.recognizers
+            )
+        return log
+
+    @staticmethod
+    def recognizer_id(result: RecognizerResult) -> str:
+        """
+        Return the identifier of the recognizer which produced a result.
+        Unlike names, identifiers are unique, e.g. for ad-hoc PatternRecognizers.
+        """
+        metadata = result.recognition_metadata or {}
+        return metadata.get(RecognizerResult.RECOGNIZER_IDENTIFIER_KEY, "Unknown")
+
+    @staticmethod
+    def recognizer_name(result: RecognizerResult) -> str:
+        """Return the name of the recognizer which produced a result."""
+        metadata = result.recognition_metadata or {}
+        return metadata.get(RecognizerResult.RECOGNIZER_NAME_KEY, "Unknown")
+
+    @staticmethod
+    def filter_results_by_recognizer(
+        analyzer_results: List[List[RecognizerResult]],
+        recognizers: Iterable[str],
+        exclude: bool = False,
+    ) -> List[List[RecognizerResult]]:
+        """
+        Keep the results of some recognizers only, or of all but some recognizers.
+        :param analyzer_results: RecognizerResults of each sample (see analyze_dataset)
+        :param recognizers: Identifiers of the recognizers to keep (or to remove),
+        see recognizer_id
+        :param exclude: If True, the results of recognizers are removed instead of kept
+        :return: The filtered RecognizerResults of each sample
+        """
+        recognizers = set(recognizers)
+        return [
+            [
+                res
+                for res in results
+                if (PresidioAnalyzerWrapper.recognizer_id(res) in recognizers)
+                != exclude
+            ]
+            for results in analyzer_results
+        ]
+
+    @staticmethod
+    def _run_recognizers(
+        text: str,
+        nlp_artifacts: NlpArtifacts,
+        recognizers: List[EntityRecognizer],
+        entities: List[str],
+    ) -> List[RecognizerResult]:
+        """Run each recognizer on a text, as AnalyzerEngine.analyze does."""
+        results = []
+        for recognizer in recognizers:
+            if not recognizer.is_loaded:
+                recognizer.load()
+                recognizer.is_loaded = True
+
+            recognizer_results = recognizer.analyze(
+                text=text, entities=entities, nlp_artifacts=nlp_artifacts
+            )
+            for result in recognizer_results or []:
+                if not result.recognition_metadata:
+                    result.recognition_metadata = {}
+                metadata = result.recognition_metadata
+                metadata.setdefault(
+                    RecognizerResult.RECOGNIZER_IDENTIFIER_KEY, recognizer.id
+                )
+                metadata.setdefault(
+                    RecognizerResult.RECOGNIZER_NAME_KEY, recognizer.name
+                )
+                results.append(result)
+        return results
+
+    def _combine_recognizer_results(
+        self,
+        text: str,
+        results: List[RecognizerResult],
+        nlp_artifacts: NlpArtifacts,
+        recognizers: List[EntityRecognizer],
+        **kwargs,
+    ) -> List[RecognizerResult]:
+        """
+        Combine the results of some recognizers on a text,
+        as AnalyzerEngine.analyze does after running them.
+        """
+        recognizer_ids = {recognizer.id for recognizer in recognizers}
+        # Context enhancement updates the scores in place
+        results = [
+            copy.deepcopy(res)
+            for res in results
+            if self.recognizer_id(res) in recognizer_ids
+        ]
+        results = self.analyzer_engine._enhance_using_context(
+            text, results, nlp_artifacts, recognizers, kwargs.get("context")
+        )
+
+        # Without a threshold, the analyzer may apply per-recognizer thresholds,
+        # approximated here by the analyzer's default threshold
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is None:
+            score_threshold = self.analyzer_engine.default_score_threshold
+        results = [res for res in results if res.score >= score_threshold]
+        results = EntityRecognizer.remove_duplicates(results)
+
+        if kwargs.get("allow_list"):
+            results = AnalyzerEngine._remove_allow_list(
+                results,
+                kwargs["allow_list"],
+                text,
+                kwargs.get("regex_flags", re.DOTALL | re.MULTILINE | re.IGNORECASE),
+                kwargs.get("allow_list_match", "exact"),
+            )
+        return results
 
     @staticmethod
     def __recognizer_results_to_tags(
@@ -217,3 +630,25 @@ class PresidioAnalyzerWrapper(BaseModel):
                 spacy_recognizer.supported_entities.append("ORGANIZATION")
                 self.entities.append("ORGANIZATION")
                 print("Added ORGANIZATION as a supported entity from spaCy/Stanza")
+
+
+_worker_batch_analyzer: Optional[BatchAnalyzerEngine] = None
+
+
+def _init_analyzer_worker(
+    analyzer_engine: Optional[AnalyzerEngine],
+    analyzer_engine_factory: Optional[Callable[[], AnalyzerEngine]],
+) -> None:
+    global _worker_batch_analyzer
+    if analyzer_engine is None:
+        analyzer_engine = analyzer_engine_factory()
+    _worker_batch_analyzer = BatchAnalyzerEngine(analyzer_engine=analyzer_engine)
+
+
+def _analyze_shard(
+    shard: Tuple[List[str], int, Dict],
+) -> List[List[RecognizerResult]]:
+    texts, batch_size, kwargs = shard
+    return _worker_batch_analyzer.analyze_iterator(
+        texts=texts, batch_size=batch_size, **kwargs
+    )
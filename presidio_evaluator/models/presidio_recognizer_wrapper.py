@@ -49,7 +49,7 @@ class PresidioRecognizerWrapper(BaseModel):
         return self.nlp_engine.process_text(text, "en")
 
     #
-    def predict(self, sample: InputSample, **kwargs) -> List[str]:
+    def __analyze(self, sample: InputSample):
         nlp_artifacts = None
         if self.with_nlp_artifacts:
             nlp_artifacts = self.__make_nlp_artifacts(sample.full_text)
@@ -68,6 +68,11 @@ class PresidioRecognizerWrapper(BaseModel):
             ends.append(res.end)
             tags.append(res.entity_type)
             scores.append(res.score)
+        return starts, ends, tags, scores
+
+    #
+    def predict(self, sample: InputSample, **kwargs) -> List[str]:
+        starts, ends, tags, scores = self.__analyze(sample)
         response_tags = span_to_tag(
             scheme=self.labeling_scheme,
             text=sample.full_text,
@@ -80,4 +85,21 @@ class PresidioRecognizerWrapper(BaseModel):
         return response_tags
 
     def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
-        return [self.predict(sample, **kwargs) for sample in dataset]
+        starts, ends, tags, scores = [], [], [], []
+        for sample in dataset:
+            sample_starts, sample_ends, sample_tags, sample_scores = self.__analyze(
+                sample
+            )
+            starts.append(sample_starts)
+            ends.append(sample_ends)
+            tags.append(sample_tags)
+            scores.append(sample_scores)
+
+        return self._batch_span_to_tag(
+            scheme=self.labeling_scheme,
+            dataset=dataset,
+            starts=starts,
+            ends=ends,
+            tags=tags,
+            scores=scores,
+        )
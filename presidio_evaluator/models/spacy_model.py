@@ -1,3 +1,4 @@
+import weakref
 from typing import List, Optional, Dict
 
 import spacy
@@ -5,6 +6,7 @@ import spacy
 from presidio_evaluator import InputSample
 from presidio_evaluator.data_objects import PRESIDIO_SPACY_ENTITIES
 from presidio_evaluator.models import BaseModel
+from presidio_evaluator.spacy_registry import spacy_registry
 
 
 class SpacyModel(BaseModel):
@@ -27,7 +29,9 @@ class SpacyModel(BaseModel):
         if model is None:
             if model_name is None:
                 raise ValueError("Either model_name or model object must be supplied")
-            self.model = spacy.load(model_name)
+            # Shared with other users of the same pipeline, released on deletion
+            self.model = spacy_registry.acquire(model_name)
+            weakref.finalize(self, spacy_registry.release, model_name)
         else:
             self.model = model
 
@@ -54,6 +58,18 @@ class SpacyModel(BaseModel):
             predictions.append(tags)
         return predictions
 
+    def to_log(self) -> Dict:
+        """
+        Returns a dictionary of parameters for logging purposes,
+        including the spaCy pipeline's name and version.
+        :return:
+        """
+        log = super().to_log()
+        meta = self.model.meta
+        log["model"] = f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+        log["pipeline"] = self.model.pipe_names
+        return log
+
     @staticmethod
     def _get_tags_from_doc(doc):
         tags = [token.ent_type_ if token.ent_type_ != "" else "O" for token in doc]
@@ -49,6 +49,7 @@ class StanzaModel(SpacyModel):
             labeling_scheme=labeling_scheme,
             entity_mapping=entity_mapping,
         )
+        self.model_name = model_name
 
     def predict(self, sample: InputSample, **kwargs) -> List[str]:
         """
@@ -86,3 +87,43 @@ class StanzaModel(SpacyModel):
             print("mismatch between input tokens and new tokens")
 
         return tags
+
+    def to_log(self) -> Dict:
+        """
+        Returns a dictionary of parameters for logging purposes,
+        including the name of the stanza model.
+        :return:
+        """
+        log = super().to_log()
+        log["model_name"] = self.model_name
+        return log
+
+    def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
+        """
+        Predict the tags of all samples using a stanza model.
+        Stanza spans are turned into tags over spaCy tokens in one batched call.
+
+        :param dataset: List of InputSample
+        :return: list of tags per sample
+        """
+        texts = [sample.full_text for sample in dataset]
+        docs = self.model.pipe(texts=texts)
+
+        starts, ends, tags = [], [], []
+        for doc, sample in zip(docs, dataset):
+            # Use spacy tokenization and not stanza
+            # to maintain consistency with other models:
+            if not sample.tokens:
+                sample.tokens = tokenize(sample.full_text)
+
+            starts.append([ent.start_char for ent in doc.ents])
+            ends.append([ent.end_char for ent in doc.ents])
+            tags.append([ent.label_ for ent in doc.ents])
+
+        return self._batch_span_to_tag(
+            scheme=self.labeling_scheme,
+            dataset=dataset,
+            starts=starts,
+            ends=ends,
+            tags=tags,
+        )
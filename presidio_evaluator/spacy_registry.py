@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import spacy
+from spacy.language import Language
+
+
+class SpacyModelRegistry:
+    """
+    Process-wide registry of loaded spaCy pipelines.
+
+    Each pipeline is loaded once and shared by all callers. Callers holding
+    on to a pipeline (e.g. a model wrapper) should acquire() and release() it;
+    pipelines that are only borrowed through get() are not referenced.
+    When more than max_models pipelines are loaded, the least recently used
+    unreferenced pipelines are evicted. Loading is done under a lock, so
+    concurrent callers never load the same pipeline twice.
+
+    :param max_models: Maximum number of pipelines to keep loaded.
+    Referenced pipelines are never evicted, so this bound can be exceeded
+    while they are in use. None means unbounded
+    :param loader: Function loading a pipeline by name. Default is spacy.load
+    """
+
+    def __init__(
+        self,
+        max_models: Optional[int] = 4,
+        loader: Callable[[str], Language] = spacy.load,
+    ):
+        self.max_models = max_models
+        self.loader = loader
+
+        self._models: "OrderedDict[str, Language]" = OrderedDict()
+        self._refcounts: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def get(self, model_name: str) -> Language:
+        """
+        Return a loaded pipeline, loading it if needed, without referencing it.
+        :param model_name: Name of (or path to) the spaCy pipeline
+        """
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                return self._models[model_name]
+
+            print("loading model {}".format(model_name))
+            nlp = self.loader(model_name)
+            self._models[model_name] = nlp
+            self._evict()
+            return nlp
+
+    def acquire(self, model_name: str) -> Language:
+        """
+        Return a loaded pipeline and reference it until release() is called.
+        :param model_name: Name of (or path to) the spaCy pipeline
+        """
+        with self._lock:
+            self._refcounts[model_name] = self._refcounts.get(model_name, 0) + 1
+            try:
+                return self.get(model_name)
+            except Exception:
+                self.release(model_name)
+                raise
+
+    def release(self, model_name: str) -> None:
+        """
+        Drop a reference taken by acquire(). Unreferenced pipelines
+        can be evicted once the registry is full.
+        :param model_name: Name of (or path to) the spaCy pipeline
+        """
+        with self._lock:
+            count = self._refcounts.get(model_name, 0) - 1
+            if count > 0:
+                self._refcounts[model_name] = count
+            else:
+                self._refcounts.pop(model_name, None)
+            self._evict()
+
+    def add(self, model_name: str, nlp: Language) -> None:
+        """
+        Register an already loaded pipeline under a name.
+        :param model_name: Name to register the pipeline under
+        :param nlp: The spaCy pipeline
+        """
+        with self._lock:
+            self._models[model_name] = nlp
+            self._models.move_to_end(model_name)
+            self._evict()
+
+    def refcount(self, model_name: str) -> int:
+        with self._lock:
+            return self._refcounts.get(model_name, 0)
+
+    def clear(self) -> None:
+        """Unload all unreferenced pipelines."""
+        with self._lock:
+            for model_name in list(self._models.keys()):
+                if model_name not in self._refcounts:
+                    del self._models[model_name]
+
+    def __contains__(self, model_name: str) -> bool:
+        with self._lock:
+            return model_name in self._models
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+    def _evict(self) -> None:
+        if self.max_models is None:
+            return
+        for model_name in list(self._models.keys()):
+            if len(self._models) <= self.max_models:
+                break
+            if model_name not in self._refcounts:
+                del self._models[model_name]
+
+
+spacy_registry = SpacyModelRegistry()
@@ -1,100 +1,203 @@
-from typing import List, Optional
+import heapq
+from typing import Iterable, Iterator, List, Optional, Sequence
 
-import spacy
+import numpy as np
+from spacy.language import Language
 from spacy.tokens import Doc
 
-loaded_spacy = {}
+from presidio_evaluator.label_vocabulary import split_tag
+from presidio_evaluator.spacy_registry import spacy_registry
+from presidio_evaluator.tokenization_cache import get_tokenization_cache
 
 
-def get_spacy(loaded_spacy=loaded_spacy, model_version="en_core_web_sm"):
-    if model_version not in loaded_spacy:
-        print("loading model {}".format(model_version))
-        loaded_spacy[model_version] = spacy.load(model_version)
-    return loaded_spacy[model_version]
+def get_spacy(model_version="en_core_web_sm") -> Language:
+    """
+    Return a spaCy pipeline from the shared model registry.
+    :param model_version: name of the spaCy model to use
+    """
+    return spacy_registry.get(model_version)
+
 
+def tokenize(text, model_version="en_core_web_sm", tokenizer_only: bool = True) -> Doc:
+    """
+    Tokenize a text using a spaCy model.
+    :param text: input text
+    :param model_version: name of the spaCy model to use
+    :param tokenizer_only: If True, only run the tokenizer (nlp.make_doc), so
+    POS tags, dependencies and entities are not set. Use annotate_tokens to add
+    them later if needed. If False, run the entire pipeline.
+    Tokenizer-only Docs are read from and added to the tokenization cache, if set.
+    :return: spaCy Doc
+    """
+    nlp = get_spacy(model_version=model_version)
+    if not tokenizer_only:
+        return nlp(text)
 
-def tokenize(text, model_version="en_core_web_sm") -> Doc:
-    return get_spacy(model_version=model_version)(text)
+    cache = get_tokenization_cache()
+    if cache is None:
+        return nlp.make_doc(text)
 
+    doc = cache.get(text, model_version=model_version, vocab=nlp.vocab)
+    if doc is None:
+        doc = nlp.make_doc(text)
+        cache.put(text, doc, model_version=model_version)
+    return doc
 
-def _get_detailed_tags_for_span(scheme: str, cur_tags: List[str]) -> List[str]:
+
+def tokenize_batch(
+    texts: Iterable[str],
+    model_version: str = "en_core_web_sm",
+    batch_size: int = 1000,
+    n_process: int = 1,
+    tokenizer_only: bool = True,
+) -> Iterator[Doc]:
     """
-    Replace IO tags (e.g. O PERSON PERSON) with BIO/BILUO tags.
+    Tokenize a stream of texts with nlp.pipe, optionally across multiple processes.
+    :param texts: input texts
+    :param model_version: name of the spaCy model to use
+    :param batch_size: number of texts to buffer per batch
+    :param n_process: number of processes to use (-1 for all CPUs)
+    :param tokenizer_only: If True, disable all pipeline components (see tokenize)
+    :return: iterator of spaCy Docs, in the order of the input texts
     """
+    nlp = get_spacy(model_version=model_version)
+    disable = nlp.pipe_names if tokenizer_only else []
+    cache = get_tokenization_cache()
+    if cache is None or not tokenizer_only:
+        return nlp.pipe(
+            texts, batch_size=batch_size, n_process=n_process, disable=disable
+        )
 
-    if all([tag == "O" for tag in cur_tags]):
-        return cur_tags
-
-    return_tags = []
-    if len(cur_tags) == 1:
-        if scheme == "BILUO":
-            return_tags.append(f"U-{cur_tags[0]}")
-        else:
-            return_tags.append(f"B-{cur_tags[0]}")
-    elif len(cur_tags) > 0:
-        tg = cur_tags[0]
-        for j in range(0, len(cur_tags)):
-            if j == 0:
-                return_tags.append(f"B-{tg}")
-            elif j == len(cur_tags) - 1:
-                if scheme == "BILUO":
-                    return_tags.append(f"L-{tg}")
-                else:
-                    return_tags.append(f"I-{tg}")
-            else:
-                return_tags.append(f"I-{tg}")
-    return return_tags
+    # Only tokenize texts missing from the cache, then restore the input order
+    texts = list(texts)
+    docs = [
+        cache.get(text, model_version=model_version, vocab=nlp.vocab) for text in texts
+    ]
+    missing = [text for text, doc in zip(texts, docs) if doc is None]
+    new_docs = nlp.pipe(
+        missing, batch_size=batch_size, n_process=n_process, disable=disable
+    )
+    for i, doc in enumerate(docs):
+        if doc is None:
+            docs[i] = next(new_docs)
+            cache.put(texts[i], docs[i], model_version=model_version)
+    cache.flush()
+    return iter(docs)
 
 
-def _sort_spans(start, end, tag, score):
-    if len(start) > 0:
-        tpl = [
-            (a, b, c, d)
-            for a, b, c, d in sorted(
-                zip(start, end, tag, score), key=lambda pair: pair[0]
-            )
-        ]
-        start, end, tag, score = [[x[i] for x in tpl] for i in range(len(tpl[0]))]
-    return start, end, tag, score
+def annotate_tokens(doc: Doc, model_version="en_core_web_sm") -> Doc:
+    """
+    Run the pipeline components (e.g. tagger, parser, ner) on a tokenized Doc.
+    Docs which already have POS or tag annotations are returned as is.
+    :param doc: spaCy Doc, e.g. created by tokenize
+    :param model_version: name of the spaCy model to use
+    :return: the annotated Doc
+    """
+    if doc.has_annotation("TAG") or doc.has_annotation("POS"):
+        return doc
+    nlp = get_spacy(model_version=model_version)
+    for _, component in nlp.pipeline:
+        doc = component(doc)
+    return doc
 
 
 def _handle_overlaps(start, end, tag, score):
-    start, end, tag, score = _sort_spans(start, end, tag, score)
-    if len(start) == 0:
-        return start, end, tag, score
-    number_of_spans = len(start)
-    i = 0
-    while i < number_of_spans - 1:
-        for j in range(i + 1, number_of_spans):
-            # Span j intersects with span i
-            if start[i] <= start[j] <= end[i]:
-                # i's score is higher, remove intersecting part
-                if score[i] > score[j]:
-                    # j is contained within i but has lower score, remove
-                    if start[i] <= end[j] <= end[i]:
-                        score[j] = 0
-                    # else, j continues after i ended:
-                    else:
-                        start[j] = end[i] + 1
-                # j's score is higher, break i
-                else:
-                    # If i finishes after j ended, split i
-                    if end[j] < end[i]:
-                        # create new span at the end
-                        start.append(end[j] + 1)
-                        end.append(end[i])
-                        score.append(score[i])
-                        tag.append(tag[i])
-                        number_of_spans += 1
-                        # truncate the current i to end at start(j)
-                        end[i] = start[j] - 1
-                    # else, i finishes before j ended. truncate i
-                    else:
-                        end[i] = start[j] - 1
-
-        i += 1
-    start, end, tag, score = _sort_spans(start, end, tag, score)
-    return start, end, tag, score
+    """
+    Resolve overlapping spans by score: every position is given to the highest
+    scoring span covering it, and ties go to the span which starts later.
+    Span ends are treated as inclusive, and each span is split into the pieces
+    where it wins. This is a sweep over span boundaries with a heap of open spans,
+    so it runs in O(n log n).
+    :return: starts, ends, tags and scores of the resolved spans, sorted by start
+    """
+    order = sorted(range(len(start)), key=lambda k: start[k])
+
+    # (position, is_opening, rank): a span is open from its start to its end + 1
+    events = []
+    for rank, k in enumerate(order):
+        if end[k] >= start[k]:
+            events.append((start[k], True, rank))
+            events.append((end[k] + 1, False, rank))
+    events.sort()
+
+    open_spans = []
+    is_open = [False] * len(order)
+    pieces = []
+    winner = None
+    piece_start = None
+    for i, (position, is_opening, rank) in enumerate(events):
+        if is_opening:
+            heapq.heappush(open_spans, (-score[order[rank]], -rank))
+        is_open[rank] = is_opening
+        if i + 1 < len(events) and events[i + 1][0] == position:
+            continue
+
+        # Lazily drop spans which were closed since they were pushed
+        while open_spans and not is_open[-open_spans[0][1]]:
+            heapq.heappop(open_spans)
+        current = order[-open_spans[0][1]] if open_spans else None
+        if current != winner:
+            if winner is not None:
+                pieces.append((piece_start, position - 1, winner))
+            winner = current
+            piece_start = position
+
+    return (
+        [piece[0] for piece in pieces],
+        [piece[1] for piece in pieces],
+        [tag[piece[2]] for piece in pieces],
+        [score[piece[2]] for piece in pieces],
+    )
+
+
+def _assign_io_tags(
+    tokens: Doc, starts: List[int], ends: List[int], tags: List[str]
+) -> List[str]:
+    """
+    Assign an IO tag to each token using a sweep over tokens and start-sorted spans.
+
+    A token gets the tag of the first span (in sorted order) which either
+    contains the token's start, or lies entirely within the token's boundaries
+    (special case of a span inside a single token). Tokens are expected in
+    document order, and spans sorted by start (as returned by _handle_overlaps),
+    so every pointer only moves forward: O(tokens + spans).
+    """
+    number_of_spans = len(starts)
+    io_tags = []
+
+    # Spans [0, prefix_end) start at or before the current token's start.
+    prefix_end = 0
+    # Spans before first_alive end at or before the current token's start.
+    first_alive = 0
+    # Spans [inner_start, inner_end) start within the current token's boundaries.
+    inner_start = 0
+    inner_end = 0
+
+    for token in tokens:
+        token_start = token.idx
+        token_end = token.idx + len(token.text)
+
+        while prefix_end < number_of_spans and starts[prefix_end] <= token_start:
+            prefix_end += 1
+        while first_alive < prefix_end and ends[first_alive] <= token_start:
+            first_alive += 1
+        # first span whose [start, end) contains the token start
+        match = first_alive if first_alive < prefix_end else number_of_spans
+
+        while inner_start < number_of_spans and starts[inner_start] < token_start:
+            inner_start += 1
+        inner_end = max(inner_end, inner_start)
+        while inner_end < number_of_spans and starts[inner_end] <= token_end:
+            inner_end += 1
+        # first span fully within the token, if it precedes the containing span
+        for span_index in range(inner_start, min(inner_end, match)):
+            if token_start <= ends[span_index] <= token_end:
+                match = span_index
+                break
+
+        io_tags.append(tags[match] if match < number_of_spans else "O")
+
+    return io_tags
 
 
 def span_to_tag(
@@ -130,31 +233,7 @@ def span_to_tag(
     if not tokens:
         tokens = tokenize(text, token_model_version)
 
-    io_tags = []
-    for token in tokens:
-        found = False
-        for span_index in range(0, len(starts)):
-            span_start_in_token = (
-                token.idx <= starts[span_index] <= token.idx + len(token.text)
-            )
-            span_end_in_token = (
-                token.idx <= ends[span_index] <= token.idx + len(token.text)
-            )
-            if (
-                starts[span_index] <= token.idx < ends[span_index]
-            ):  # token start is between start and end
-                io_tags.append(tags[span_index])
-                found = True
-            elif (
-                span_start_in_token and span_end_in_token
-            ):  # span is within token boundaries (special case)
-                io_tags.append(tags[span_index])
-                found = True
-            if found:
-                break
-
-        if not found:
-            io_tags.append("O")
+    io_tags = _assign_io_tags(tokens, starts, ends, tags)
 
     if scheme == "IO":
         return io_tags
@@ -171,23 +250,291 @@ def io_to_scheme(io_tags: List[str], scheme: str) -> List[str]:
     if scheme == "IO":
         return io_tags
 
-    if scheme == "BILOU":
-        scheme = "BILUO"
-
-    current_tag = ""
-    span_index = 0
-    changes = []
-    for io_tag in io_tags:
-        if io_tag != current_tag:
-            changes.append(span_index)
-        span_index += 1
-        current_tag = io_tag
-    changes.append(len(io_tags))
-    new_return_tags = []
-    for i in range(len(changes) - 1):
-        new_return_tags.extend(
-            _get_detailed_tags_for_span(
-                scheme=scheme, cur_tags=io_tags[changes[i] : changes[i + 1]]
+    return TagRuns.from_io(io_tags).to_tags(scheme)
+
+
+class TagRuns:
+    """
+    Run-length encoded tag sequence: each run is a maximal sequence of tokens
+    belonging to the same entity (or to no entity).
+    Conversions between IO, BIO and BILUO are done per run,
+    and the prefixed tags of each entity are only created once.
+
+    :param starts: index of the first token of each run
+    :param lengths: number of tokens in each run
+    :param entity_ids: index of each run's entity in entity_names, -1 for "O"
+    :param entity_names: names of the entities in the sequence
+    """
+
+    def __init__(
+        self,
+        starts: List[int],
+        lengths: List[int],
+        entity_ids: List[int],
+        entity_names: List[str],
+    ):
+        self.starts = starts
+        self.lengths = lengths
+        self.entity_ids = entity_ids
+        self.entity_names = entity_names
+
+    def __len__(self):
+        return sum(self.lengths)
+
+    @classmethod
+    def from_io(cls, io_tags: List[str]) -> "TagRuns":
+        """
+        Encode IO tags. Consecutive tokens with the same tag form one run.
+        :param io_tags: List of tags in IO (e.g. O O O PERSON PERSON O)
+        """
+        starts, entity_ids = [], []
+        entity_names = []
+        name_to_id = {"O": -1}
+        previous_entity = None
+        for i, entity in enumerate(io_tags):
+            if entity != previous_entity:
+                entity_id = name_to_id.get(entity)
+                if entity_id is None:
+                    entity_id = name_to_id[entity] = len(entity_names)
+                    entity_names.append(entity)
+                starts.append(i)
+                entity_ids.append(entity_id)
+                previous_entity = entity
+        ends = starts[1:] + [len(io_tags)]
+        lengths = [end - start for start, end in zip(starts, ends)]
+        return cls(starts, lengths, entity_ids, entity_names)
+
+    @classmethod
+    def from_tags(cls, tags: List[str], ignore_prefixes: bool = False) -> "TagRuns":
+        """
+        Encode tags in IO, BIO/IOB or BILUO.
+        A run starts at a B- or U- tag, at a change of entity,
+        or right after an L- or U- tag.
+        :param tags: List of tags in any scheme (e.g. O B-PERSON L-PERSON O)
+        :param ignore_prefixes: If True, only a change of entity starts a new run,
+        as if the tags were translated to IO first
+        """
+        prefixes = []
+        entities = []
+        for tag in tags:
+            prefix, entity = split_tag(tag)
+            prefixes.append(prefix)
+            entities.append(entity)
+        return cls._encode(entities, prefixes=None if ignore_prefixes else prefixes)
+
+    @classmethod
+    def _encode(cls, entities: List[str], prefixes: Optional[List[str]]) -> "TagRuns":
+        starts, lengths, entity_ids = [], [], []
+        entity_names = []
+        name_to_id = {"O": -1}
+        previous_entity = None
+        previous_prefix = ""
+        for i, entity in enumerate(entities):
+            prefix = prefixes[i] if prefixes else ""
+            new_run = entity != previous_entity or (
+                entity != "O"
+                and (prefix in ("B", "U") or previous_prefix in ("L", "U"))
             )
+            if new_run:
+                if entity not in name_to_id:
+                    name_to_id[entity] = len(entity_names)
+                    entity_names.append(entity)
+                starts.append(i)
+                lengths.append(1)
+                entity_ids.append(name_to_id[entity])
+            else:
+                lengths[-1] += 1
+            previous_entity = entity
+            previous_prefix = prefix
+        return cls(starts, lengths, entity_ids, entity_names)
+
+    def to_tags(self, scheme: str) -> List[str]:
+        """
+        Decode the runs into a list of tags.
+        :param scheme: Requested scheme (IO, BIO/IOB or BILUO)
+        """
+        if scheme == "IO":
+            labels = [(name, name, name, name) for name in self.entity_names]
+        else:
+            biluo = scheme in ("BILUO", "BILOU")
+            last = "L" if biluo else "I"
+            unit = "U" if biluo else "B"
+            labels = [
+                (f"B-{name}", f"I-{name}", f"{last}-{name}", f"{unit}-{name}")
+                for name in self.entity_names
+            ]
+
+        tags = []
+        for length, entity_id in zip(self.lengths, self.entity_ids):
+            if entity_id < 0:
+                tags.extend(["O"] * length)
+                continue
+            begin, inside, last_tag, unit_tag = labels[entity_id]
+            if length == 1:
+                tags.append(unit_tag)
+            else:
+                tags.append(begin)
+                tags.extend([inside] * (length - 2))
+                tags.append(last_tag)
+        return tags
+
+
+def span_to_tag_batch(
+    scheme: str,
+    token_starts: Sequence[int],
+    token_ends: Sequence[int],
+    token_offsets: Sequence[int],
+    starts: Sequence[int],
+    ends: Sequence[int],
+    tags: Sequence[str],
+    span_offsets: Sequence[int],
+    scores: Optional[Sequence[float]] = None,
+) -> List[List[str]]:
+    """
+    Turns the spans of many samples into NER tags (IO, BIO/IOB or BILUO) at once.
+    Tokens and spans of all samples are flattened into arrays, and delimited
+    by offsets (like a CSR matrix): the tokens of sample i are at
+    token_offsets[i]:token_offsets[i + 1], and its spans are at
+    span_offsets[i]:span_offsets[i + 1]. Tags are identical to calling
+    span_to_tag on each sample separately.
+
+    :param scheme: labeling scheme, either BILUO, BIO/IOB or IO
+    :param token_starts: start index of each token in its text
+    :param token_ends: end index of each token in its text
+    :param token_offsets: N+1 offsets delimiting the tokens of each sample
+    :param starts: list of indices where entities in the text start
+    :param ends: list of indices where entities in the text end
+    :param tags: list of entity names
+    :param span_offsets: N+1 offsets delimiting the spans of each sample
+    :param scores: score of tag (confidence). If None, all spans have equal weight
+    :return: one list of tags per sample
+    """
+    token_offsets = np.asarray(token_offsets, dtype=np.int64)
+    span_offsets = np.asarray(span_offsets, dtype=np.int64)
+    n_samples = len(token_offsets) - 1
+    if len(span_offsets) - 1 != n_samples:
+        raise ValueError(
+            "token_offsets and span_offsets should describe the same samples"
+        )
+
+    if scores is None:
+        # assume all scores are of equal weight
+        scores = [0.5] * len(starts)
+
+    # Overlaps are resolved within each sample, which also sorts its spans by start
+    resolved_starts, resolved_ends, resolved_tags = [], [], []
+    resolved_offsets = [0]
+    for i in range(n_samples):
+        lo, hi = span_offsets[i], span_offsets[i + 1]
+        sample_starts, sample_ends, sample_tags, _ = _handle_overlaps(
+            list(starts[lo:hi]),
+            list(ends[lo:hi]),
+            list(tags[lo:hi]),
+            list(scores[lo:hi]),
+        )
+        resolved_starts.extend(sample_starts)
+        resolved_ends.extend(sample_ends)
+        resolved_tags.extend(sample_tags)
+        resolved_offsets.append(len(resolved_starts))
+
+    token_starts = np.asarray(token_starts, dtype=np.int64)
+    token_ends = np.asarray(token_ends, dtype=np.int64)
+    span_starts = np.asarray(resolved_starts, dtype=np.int64)
+    span_ends = np.asarray(resolved_ends, dtype=np.int64)
+    n_tokens = len(token_starts)
+    no_match = len(span_starts)
+
+    # Key every position by its sample, so that one sorted array covers all samples
+    token_sample = np.repeat(np.arange(n_samples), np.diff(token_offsets))
+    span_sample = np.repeat(np.arange(n_samples), np.diff(resolved_offsets))
+    low = min(
+        token_starts.min(initial=0),
+        span_starts.min(initial=0),
+        span_ends.min(initial=0),
+    )
+    high = max(
+        token_ends.max(initial=0), span_starts.max(initial=0), span_ends.max(initial=0)
+    )
+    stride = high - low + 1
+    token_start_keys = token_sample * stride + (token_starts - low)
+    token_end_keys = token_sample * stride + (token_ends - low)
+    start_keys = span_sample * stride + (span_starts - low)
+    end_keys = span_sample * stride + (span_ends - low)
+
+    # First span with start <= token start < end. Spans starting before the token
+    # form a prefix, and the first of them ending after the token start is
+    # where the running maximum of span ends first passes the token start.
+    prefix_end = np.searchsorted(start_keys, token_start_keys, side="right")
+    first_alive = np.searchsorted(
+        np.maximum.accumulate(end_keys), token_start_keys, side="right"
+    )
+    match = np.where(first_alive < prefix_end, first_alive, no_match)
+
+    # Special case: an earlier span lying entirely within the token boundaries
+    inner_start = np.searchsorted(start_keys, token_start_keys, side="left")
+    inner_end = np.minimum(
+        np.searchsorted(start_keys, token_end_keys, side="right"), match
+    )
+    counts = np.maximum(inner_end - inner_start, 0)
+    if counts.any():
+        pair_token = np.repeat(np.arange(n_tokens), counts)
+        pair_span = np.arange(counts.sum()) + np.repeat(
+            inner_start - (np.cumsum(counts) - counts), counts
+        )
+        pair_end = end_keys[pair_span]
+        within = (pair_end >= token_start_keys[pair_token]) & (
+            pair_end <= token_end_keys[pair_token]
         )
-    return new_return_tags
+        # pairs are ordered by token and then by span, keep the first per token
+        found_tokens, first_pair = np.unique(pair_token[within], return_index=True)
+        match[found_tokens] = pair_span[within][first_pair]
+
+    entity_names = []
+    entity_ids = {"O": -1}
+    for tag in resolved_tags:
+        if tag not in entity_ids:
+            entity_ids[tag] = len(entity_names)
+            entity_names.append(tag)
+    span_entities = np.array([entity_ids[tag] for tag in resolved_tags], dtype=np.int64)
+    token_entities = np.full(n_tokens, -1, dtype=np.int64)
+    matched = match < no_match
+    token_entities[matched] = span_entities[match[matched]]
+
+    if scheme == "IO":
+        labels = np.array(entity_names + ["O"], dtype=object)
+        flat_tags = labels[token_entities].tolist()
+    else:
+        if scheme == "BILOU":
+            scheme = "BILUO"
+        # Runs of identical IO tags, which never cross sample boundaries
+        sample_first = np.zeros(n_tokens, dtype=bool)
+        sample_first[token_offsets[:-1][np.diff(token_offsets) > 0]] = True
+        sample_last = np.zeros(n_tokens, dtype=bool)
+        sample_last[token_offsets[1:][np.diff(token_offsets) > 0] - 1] = True
+        run_start = sample_first.copy()
+        run_start[1:] |= token_entities[1:] != token_entities[:-1]
+        run_end = sample_last.copy()
+        run_end[:-1] |= token_entities[:-1] != token_entities[1:]
+
+        # prefix codes: 0=B, 1=I, 2=L, 3=U
+        prefixes = ["B", "I", "L", "U"]
+        prefix_codes = np.ones(n_tokens, dtype=np.int64)
+        if scheme == "BILUO":
+            prefix_codes[run_end] = 2
+            prefix_codes[run_start] = 0
+            prefix_codes[run_start & run_end] = 3
+        else:
+            prefix_codes[run_start] = 0
+        labels = np.array(
+            [f"{prefix}-{name}" for name in entity_names for prefix in prefixes]
+            + ["O"],
+            dtype=object,
+        )
+        label_index = np.where(
+            token_entities >= 0, token_entities * len(prefixes) + prefix_codes, -1
+        )
+        flat_tags = labels[label_index].tolist()
+
+    return [
+        flat_tags[token_offsets[i] : token_offsets[i + 1]] for i in range(n_samples)
+    ]
@@ -0,0 +1,265 @@
+import atexit
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import spacy
+from spacy.tokens import Doc, DocBin
+from spacy.vocab import Vocab
+
+CACHE_DIR_ENV_VAR = "PRESIDIO_EVALUATOR_TOKENIZATION_CACHE_DIR"
+
+
+class TokenizationCache:
+    """
+    Persistent, content-addressed cache of tokenized texts.
+
+    Docs are stored as spaCy DocBin shards, keyed by the sha256 of the text,
+    the spaCy model name and the spaCy version. Each model has its own
+    directory per spaCy version; directories of other spaCy versions are
+    considered stale and are deleted when the model is first accessed.
+    Once the cache grows beyond max_size_bytes, the least recently used
+    shards are evicted. Pending docs of caches still alive at exit are written
+    then. Docs are copied in and out of the cache, so they can be annotated
+    or otherwise modified by the caller.
+
+    :param cache_dir: Directory to store the cache in
+    :param max_size_bytes: Maximum total size of the stored shards.
+    None means unbounded
+    :param shard_size: Number of new docs to buffer before writing a shard
+    :param max_loaded_shards: Number of shards to keep loaded in memory
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        max_size_bytes: Optional[int] = 2**30,
+        shard_size: int = 10000,
+        max_loaded_shards: int = 8,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.shard_size = shard_size
+        self.max_loaded_shards = max_loaded_shards
+
+        self.hits = 0
+        self.misses = 0
+
+        # per model: text hash -> (shard name, position in shard)
+        self._index: Dict[str, Dict[str, Tuple[str, int]]] = {}
+        # per model: text hash -> Doc, not written yet
+        self._pending: Dict[str, Dict[str, Doc]] = {}
+        self._loaded_shards: "OrderedDict[Tuple[str, str], List[Doc]]" = OrderedDict()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        _live_caches.add(self)
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, model_version: str, vocab: Vocab) -> Optional[Doc]:
+        """
+        Return the cached Doc of a text, or None if it was not cached.
+        :param text: The tokenized text
+        :param model_version: Name of the spaCy model used for tokenization
+        :param vocab: The model's Vocab, used to deserialize the Doc
+        """
+        key = self.text_key(text)
+        index = self._get_index(model_version)
+
+        doc = None
+        if key in index:
+            shard_name, position = index[key]
+            docs = self._load_shard(model_version, shard_name, vocab)
+            if docs is not None:
+                doc = docs[position]
+        else:
+            doc = self._pending.get(model_version, {}).get(key)
+
+        if doc is None or doc.text != text:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return doc.copy()
+
+    def put(self, text: str, doc: Doc, model_version: str) -> None:
+        """
+        Add a tokenized text to the cache. New docs are written in shards
+        once shard_size docs are pending, or on flush.
+        """
+        key = self.text_key(text)
+        if key in self._get_index(model_version):
+            return
+        pending = self._pending.setdefault(model_version, {})
+        pending[key] = doc.copy()
+        if len(pending) >= self.shard_size:
+            self._write_shard(model_version)
+
+    def flush(self) -> None:
+        """Write all pending docs to disk."""
+        for model_version in list(self._pending.keys()):
+            self._write_shard(model_version)
+
+    def clear(self) -> None:
+        """Delete all cached docs."""
+        self._index = {}
+        self._pending = {}
+        self._loaded_shards.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @staticmethod
+    def _model_prefix(model_version: str) -> str:
+        # model_version could also be a path to a model
+        return "".join(c if c.isalnum() or c in "._" else "_" for c in model_version)
+
+    def _model_dir(self, model_version: str) -> Path:
+        return (
+            self.cache_dir
+            / f"{self._model_prefix(model_version)}-spacy{spacy.__version__}"
+        )
+
+    def _get_index(self, model_version: str) -> Dict[str, Tuple[str, int]]:
+        if model_version in self._index:
+            return self._index[model_version]
+
+        # Remove entries created with other spaCy versions
+        model_dir = self._model_dir(model_version)
+        for path in self.cache_dir.glob(f"{self._model_prefix(model_version)}-spacy*"):
+            if path != model_dir and path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+
+        index = {}
+        if model_dir.exists():
+            for index_path in model_dir.glob("*.json"):
+                if not index_path.with_suffix(".spacy").exists():
+                    continue
+                with open(index_path, "r", encoding="utf-8") as f:
+                    keys = json.load(f)
+                for position, key in enumerate(keys):
+                    index[key] = (index_path.stem, position)
+
+        self._index[model_version] = index
+        return index
+
+    def _load_shard(
+        self, model_version: str, shard_name: str, vocab: Vocab
+    ) -> Optional[List[Doc]]:
+        shard_path = self._model_dir(model_version) / f"{shard_name}.spacy"
+        if (model_version, shard_name) in self._loaded_shards:
+            self._loaded_shards.move_to_end((model_version, shard_name))
+            docs = self._loaded_shards[(model_version, shard_name)]
+        else:
+            if not shard_path.exists():
+                # Evicted (possibly by another process)
+                self._drop_shard_from_index(shard_name)
+                return None
+            doc_bin = DocBin().from_disk(shard_path)
+            docs = list(doc_bin.get_docs(vocab))
+            self._loaded_shards[(model_version, shard_name)] = docs
+            if len(self._loaded_shards) > self.max_loaded_shards:
+                self._loaded_shards.popitem(last=False)
+
+        # Mark as recently used, for eviction
+        if shard_path.exists():
+            os.utime(shard_path)
+        return docs
+
+    def _write_shard(self, model_version: str) -> None:
+        pending = self._pending.pop(model_version, {})
+        if not pending:
+            return
+
+        model_dir = self._model_dir(model_version)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        shard_name = uuid.uuid4().hex
+
+        doc_bin = DocBin(attrs=["ORTH", "NORM"], docs=list(pending.values()))
+        doc_bin.to_disk(model_dir / f"{shard_name}.spacy")
+        with open(model_dir / f"{shard_name}.json", "w", encoding="utf-8") as f:
+            json.dump(list(pending.keys()), f)
+
+        index = self._get_index(model_version)
+        for position, key in enumerate(pending.keys()):
+            index[key] = (shard_name, position)
+
+        self._evict()
+
+    def _drop_shard_from_index(self, shard_name: str) -> None:
+        for model_version, index in self._index.items():
+            for key in [k for k, (shard, _) in index.items() if shard == shard_name]:
+                del index[key]
+            self._loaded_shards.pop((model_version, shard_name), None)
+
+    def _evict(self) -> None:
+        if self.max_size_bytes is None:
+            return
+
+        shards = sorted(
+            self.cache_dir.glob("*/*.spacy"), key=lambda path: path.stat().st_mtime
+        )
+        total_size = sum(path.stat().st_size for path in shards)
+        for shard_path in shards:
+            if total_size <= self.max_size_bytes:
+                break
+            total_size -= shard_path.stat().st_size
+            shard_path.unlink()
+            shard_path.with_suffix(".json").unlink(missing_ok=True)
+            self._drop_shard_from_index(shard_path.stem)
+
+
+# Caches are only weakly referenced, so flushing them at exit
+# does not keep them alive
+_live_caches: "weakref.WeakSet[TokenizationCache]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_caches() -> None:
+    for cache in list(_live_caches):
+        cache.flush()
+
+
+_tokenization_cache: Optional[TokenizationCache] = None
+_tokenization_cache_initialized = False
+
+
+def set_tokenization_cache(
+    cache: Optional[Union[TokenizationCache, str, Path]],
+) -> Optional[TokenizationCache]:
+    """
+    Set the tokenization cache used by tokenize(), tokenize_batch()
+    and InputSample.
+    :param cache: A TokenizationCache, a directory to create one in,
+    or None to disable caching
+    :return: The active TokenizationCache
+    """
+    global _tokenization_cache, _tokenization_cache_initialized
+    if cache is not None and not isinstance(cache, TokenizationCache):
+        cache = TokenizationCache(cache_dir=cache)
+    _tokenization_cache = cache
+    _tokenization_cache_initialized = True
+    return cache
+
+
+def get_tokenization_cache() -> Optional[TokenizationCache]:
+    """
+    Return the active tokenization cache. Unless set_tokenization_cache was called,
+    a cache is created if the PRESIDIO_EVALUATOR_TOKENIZATION_CACHE_DIR
+    environment variable is set.
+    """
+    if not _tokenization_cache_initialized:
+        set_tokenization_cache(os.environ.get(CACHE_DIR_ENV_VAR))
+    return _tokenization_cache
@@ -3,6 +3,9 @@ from typing import List
 
 import numpy as np
 import pytest
+import spacy
+from presidio_analyzer import AnalyzerEngine
+from presidio_analyzer.nlp_engine import SpacyNlpEngine
 
 # pytest configuration file
 # the configuration allow 3 kind of tests:
@@ -60,3 +63,11 @@ def assert_model_results_gt(
     np.testing.assert_almost_equal(scores.pii_recall, scores.entity_recall_dict[entity])
     assert scores.pii_recall > threshold
     assert scores.pii_precision > threshold
+
+
+@pytest.fixture
+def blank_analyzer_engine() -> AnalyzerEngine:
+    """AnalyzerEngine with a blank spaCy pipeline, running its pattern recognizers."""
+    nlp_engine = SpacyNlpEngine(models=[{"lang_code": "en", "model_name": "blank"}])
+    nlp_engine.nlp = {"en": spacy.blank("en")}
+    return AnalyzerEngine(nlp_engine=nlp_engine)
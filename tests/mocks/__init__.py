@@ -2,12 +2,14 @@ from .model_mock import (
     IdentityTokensMockModel,
     FiftyFiftyIdentityTokensMockModel,
     MockTokensModel,
-    MockModel
+    MockModel,
+    MockSpansModel,
 )
 
 __all__ = [
     "IdentityTokensMockModel",
     "FiftyFiftyIdentityTokensMockModel",
     "MockTokensModel",
-    "MockModel"
+    "MockModel",
+    "MockSpansModel",
 ]
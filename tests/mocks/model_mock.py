@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from presidio_evaluator import InputSample
+from presidio_evaluator import InputSample, Span
 from presidio_evaluator.models import BaseModel
 
 
@@ -70,3 +70,30 @@ class FiftyFiftyIdentityTokensMockModel(BaseModel):
 
     def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
         return [self.predict(sample, **kwargs) for sample in dataset]
+
+
+class MockSpansModel(BaseModel):
+    """
+    Simulates a real model predicting spans, returns the spans given in the
+    constructor for each text, either as spans or translated into tags
+    """
+
+    def __init__(self, predictions: Dict[str, List[Span]], **kwargs):
+        super().__init__(**kwargs)
+        self.predictions = predictions
+
+    def predict(self, sample: InputSample, **kwargs) -> List[str]:
+        return self.batch_predict([sample], **kwargs)[0]
+
+    def batch_predict(self, dataset: List[InputSample], **kwargs) -> List[List[str]]:
+        predictions = self.batch_predict_spans(dataset, **kwargs)
+        return self._batch_span_to_tag(
+            scheme="IO",
+            dataset=dataset,
+            starts=[[span.start_position for span in spans] for spans in predictions],
+            ends=[[span.end_position for span in spans] for spans in predictions],
+            tags=[[span.entity_type for span in spans] for spans in predictions],
+        )
+
+    def predict_spans(self, sample: InputSample, **kwargs) -> List[Span]:
+        return self.predictions.get(sample.full_text, [])
@@ -0,0 +1,196 @@
+import pickle
+from typing import List
+
+import pytest
+import spacy
+from spacy.tokens import Doc
+
+from presidio_evaluator import InputSample, Span
+from presidio_evaluator.evaluation import SpanEvaluator
+from presidio_evaluator.models import CachedModel, PresidioAnalyzerWrapper
+from tests.mocks import MockSpansModel
+
+
+class CountingSpansModel(MockSpansModel):
+    """Counts the samples the model actually predicted on."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.n_predicted = 0
+
+    def batch_predict_spans(
+        self, dataset: List[InputSample], **kwargs
+    ) -> List[List[Span]]:
+        self.n_predicted += len(dataset)
+        return super().batch_predict_spans(dataset, **kwargs)
+
+
+@pytest.fixture
+def dataset():
+    texts = [
+        "Dan Smith lives in New York",
+        "Call Jane at 555-1234",
+        "Nothing to see here",
+    ]
+    spans = [
+        [Span("PERSON", "Dan Smith", 0, 9), Span("LOCATION", "New York", 19, 27)],
+        [Span("PERSON", "Jane", 5, 9), Span("PHONE_NUMBER", "555-1234", 13, 21)],
+        [],
+    ]
+    return [
+        InputSample(full_text=text, spans=sample_spans, create_tags_from_span=True)
+        for text, sample_spans in zip(texts, spans)
+    ]
+
+
+@pytest.fixture
+def model(dataset):
+    return CountingSpansModel(
+        predictions={sample.full_text: sample.spans for sample in dataset}
+    )
+
+
+def test_second_run_is_read_from_cache(tmp_path, dataset, model):
+    cached_model = CachedModel(model, cache_path=tmp_path / "predictions.db")
+
+    first = cached_model.batch_predict(dataset)
+    second = cached_model.batch_predict(dataset)
+
+    assert first == second == [sample.tags for sample in dataset]
+    assert model.n_predicted == len(dataset)
+    assert cached_model.misses == len(dataset)
+    assert cached_model.hits == len(dataset)
+    assert cached_model.hit_rate == 0.5
+
+
+def test_cache_persists_across_instances(tmp_path, dataset, model):
+    CachedModel(model, cache_path=tmp_path / "predictions.db").batch_predict(dataset)
+    model.n_predicted = 0
+
+    cached_model = CachedModel(model, cache_path=tmp_path / "predictions.db")
+    predictions = cached_model.predict(dataset[0])
+
+    assert predictions == dataset[0].tags
+    assert model.n_predicted == 0
+    assert cached_model.hit_rate == 1
+
+
+def test_model_configuration_is_part_of_the_key(tmp_path, dataset, model):
+    CachedModel(model, cache_path=tmp_path / "predictions.db").batch_predict(dataset)
+
+    with_config = CachedModel(
+        model, cache_path=tmp_path / "predictions.db", config={"version": 2}
+    )
+    with_config.batch_predict(dataset)
+    model.entities = ["PERSON"]
+    with_entities = CachedModel(model, cache_path=tmp_path / "predictions.db")
+    with_entities.batch_predict(dataset)
+
+    assert with_config.hits == 0
+    assert with_entities.hits == 0
+    assert len(with_entities) == 3 * len(dataset)
+
+
+def test_changing_analyzer_settings_misses_the_cache(tmp_path, blank_analyzer_engine):
+    dataset = [
+        InputSample(full_text="Mail me at dan@example.com", create_tags_from_span=False)
+    ]
+    analyzer = PresidioAnalyzerWrapper(
+        analyzer_engine=blank_analyzer_engine, score_threshold=0.4
+    )
+    cached_model = CachedModel(analyzer, cache_path=tmp_path / "predictions.db")
+    spans = cached_model.batch_predict_spans(dataset)
+    assert "EMAIL_ADDRESS" in [span.entity_type for span in spans[0]]
+
+    analyzer.score_threshold = 1.01
+    assert cached_model.batch_predict_spans(dataset) == [[]]
+    assert cached_model.hits == 0
+
+    analyzer.score_threshold = 0.4
+    cached_model.batch_predict_spans(dataset)
+    assert cached_model.hits == 1
+
+
+def test_tags_are_cached_per_tokenization(tmp_path, model):
+    spans = [Span("PERSON", "Dan Smith", 0, 9)]
+    model.predictions["Dan Smith"] = spans
+    vocab = spacy.blank("en").vocab
+    by_words = InputSample(
+        full_text="Dan Smith",
+        tokens=Doc(vocab, words=["Dan", "Smith"]),
+        start_indices=[0, 4],
+    )
+    as_one = InputSample(
+        full_text="Dan Smith",
+        tokens=Doc(vocab, words=["Dan Smith"], spaces=[False]),
+        start_indices=[0],
+    )
+    cached_model = CachedModel(model, cache_path=tmp_path / "predictions.db")
+
+    assert cached_model.predict(by_words) == ["PERSON", "PERSON"]
+    assert cached_model.predict(as_one) == ["PERSON"]
+    assert cached_model.predict(by_words) == ["PERSON", "PERSON"]
+    assert cached_model.hits == 1
+
+
+def test_spans_are_cached(tmp_path, dataset, model):
+    cached_model = CachedModel(model, cache_path=tmp_path / "predictions.db")
+
+    first = cached_model.batch_predict_spans(dataset)
+    second = cached_model.batch_predict_spans(dataset)
+
+    assert first == second == [sample.spans for sample in dataset]
+    assert model.n_predicted == len(dataset)
+
+
+def test_evicts_least_recently_used_predictions(tmp_path, dataset, model):
+    cached_model = CachedModel(
+        model, cache_path=tmp_path / "predictions.db", max_size_bytes=None
+    )
+    for sample in dataset:
+        cached_model.predict_spans(sample)
+    cached_model.predict_spans(dataset[0])
+
+    cached_model.max_size_bytes = 1
+    cached_model._evict()
+    assert len(cached_model) == 0
+
+    cached_model.max_size_bytes = None
+    for sample in dataset:
+        cached_model.predict_spans(sample)
+    cached_model.predict_spans(dataset[0])
+    sizes = [
+        size
+        for (size,) in cached_model._get_connection().execute(
+            "SELECT size FROM predictions"
+        )
+    ]
+    cached_model.max_size_bytes = sum(sizes) - 1
+    cached_model._evict()
+
+    assert len(cached_model) == len(dataset) - 1
+    model.n_predicted = 0
+    cached_model.predict_spans(dataset[0])
+    assert model.n_predicted == 0
+
+
+def test_evaluation_with_cached_model_is_unchanged(tmp_path, dataset, model):
+    cached_model = CachedModel(model, cache_path=tmp_path / "predictions.db")
+    expected = SpanEvaluator(model=model).evaluate_spans(dataset)
+
+    evaluator = SpanEvaluator(model=cached_model)
+    evaluator.evaluate_spans(dataset)
+    result = evaluator.evaluate_spans(dataset)
+
+    assert result.pii_f == expected.pii_f == 1
+    assert cached_model.hits == len(dataset)
+
+
+def test_cached_model_can_be_pickled(tmp_path, dataset, model):
+    cached_model = CachedModel(model, cache_path=tmp_path / "predictions.db")
+    cached_model.batch_predict(dataset)
+
+    unpickled = pickle.loads(pickle.dumps(cached_model))
+
+    assert unpickled.batch_predict(dataset) == [sample.tags for sample in dataset]
+    assert unpickled.model.n_predicted == len(dataset)
@@ -5,7 +5,7 @@ import pytest
 import spacy
 from spacy.tokens import DocBin
 
-from presidio_evaluator import InputSample, Span
+from presidio_evaluator import InputSample, Span, tokenize
 
 
 @pytest.fixture(scope="session")
@@ -78,6 +78,22 @@ def test_load_dataset_from_file(input_sample_result_2):
     assert records[0].spans == input_sample_result_2.spans
 
 
+def test_load_dataset_with_multiple_processes(small_dataset):
+    dir_path = Path(__file__).parent
+
+    records = InputSample.read_dataset_json(
+        Path(dir_path, "data", "generated_small.json"), batch_size=10, n_process=2
+    )
+
+    assert len(records) == len(small_dataset)
+    for record, expected in zip(records, small_dataset):
+        assert record.tags == expected.tags
+        assert record.start_indices == expected.start_indices
+        assert [token.text for token in record.tokens] == [
+            token.text for token in expected.tokens
+        ]
+
+
 def test_count_entities(input_sample_result, input_sample_result_2):
     counts = InputSample.count_entities([input_sample_result, input_sample_result_2])
     assert len(counts) == 2
@@ -93,6 +109,25 @@ def test_remove_unsupported_entities(input_sample_result, input_sample_result_2)
     assert filtered[0].spans[0].entity_type == "name"
 
 
+@pytest.mark.parametrize(
+    "tags, expected",
+    [
+        (
+            ["U-PERSON", "O", "B-LOC", "I-LOC", "L-LOC"],
+            ["B-PERSON", "O", "B-LOC", "I-LOC", "I-LOC"],
+        ),
+        # IO tags are left as they are
+        (["PERSON", "PERSON", "O"], ["PERSON", "PERSON", "O"]),
+        # Each tag is translated on its own, without fixing invalid sequences
+        (["O", "L-LOC", "U-LOC"], ["O", "I-LOC", "B-LOC"]),
+    ],
+)
+def test_biluo_to_bio(tags, expected):
+    sample = InputSample(full_text="", tags=tags, create_tags_from_span=False)
+    sample.biluo_to_bio()
+    assert sample.tags == expected
+
+
 def test_to_conll():
     import os
 
@@ -107,6 +142,24 @@ def test_to_conll():
     assert len(sentences) == len(input_samples)
 
 
+def test_tokenize_only_runs_tokenizer_and_to_conll_adds_pos():
+    full_text = "Dan Smith lives in Paris"
+    sample = InputSample(
+        full_text=full_text,
+        spans=[Span("PERSON", "Dan Smith", 0, 9)],
+        create_tags_from_span=True,
+    )
+    assert not sample.tokens.has_annotation("POS")
+
+    conll = sample.to_conll(translate_tags=False)
+
+    assert [token["text"] for token in conll] == full_text.split()
+    assert [token["pos"] for token in conll] == [
+        token.pos_ for token in tokenize(full_text, tokenizer_only=False)
+    ]
+    assert sample.tags == ["PERSON", "PERSON", "O", "O", "O"]
+
+
 def test_to_spacy_all_entities(small_dataset):
     spacy_ver = InputSample.create_spacy_dataset(small_dataset)
 
@@ -2,7 +2,12 @@ from collections import Counter
 
 import pytest
 
-from presidio_evaluator.evaluation import EvaluationResult, Evaluator, ModelError
+from presidio_evaluator.evaluation import (
+    ConfusionMatrix,
+    EvaluationResult,
+    Evaluator,
+    ModelError,
+)
 from tests.mocks import (
     MockTokensModel,
 )
@@ -64,6 +69,27 @@ def test_to_confusion_matrix(scores):
                              s[("O", "PERSON")],
                              s[("O", "O")]]
 
+def test_confusion_matrix_is_a_dense_view_of_results(evaluation_result, scores):
+    for result in (evaluation_result, scores):
+        matrix = result.confusion_matrix
+        assert matrix.to_counter() == +result.results
+        for pair, count in result.results.items():
+            assert matrix[pair] == count
+        assert matrix.annotated()["ANIMAL"] == 6
+        assert matrix.predicted()["ANIMAL"] == 5
+
+
+def test_confusion_matrix_reindex_fills_missing_entities():
+    matrix = ConfusionMatrix.from_counter(
+        Counter({("PERSON", "PERSON"): 3, ("PERSON", "O"): 1, ("O", "O"): 7})
+    )
+
+    counts = matrix.reindex(["LOCATION", "PERSON", "O"])
+
+    assert counts.tolist() == [[0, 0, 0], [0, 3, 1], [0, 0, 7]]
+    assert matrix[("LOCATION", "O")] == 0
+
+
 def test_str(scores):
     return_str = str(scores)
     assert (
@@ -103,3 +129,51 @@ def test_to_log(evaluation_result):
     assert log_dict["PER_recall"] == -1
     assert log_dict["PER_recall"] == -1
     assert log_dict["n"] == -1
+
+
+def _counts(result: EvaluationResult):
+    return (
+        result.results,
+        {ent: vars(metrics) for ent, metrics in result.per_type.items()},
+        result.pii_true_positives,
+        result.pii_false_positives,
+        result.pii_annotated,
+        result.pii_predicted,
+        [str(error) for error in result.model_errors or []],
+    )
+
+
+def test_merge_adds_counts_and_resets_metrics(evaluation_result):
+    other = EvaluationResult(results=Counter({("ANIMAL", "ANIMAL"): 1, ("O", "PERSON"): 2}))
+    other.per_type["ANIMAL"].true_positives = 1
+    other.pii_true_positives = 1
+
+    merged = evaluation_result.merge(other)
+
+    assert merged.results[("ANIMAL", "ANIMAL")] == 5
+    assert merged.results[("O", "PERSON")] == 2
+    assert merged.per_type["ANIMAL"].true_positives == 1
+    assert merged.pii_true_positives == 1
+    assert merged.model_errors == evaluation_result.model_errors
+    assert merged.pii_f is None
+    assert merged.text is None
+    # The merged results are not modified
+    assert evaluation_result.results[("ANIMAL", "ANIMAL")] == 4
+    assert evaluation_result.pii_f == -1.0
+
+
+def test_merge_is_associative():
+    results = []
+    for i in range(3):
+        result = EvaluationResult(
+            results=Counter({("PERSON", "PERSON"): i + 1, ("O", "PERSON"): i}),
+            model_errors=[ModelError(error_type="FP", annotation="O", prediction="PERSON",
+                                     token=str(i), full_text=str(i))],
+        )
+        result.per_type["PERSON"].num_annotated = i + 1
+        result.pii_false_positives = i
+        results.append(result)
+    a, b, c = results
+
+    assert _counts((a + b) + c) == _counts(a + (b + c))
+    assert _counts(EvaluationResult() + a) == _counts(a + EvaluationResult())
@@ -202,6 +202,119 @@ def test_error_type_classification():
                and e.prediction == "LOCATION" for e in wrong_entities)
 
 
+def test_compare_labels_ignores_mismatches_on_skip_words():
+    evaluator = MockEvaluator(model=MockTokensModel(prediction=None))
+    sample = InputSample(
+        full_text="Dan , the street",
+        tokens=["Dan", ",", "the", "street"],
+        tags=["PERSON", "O", "O", "LOCATION"],
+    )
+    vocabulary = evaluator.vocabulary
+
+    results, mistakes = evaluator.compare_labels(
+        annotation_labels=vocabulary.encode(sample.tags),
+        prediction_labels=vocabulary.encode(["PERSON", "PERSON", "O", "O"]),
+        input_sample=sample,
+    )
+
+    assert results == Counter({("PERSON", "PERSON"): 1, ("O", "O"): 1})
+    assert mistakes == []
+
+
+def _counter_loop_compare(
+    evaluator: BaseEvaluator, sample: InputSample, prediction: List[str]
+):
+    """Reference implementation: the per-token Counter loop compare replaced."""
+    tokens = sample.tokens
+    annotation = sample.tags.copy()
+    if evaluator.compare_by_io:
+        annotation = [tag[2:] if "-" in tag else tag for tag in annotation]
+        prediction = [tag[2:] if "-" in tag else tag for tag in prediction]
+    if evaluator.entities_to_keep:
+        annotation = [
+            tag if tag in evaluator.entities_to_keep else "O" for tag in annotation
+        ]
+        prediction = [
+            tag if tag in evaluator.entities_to_keep else "O" for tag in prediction
+        ]
+
+    results = Counter()
+    mistakes = []
+    for token, cur_annotation, cur_prediction in zip(tokens, annotation, prediction):
+        results[(cur_annotation, cur_prediction)] += 1
+        if cur_annotation == cur_prediction:
+            continue
+
+        reverted = False
+        if str(token).lower().strip() in evaluator.skip_words:
+            results[(cur_annotation, cur_prediction)] -= 1
+            reverted = True
+        if cur_prediction in evaluator.generic_entities and cur_annotation != "O":
+            results[(cur_annotation, cur_prediction)] -= 1
+            results[(cur_annotation, cur_annotation)] += 1
+            reverted = True
+        elif cur_annotation in evaluator.generic_entities and cur_prediction != "O":
+            results[(cur_annotation, cur_prediction)] -= 1
+            results[(cur_prediction, cur_prediction)] += 1
+            reverted = True
+        if results[(cur_annotation, cur_prediction)] == 0:
+            del results[(cur_annotation, cur_prediction)]
+        if reverted:
+            continue
+
+        if cur_prediction == "O":
+            error_type = ErrorType.FN
+        elif cur_annotation == "O":
+            error_type = ErrorType.FP
+        else:
+            error_type = ErrorType.WrongEntity
+        mistakes.append((error_type, cur_annotation, cur_prediction, token))
+
+    return results, mistakes
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_compare_equals_counter_loop_on_random_samples(seed):
+    rng = np.random.default_rng(seed)
+    entities = ["PERSON", "LOCATION", "PII", "ID"]
+    tag_pool = ["O", "O", "O"] + entities
+    tag_pool += [f"{prefix}-{entity}" for prefix in "BILU" for entity in entities]
+    token_pool = ["Dan", "street", "the", "The ", ",", "-", "123", "Paris", "of"]
+
+    compare_by_io = bool(rng.integers(2))
+    entities_to_keep = (
+        None if rng.integers(2) else list(rng.choice(entities, size=2, replace=False))
+    )
+    evaluator = MockEvaluator(
+        model=MockTokensModel(prediction=None),
+        compare_by_io=compare_by_io,
+        entities_to_keep=entities_to_keep,
+        generic_entities=["PII", "ID"],
+        skip_words=["the", ",", "-", "of"],
+    )
+
+    for _ in range(10):
+        n_tokens = int(rng.integers(1, 30))
+        tokens = rng.choice(token_pool, size=n_tokens).tolist()
+        sample = InputSample(
+            full_text=" ".join(tokens),
+            tokens=tokens,
+            tags=rng.choice(tag_pool, size=n_tokens).tolist(),
+        )
+        prediction = rng.choice(tag_pool, size=n_tokens).tolist()
+
+        results, mistakes = evaluator.compare(sample, prediction)
+        expected_results, expected_mistakes = _counter_loop_compare(
+            evaluator, sample, prediction
+        )
+
+        assert dict(results) == dict(expected_results)
+        assert [
+            (error.error_type, error.annotation, error.prediction, error.token)
+            for error in mistakes
+        ] == expected_mistakes
+
+
 def test_get_results_dataframe_basic():
     """Test the basic functionality of get_results_dataframe without entity filtering."""
     evaluation_results = [
@@ -0,0 +1,50 @@
+import pytest
+
+from presidio_evaluator import LabelVocabulary
+
+
+def test_encode_decode_round_trip():
+    vocabulary = LabelVocabulary()
+    tags = ["O", "B-PERSON", "I-PERSON", "L-PERSON", "U-LOCATION", "PERSON", "O"]
+
+    labels = vocabulary.encode(tags)
+
+    assert labels[0] == LabelVocabulary.OUTSIDE
+    assert vocabulary.decode(labels) == tags
+    assert vocabulary.entities == ["O", "PERSON", "LOCATION"]
+
+
+def test_to_io_drops_prefixes():
+    vocabulary = LabelVocabulary()
+    labels = vocabulary.encode(["B-PERSON", "L-PERSON", "O", "U-LOCATION"])
+
+    io_tags = vocabulary.decode(vocabulary.to_io(labels))
+
+    assert io_tags == ["PERSON", "PERSON", "O", "LOCATION"]
+
+
+def test_keep_entities():
+    vocabulary = LabelVocabulary()
+    labels = vocabulary.encode(["B-PERSON", "L-PERSON", "O", "U-LOCATION", "PHONE"])
+
+    kept = vocabulary.decode(vocabulary.keep_entities(labels, ["PERSON", "PHONE"]))
+
+    assert kept == ["B-PERSON", "L-PERSON", "O", "O", "PHONE"]
+
+
+# fmt: off
+@pytest.mark.parametrize(
+    "tags, scheme, expected_tags",
+    [
+        (["PERSON", "PERSON", "O", "PHONE"], "IO", ["PERSON", "PERSON", "O", "PHONE"]),
+        (["PERSON", "PERSON", "O", "PHONE"], "BIO", ["B-PERSON", "I-PERSON", "O", "B-PHONE"]),
+        (["PERSON", "PERSON", "PERSON", "PHONE"], "BILUO", ["B-PERSON", "I-PERSON", "L-PERSON", "U-PHONE"]),
+        (["U-PERSON", "U-PERSON"], "BILUO", ["B-PERSON", "L-PERSON"]),
+        ([], "BIO", []),
+    ],
+)
+def test_to_scheme(tags, scheme, expected_tags):
+    vocabulary = LabelVocabulary()
+    labels = vocabulary.to_scheme(vocabulary.encode(tags), scheme)
+    assert vocabulary.decode(labels) == expected_tags
+# fmt: on
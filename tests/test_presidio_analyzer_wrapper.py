@@ -1,4 +1,13 @@
+import copy
+
 import pytest
+from presidio_analyzer import (
+    AnalyzerEngine,
+    Pattern,
+    PatternRecognizer,
+    RecognizerRegistry,
+    RecognizerResult,
+)
 
 from presidio_evaluator import InputSample, Span
 
@@ -92,3 +101,263 @@ def test_analyzer_with_generated_text(test_input, acceptance_threshold):
 
     assert acceptance_threshold <= scores.pii_precision
     assert acceptance_threshold <= scores.pii_recall
+
+
+def test_score_threshold_sweep_equals_analyzing_with_each_threshold(small_dataset):
+    input_samples = Evaluator.align_entity_types(
+        input_samples=small_dataset[:30],
+        entities_mapping=PresidioAnalyzerWrapper.presidio_entities_map,
+        allow_missing_mappings=True,
+    )
+    score_thresholds = [0.0, 0.4, 0.7]
+
+    analyzer = PresidioAnalyzerWrapper()
+    evaluator = Evaluator(model=analyzer)
+    swept = evaluator.calculate_score_for_score_thresholds(
+        input_samples, score_thresholds
+    )
+
+    for score_threshold in score_thresholds:
+        analyzer.score_threshold = score_threshold
+        expected = evaluator.calculate_score(evaluator.evaluate_all(input_samples))
+        assert swept[score_threshold].results == expected.results
+
+    curve = Evaluator.scores_to_curve(swept)
+    assert set(curve["threshold"]) == set(score_thresholds)
+    assert "PII" in set(curve["entity"])
+
+
+def test_batch_analyzer_is_kept_until_the_analyzer_changes():
+    analyzer = PresidioAnalyzerWrapper()
+    batch_analyzer = analyzer.batch_analyzer
+
+    analyzer.batch_predict([InputSample("My name is Dan")])
+    assert analyzer.batch_analyzer is batch_analyzer
+
+    analyzer.analyzer_engine = None
+    assert analyzer.batch_analyzer is None
+
+
+def test_batch_predict_in_parallel_is_identical_to_serial(small_dataset):
+    input_samples = small_dataset[:40]
+    analyzer = PresidioAnalyzerWrapper(batch_size=8)
+
+    serial = analyzer.batch_predict(input_samples)
+    parallel = analyzer.batch_predict(input_samples, n_jobs=2)
+
+    assert parallel == serial
+
+
+def test_process_pool_is_kept_until_closed(blank_analyzer_engine):
+    analyzer = PresidioAnalyzerWrapper(analyzer_engine=blank_analyzer_engine, n_jobs=2)
+    texts = ["Mail dan@example.com", "Visit www.example.com", "Call 212-555-1234"] * 4
+
+    serial = analyzer.analyze_texts(texts, language="en", n_jobs=1)
+    first = analyzer.analyze_texts(texts, language="en")
+    executor = analyzer._executor
+    second = analyzer.analyze_texts(texts, language="en", batch_size=2)
+
+    assert first == second == serial
+    assert executor is not None
+    assert analyzer._executor is executor
+    assert copy.copy(analyzer)._executor is None
+
+    analyzer.close()
+    assert analyzer._executor is None
+    assert analyzer.analyze_texts(texts, language="en") == serial
+    assert analyzer._executor is not executor
+    analyzer.close()
+
+
+def test_filter_results_by_recognizer():
+    def result(start, recognizer_id):
+        return RecognizerResult(
+            "PERSON",
+            start,
+            start + 3,
+            0.8,
+            recognition_metadata={
+                RecognizerResult.RECOGNIZER_NAME_KEY: "PatternRecognizer",
+                RecognizerResult.RECOGNIZER_IDENTIFIER_KEY: recognizer_id,
+            },
+        )
+
+    analyzer_results = [[result(0, "A"), result(4, "B")], [result(0, "B")], []]
+
+    only_a = PresidioAnalyzerWrapper.filter_results_by_recognizer(
+        analyzer_results, recognizers=["A"]
+    )
+    without_a = PresidioAnalyzerWrapper.filter_results_by_recognizer(
+        analyzer_results, recognizers=["A"], exclude=True
+    )
+
+    assert [[res.start for res in results] for results in only_a] == [[0], [], []]
+    assert [[res.start for res in results] for results in without_a] == [[4], [0], []]
+
+
+def test_results_to_spans():
+    text = "Call Dan at 555-1234"
+    results = [
+        RecognizerResult("PHONE_NUMBER", 12, 20, 0.3),
+        RecognizerResult("PERSON", 5, 8, 0.85),
+    ]
+
+    spans = PresidioAnalyzerWrapper.results_to_spans(text, results)
+    filtered = PresidioAnalyzerWrapper.results_to_spans(
+        text, results, score_threshold=0.4
+    )
+
+    assert spans == [
+        Span("PERSON", "Dan", 5, 8),
+        Span("PHONE_NUMBER", "555-1234", 12, 20),
+    ]
+    assert filtered == [Span("PERSON", "Dan", 5, 8)]
+
+
+def test_calculate_score_per_recognizer(small_dataset):
+    input_samples = Evaluator.align_entity_types(
+        input_samples=small_dataset[:30],
+        entities_mapping=PresidioAnalyzerWrapper.presidio_entities_map,
+        allow_missing_mappings=True,
+    )
+
+    analyzer = PresidioAnalyzerWrapper()
+    evaluator = Evaluator(model=analyzer)
+    full, recognizer_scores, ablation_scores, names = (
+        evaluator.calculate_score_per_recognizer(input_samples)
+    )
+
+    expected = evaluator.calculate_score(evaluator.evaluate_all(input_samples))
+    assert full.results == expected.results
+    assert "SpacyRecognizer" in names.values()
+    assert recognizer_scores.keys() == ablation_scores.keys() == names.keys()
+
+
+@pytest.fixture
+def recognizer_subsets_dataset():
+    texts_and_spans = [
+        (
+            "Mail dan@example.com or call 212-555-1234",
+            [
+                Span("EMAIL_ADDRESS", "dan@example.com", 5, 20),
+                Span("PHONE_NUMBER", "212-555-1234", 29, 41),
+            ],
+        ),
+        ("Visit www.example.com today", [Span("URL", "www.example.com", 6, 21)]),
+        ("Ship it to Jane today", [Span("PERSON", "Jane", 11, 15)]),
+    ]
+    return [
+        InputSample(full_text=text, spans=spans, create_tags_from_span=True)
+        for text, spans in texts_and_spans
+    ]
+
+
+@pytest.fixture
+def ad_hoc_recognizers():
+    # Both are named "PatternRecognizer". The domain's results are contained in
+    # the UrlRecognizer's, with a lower score, so the analyzer removes them
+    domain = PatternRecognizer(
+        supported_entity="URL", patterns=[Pattern("domain", r"example\.com", 0.3)]
+    )
+    names = PatternRecognizer(supported_entity="PERSON", deny_list=["Jane"])
+    return [domain, names]
+
+
+def test_analyze_recognizer_subsets_equals_analyzer_with_subset_registry(
+    blank_analyzer_engine, recognizer_subsets_dataset, ad_hoc_recognizers
+):
+    analyzer = PresidioAnalyzerWrapper(
+        analyzer_engine=blank_analyzer_engine,
+        ad_hoc_recognizers=ad_hoc_recognizers,
+        score_threshold=0.2,
+        context=["mail", "call"],
+        allow_list=["www.example.com"],
+    )
+    recognizers = analyzer.get_recognizers()
+    subsets = [((rec.id,), False) for rec in recognizers]
+    subsets += [((rec.id,), True) for rec in recognizers]
+
+    subset_results = analyzer.analyze_recognizer_subsets(
+        recognizer_subsets_dataset, subsets
+    )
+
+    def as_tuples(results):
+        return sorted((r.entity_type, r.start, r.end, r.score) for r in results)
+
+    for (recognizer_ids, exclude), results in zip(subsets, subset_results):
+        registry = RecognizerRegistry(
+            recognizers=[
+                rec for rec in recognizers if (rec.id in recognizer_ids) != exclude
+            ],
+            supported_languages=["en"],
+        )
+        engine = AnalyzerEngine(
+            nlp_engine=blank_analyzer_engine.nlp_engine, registry=registry
+        )
+        for sample, sample_results in zip(recognizer_subsets_dataset, results):
+            expected = engine.analyze(
+                text=sample.full_text,
+                language="en",
+                entities=analyzer.entities,
+                score_threshold=0.2,
+                context=["mail", "call"],
+                allow_list=["www.example.com"],
+            )
+            assert as_tuples(sample_results) == as_tuples(expected)
+
+
+def test_recognizer_subset_equals_separately_configured_analyzer(
+    blank_analyzer_engine, recognizer_subsets_dataset, ad_hoc_recognizers
+):
+    analyzer = PresidioAnalyzerWrapper(
+        analyzer_engine=blank_analyzer_engine,
+        ad_hoc_recognizers=ad_hoc_recognizers,
+        score_threshold=0.2,
+    )
+    evaluator = Evaluator(model=analyzer)
+    _, recognizer_scores, _, names = evaluator.calculate_score_per_recognizer(
+        recognizer_subsets_dataset
+    )
+
+    domain, deny_list = ad_hoc_recognizers
+    assert names[domain.id] == names[deny_list.id] == "PatternRecognizer"
+    assert (
+        recognizer_scores[domain.id].results != recognizer_scores[deny_list.id].results
+    )
+
+    registry = RecognizerRegistry(recognizers=[domain], supported_languages=["en"])
+    domain_only = PresidioAnalyzerWrapper(
+        analyzer_engine=AnalyzerEngine(
+            nlp_engine=blank_analyzer_engine.nlp_engine, registry=registry
+        ),
+        entities_to_keep=analyzer.entities,
+        score_threshold=0.2,
+    )
+    domain_evaluator = Evaluator(model=domain_only)
+    expected = domain_evaluator.calculate_score(
+        domain_evaluator.evaluate_all(recognizer_subsets_dataset)
+    )
+
+    assert recognizer_scores[domain.id].results == expected.results
+    assert expected.results[("URL", "URL")] > 0
+
+
+def test_calculate_score_per_recognizer_in_parallel_is_identical_to_serial(
+    blank_analyzer_engine, recognizer_subsets_dataset, ad_hoc_recognizers
+):
+    analyzer = PresidioAnalyzerWrapper(
+        analyzer_engine=blank_analyzer_engine, ad_hoc_recognizers=ad_hoc_recognizers
+    )
+    evaluator = Evaluator(model=analyzer)
+
+    serial = evaluator.calculate_score_per_recognizer(recognizer_subsets_dataset)
+    parallel = evaluator.calculate_score_per_recognizer(
+        recognizer_subsets_dataset, n_jobs=2
+    )
+
+    assert parallel[0].results == serial[0].results
+    for serial_scores, parallel_scores in zip(serial[1:3], parallel[1:3]):
+        assert serial_scores.keys() == parallel_scores.keys()
+        for recognizer_id, result in serial_scores.items():
+            assert parallel_scores[recognizer_id].results == result.results
+    assert parallel[3] == serial[3]
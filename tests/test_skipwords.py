@@ -0,0 +1,23 @@
+from presidio_evaluator.evaluation import SkipWordIndex, get_skip_words
+
+
+def test_skip_word_index_mask_normalizes_tokens():
+    index = SkipWordIndex(get_skip_words())
+
+    mask = index.mask(["The", " , ", "John", "Street", "\n\n"])
+
+    assert mask.tolist() == [True, True, False, True, True]
+    assert index.mask([]).shape == (0,)
+
+
+def test_skip_word_index_normalizes_each_token_once():
+    index = SkipWordIndex(["the"])
+    tokens = ["The", "John", "The", "the", "John"]
+
+    index.mask(tokens)
+    index.mask(tokens)
+
+    assert len(index._table) == 3
+    assert index.normalize("The") is index.normalize("the")
+    assert "THE" in index
+    assert "John" not in index
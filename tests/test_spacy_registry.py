@@ -0,0 +1,71 @@
+import threading
+import time
+
+import spacy
+
+from presidio_evaluator import SpacyModelRegistry
+
+
+class CountingLoader:
+    def __init__(self):
+        self.loaded = []
+
+    def __call__(self, model_name):
+        time.sleep(0.01)
+        self.loaded.append(model_name)
+        return spacy.blank("en")
+
+
+def test_get_loads_each_model_once():
+    loader = CountingLoader()
+    registry = SpacyModelRegistry(loader=loader)
+
+    nlp1 = registry.get("model_a")
+    nlp2 = registry.get("model_a")
+
+    assert nlp1 is nlp2
+    assert loader.loaded == ["model_a"]
+
+
+def test_concurrent_get_loads_model_once():
+    loader = CountingLoader()
+    registry = SpacyModelRegistry(loader=loader)
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get("model_a")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.loaded == ["model_a"]
+    assert all(nlp is results[0] for nlp in results)
+
+
+def test_evicts_least_recently_used_model():
+    registry = SpacyModelRegistry(max_models=2, loader=CountingLoader())
+
+    registry.get("model_a")
+    registry.get("model_b")
+    registry.get("model_a")
+    registry.get("model_c")
+
+    assert "model_a" in registry
+    assert "model_b" not in registry
+    assert "model_c" in registry
+
+
+def test_acquired_model_is_not_evicted_until_released():
+    registry = SpacyModelRegistry(max_models=1, loader=CountingLoader())
+
+    registry.acquire("model_a")
+    registry.get("model_b")
+    assert "model_a" in registry
+    assert registry.refcount("model_a") == 1
+
+    registry.release("model_a")
+    assert registry.refcount("model_a") == 0
+    assert len(registry) == 1
@@ -8,14 +8,20 @@ Tests focus on:
 5. Error analysis and result population
 6. Integration with visualization components
 """
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
 import numpy as np
 import pytest
 import pandas as pd
-from presidio_evaluator.data_objects import Span
-from presidio_evaluator.evaluation.span_evaluator import SpanEvaluator
+from presidio_evaluator.data_objects import InputSample, Span
+from scipy.optimize import linear_sum_assignment
+from presidio_evaluator.evaluation.span_evaluator import SpanEvaluator, span_iou_matrix
 from presidio_evaluator.evaluation.evaluation_result import EvaluationResult
 from presidio_evaluator.evaluation import ErrorType
-from tests.mocks import MockModel
+from tests.mocks import FiftyFiftyIdentityTokensMockModel, MockModel, MockSpansModel
 
 
 # ===== Fixtures =====
@@ -589,7 +595,11 @@ def test_normalize_tokens(mock_span_evaluator):
 
 def test_create_spans(mock_span_evaluator, sample_df):
     """Test that spans are correctly created from tokens with proper normalization indices."""
-    spans = mock_span_evaluator._create_spans(sample_df, "annotation")
+    spans = mock_span_evaluator._create_spans(
+        sample_df["token"].tolist(),
+        sample_df["annotation"].tolist(),
+        sample_df["start_indices"].tolist(),
+    )
 
     # Should create two spans: PERSON and LOCATION
     assert len(spans) == 2
@@ -616,31 +626,40 @@ def test_create_spans(mock_span_evaluator, sample_df):
 
 def test_are_spans_adjacent(mock_span_evaluator, sample_df_with_skipwords):
     """Test that span adjacency is correctly identified when separated by skip words."""
-    spans = mock_span_evaluator._create_spans(sample_df_with_skipwords, "annotation")
+    tokens = sample_df_with_skipwords["token"].tolist()
+    spans = mock_span_evaluator._create_spans(
+        tokens,
+        sample_df_with_skipwords["annotation"].tolist(),
+        sample_df_with_skipwords["start_indices"].tolist(),
+    )
 
     # Get the spans representing "Dr." and "Jane Smith"
     dr_span = spans[0]
     jane_smith_span = spans[1]
 
     # Test that spans separated by a comma (skip word) are adjacent
+    non_skip_counts = mock_span_evaluator._count_non_skip_tokens(tokens)
     assert mock_span_evaluator._are_spans_adjacent(
-        dr_span, jane_smith_span, sample_df_with_skipwords
+        dr_span, jane_smith_span, non_skip_counts
     )
 
 
 def test_merge_adjacent_spans(mock_span_evaluator, sample_df_with_skipwords):
     """Test that adjacent spans of the same entity type are merged correctly."""
 
-    spans = mock_span_evaluator._create_spans(sample_df_with_skipwords, "annotation")
+    tokens = sample_df_with_skipwords["token"].tolist()
+    spans = mock_span_evaluator._create_spans(
+        tokens,
+        sample_df_with_skipwords["annotation"].tolist(),
+        sample_df_with_skipwords["start_indices"].tolist(),
+    )
 
     # Before merging, we should have 1 PERSON spans, the others are only skip words
     assert len(spans) == 3
     assert [span.entity_type for span in spans] == ["PERSON", "PERSON", "PERSON"]
 
     # Merge adjacent spans
-    merged_spans = mock_span_evaluator._merge_adjacent_spans(
-        spans, sample_df_with_skipwords
-    )
+    merged_spans = mock_span_evaluator._merge_adjacent_spans(spans, tokens)
 
     # After merging, we should have 1 PERSON spans: Dr. Jane Smith MD
     assert len(merged_spans) == 1
@@ -658,6 +677,21 @@ def test_merge_adjacent_spans(mock_span_evaluator, sample_df_with_skipwords):
     )
 
 
+def test_merge_adjacent_spans_across_punctuation_runs(mock_span_evaluator):
+    """Test that chains of spans separated by long skip word runs are merged in one span."""
+    tokens = ["John", ",", "-", ".", "Smith", ",", ",", "Jr", "lives", "in", "Paris"]
+    tags = ["PERSON", "O", "O", "O", "PERSON", "O", "O", "PERSON", "O", "O", "PERSON"]
+    start_indices = [0, 5, 7, 9, 11, 17, 19, 21, 24, 30, 33]
+
+    spans = mock_span_evaluator._create_spans(tokens, tags, start_indices)
+    merged_spans = mock_span_evaluator._merge_adjacent_spans(spans, tokens)
+
+    assert [span.entity_value for span in merged_spans] == ["John Smith Jr", "Paris"]
+    assert merged_spans[0].token_start == 0
+    assert merged_spans[0].token_end == 8
+    assert merged_spans[0].normalized_tokens == ["john", "smith", "jr"]
+
+
 def test_calculate_iou_token_based():
     """Test IoU calculation with token-based evaluation."""
     span1 = Span(
@@ -955,8 +989,11 @@ def test_span_edge_cases():
     evaluator = SpanEvaluator(model=MockModel(), iou_threshold=0.5)
 
     # Test span creation with unusual tokens
-    spans = evaluator._create_spans(df, "annotation")
-    spans = evaluator._merge_adjacent_spans(spans, df)
+    tokens = df["token"].tolist()
+    spans = evaluator._create_spans(
+        tokens, df["annotation"].tolist(), df["start_indices"].tolist()
+    )
+    spans = evaluator._merge_adjacent_spans(spans, tokens)
 
     # Check that empty tokens are handled properly
     assert len(spans) == 1
@@ -969,6 +1006,414 @@ def test_span_edge_cases():
     assert result.pii_true_positives == 1
 
 
+def test_calculate_score_matches_calculate_score_on_df_for_multiple_sentences(
+    mock_span_evaluator,
+):
+    """Spans of later sentences are only merged when separated by skip words."""
+    evaluation_results = [
+        EvaluationResult(
+            tokens=["John", "lives", "in", "London"],
+            actual_tags=["PERSON", "O", "O", "LOCATION"],
+            predicted_tags=["PERSON", "O", "O", "LOCATION"],
+            start_indices=[0, 5, 11, 14],
+        ),
+        EvaluationResult(
+            tokens=["Dan", "met", "Bob"],
+            actual_tags=["PERSON", "O", "PERSON"],
+            predicted_tags=["PERSON", "O", "O"],
+            start_indices=[0, 4, 8],
+        ),
+    ]
+
+    result = mock_span_evaluator.calculate_score(evaluation_results)
+    df_result = mock_span_evaluator.calculate_score_on_df(
+        mock_span_evaluator.get_results_dataframe(evaluation_results)
+    )
+
+    assert result.pii_annotated == df_result.pii_annotated == 4
+    assert result.pii_true_positives == df_result.pii_true_positives == 3
+    assert result.results == df_result.results
+
+
+def test_merged_sentence_counts_equal_counts_on_all_sentences(mock_span_evaluator):
+    """Counting shards of sentences separately and merging gives the same result."""
+    sentences = [
+        (["John", "lives", "in", "London"], ["PERSON", "O", "O", "LOCATION"],
+         ["PERSON", "O", "O", "PERSON"], [0, 5, 11, 14]),
+        (["Dan", "met", "Bob"], ["PERSON", "O", "PERSON"], ["PERSON", "O", "O"], [0, 4, 8]),
+        (["Call", "555", "1234"], ["O", "PHONE", "PHONE"], ["O", "O", "PHONE"], [0, 5, 9]),
+    ]
+
+    full = mock_span_evaluator._count_sentences(sentences)
+    merged = mock_span_evaluator._count_sentences(sentences[:1]).merge(
+        mock_span_evaluator._count_sentences(sentences[1:])
+    )
+
+    assert merged.results == full.results
+    assert merged.pii_true_positives == full.pii_true_positives
+    assert merged.pii_false_positives == full.pii_false_positives
+    assert {ent: vars(m) for ent, m in merged.per_type.items()} == {
+        ent: vars(m) for ent, m in full.per_type.items()
+    }
+    assert [str(e) for e in merged.model_errors] == [str(e) for e in full.model_errors]
+
+
+def test_calculate_score_in_parallel_is_identical_to_serial(mock_span_evaluator):
+    """Scoring shards in a process pool gives exactly the serial result."""
+    rng = random.Random(17)
+    words = ["John", "Smith", "lives", "in", "London", ",", "the", "555", "-", "1234"]
+    entities = ["O", "O", "PERSON", "LOCATION", "PHONE_NUMBER"]
+    evaluation_results = []
+    for _ in range(200):
+        n_tokens = rng.randint(1, 15)
+        tokens = [rng.choice(words) for _ in range(n_tokens)]
+        evaluation_results.append(
+            EvaluationResult(
+                tokens=tokens,
+                actual_tags=[rng.choice(entities) for _ in range(n_tokens)],
+                predicted_tags=[rng.choice(entities) for _ in range(n_tokens)],
+                start_indices=list(range(0, 10 * n_tokens, 10)),
+            )
+        )
+
+    serial = mock_span_evaluator.calculate_score(evaluation_results)
+    parallel = mock_span_evaluator.calculate_score(evaluation_results, n_jobs=2)
+
+    assert list(parallel.results.items()) == list(serial.results.items())
+    assert {ent: vars(m) for ent, m in parallel.per_type.items()} == {
+        ent: vars(m) for ent, m in serial.per_type.items()
+    }
+    assert (parallel.pii_precision, parallel.pii_recall, parallel.pii_f) == (
+        serial.pii_precision,
+        serial.pii_recall,
+        serial.pii_f,
+    )
+    assert [str(e) for e in parallel.model_errors] == [
+        str(e) for e in serial.model_errors
+    ]
+
+
+def test_evaluate_stream_equals_evaluate_all():
+    dir_path = Path(__file__).parent
+    input_samples = InputSample.read_dataset_json(
+        Path(dir_path, "data", "generated_small.json"), length=50
+    )
+
+    evaluator = SpanEvaluator(model=FiftyFiftyIdentityTokensMockModel())
+    expected = evaluator.calculate_score(evaluator.evaluate_all(input_samples))
+
+    evaluator = SpanEvaluator(model=FiftyFiftyIdentityTokensMockModel())
+    streamed, _ = evaluator.evaluate_stream(iter(input_samples), chunk_size=8)
+
+    assert streamed.results == expected.results
+    assert streamed.pii_true_positives == expected.pii_true_positives
+    assert (streamed.pii_precision, streamed.pii_recall) == (
+        expected.pii_precision,
+        expected.pii_recall,
+    )
+    assert {ent: vars(m) for ent, m in streamed.per_type.items()} == {
+        ent: vars(m) for ent, m in expected.per_type.items()
+    }
+
+
+@pytest.mark.parametrize("matching", ["greedy", "optimal"])
+def test_calculate_score_for_thresholds_equals_calculate_score(matching):
+    rng = random.Random(20)
+    words = ["John", "Smith", "lives", "in", "New", "York", ",", "Dr", "Jr"]
+    entities = ["O", "O", "PERSON", "PERSON", "LOCATION"]
+    evaluation_results = []
+    for _ in range(100):
+        n_tokens = rng.randint(1, 12)
+        evaluation_results.append(
+            EvaluationResult(
+                tokens=[rng.choice(words) for _ in range(n_tokens)],
+                actual_tags=[rng.choice(entities) for _ in range(n_tokens)],
+                predicted_tags=[rng.choice(entities) for _ in range(n_tokens)],
+                start_indices=list(range(0, 6 * n_tokens, 6)),
+            )
+        )
+    thresholds = [0.1, 0.5, 0.9]
+
+    evaluator = SpanEvaluator(model=MockModel(), matching=matching)
+    swept = evaluator.calculate_score_for_thresholds(evaluation_results, thresholds)
+
+    for threshold in thresholds:
+        evaluator = SpanEvaluator(
+            model=MockModel(), iou_threshold=threshold, matching=matching
+        )
+        expected = evaluator.calculate_score(evaluation_results)
+        assert swept[threshold].results == expected.results
+        assert swept[threshold].pii_true_positives == expected.pii_true_positives
+        assert {ent: vars(m) for ent, m in swept[threshold].per_type.items()} == {
+            ent: vars(m) for ent, m in expected.per_type.items()
+        }
+    assert swept[0.1].pii_true_positives > swept[0.9].pii_true_positives
+
+
+def _perturbed_span_predictions(input_samples):
+    """Drop every third span and shorten every other span by two characters."""
+    predictions = {}
+    for sample in input_samples:
+        spans = []
+        for i, span in enumerate(sample.spans):
+            if i % 3 == 2:
+                continue
+            end = span.end_position - 2 if i % 2 else span.end_position
+            spans.append(
+                Span(
+                    entity_type=span.entity_type,
+                    entity_value=sample.full_text[span.start_position : end],
+                    start_position=span.start_position,
+                    end_position=end,
+                )
+            )
+        predictions[sample.full_text] = spans
+    return predictions
+
+
+@pytest.mark.parametrize("char_based", [True, False])
+def test_evaluate_spans_equals_evaluating_tags(char_based):
+    dir_path = Path(__file__).parent
+    input_samples = InputSample.read_dataset_json(
+        Path(dir_path, "data", "generated_small.json"), length=50
+    )
+    model = MockSpansModel(predictions=_perturbed_span_predictions(input_samples))
+    evaluator = SpanEvaluator(model=model, iou_threshold=0.7, char_based=char_based)
+
+    expected = evaluator.calculate_score(evaluator.evaluate_all(input_samples))
+    result = evaluator.evaluate_spans(input_samples)
+
+    assert result.results == expected.results
+    assert result.pii_true_positives == expected.pii_true_positives
+    assert result.pii_predicted == expected.pii_predicted
+    assert result.pii_annotated == expected.pii_annotated
+    assert {ent: vars(m) for ent, m in result.per_type.items()} == {
+        ent: vars(m) for ent, m in expected.per_type.items()
+    }
+    assert 0 < result.pii_recall < 1
+
+
+def test_evaluate_spans_without_normalization_uses_character_offsets(monkeypatch):
+    def tokenize(*args, **kwargs):
+        raise AssertionError("Spans should not be tokenized")
+
+    monkeypatch.setattr(
+        "presidio_evaluator.evaluation.span_evaluator.tokenize", tokenize
+    )
+    text = "Dan Smith lives in New York"
+    sample = InputSample(
+        full_text=text,
+        spans=[
+            Span("PERSON", "Dan Smith", 0, 9),
+            Span("LOCATION", "New York", 19, 27),
+        ],
+    )
+    model = MockSpansModel(
+        predictions={
+            text: [Span("PERSON", "Dan", 0, 3), Span("LOCATION", "New York", 19, 27)]
+        }
+    )
+    evaluator = SpanEvaluator(model=model, iou_threshold=0.5)
+
+    result = evaluator.evaluate_spans([sample], normalize=False)
+
+    assert result.pii_true_positives == 1
+    assert result.per_type["LOCATION"].true_positives == 1
+    assert result.per_type["PERSON"].false_negatives == 1
+    assert result.pii_precision == 0.5
+
+
+def test_evaluate_spans_filters_entities():
+    text = "Dan Smith lives in New York"
+    sample = InputSample(
+        full_text=text,
+        spans=[
+            Span("PERSON", "Dan Smith", 0, 9),
+            Span("LOCATION", "New York", 19, 27),
+        ],
+    )
+    model = MockSpansModel(predictions={text: sample.spans})
+    evaluator = SpanEvaluator(model=model)
+
+    result = evaluator.evaluate_spans([sample], entities=["PERSON"])
+
+    assert result.pii_annotated == 1
+    assert result.pii_predicted == 1
+    assert result.pii_recall == 1
+
+
+def _quadratic_best_matches(evaluator, ann_spans, pred_spans):
+    """Reference implementation: compare every annotation with every prediction."""
+    matched = set()
+    matches = []
+    for ann_span in ann_spans:
+        best_match, best_iou = None, 0.0
+        for i, pred_span in enumerate(pred_spans):
+            if i in matched:
+                continue
+            iou = evaluator.calculate_iou(
+                ann_span, pred_span, char_based=evaluator.char_based
+            )
+            if iou > best_iou:
+                best_match, best_iou = i, iou
+        if best_match is not None and best_iou >= evaluator.iou_threshold:
+            matched.add(best_match)
+        matches.append((best_match, best_iou))
+    return matches
+
+
+def _random_document_spans(rnd, number_of_spans, text_length):
+    spans = []
+    for i in range(number_of_spans):
+        start = rnd.randint(0, text_length)
+        end = start + rnd.randint(1, 20)
+        spans.append(
+            Span(
+                entity_type=rnd.choice(["PERSON", "LOCATION"]),
+                entity_value=str(i),
+                start_position=start,
+                end_position=end,
+                normalized_tokens=[str(start)],
+                normalized_start_index=start,
+                normalized_end_index=end,
+            )
+        )
+    return sorted(spans, key=lambda span: span.start_position)
+
+
+@pytest.mark.parametrize("char_based", [True, False])
+def test_match_spans_matches_quadratic_matching(char_based):
+    rnd = random.Random(0)
+    evaluator = SpanEvaluator(
+        model=MockModel(), iou_threshold=0.3, char_based=char_based
+    )
+    ann_spans = _random_document_spans(rnd, number_of_spans=200, text_length=2000)
+    pred_spans = _random_document_spans(rnd, number_of_spans=200, text_length=2000)
+
+    matches = [
+        (pred_spans.index(best_match) if best_match else None, best_iou)
+        for best_match, best_iou, _ in evaluator._match_spans(ann_spans, pred_spans)
+    ]
+
+    assert matches == _quadratic_best_matches(evaluator, ann_spans, pred_spans)
+
+
+def test_span_iou_matrix_on_padded_batch():
+    # Two sentences, the second one padded with an empty interval
+    ann_starts = np.array([[0, 10], [5, 0]])
+    ann_ends = np.array([[4, 20], [9, 0]])
+    pred_starts = np.array([[0, 15], [5, 0]])
+    pred_ends = np.array([[4, 20], [7, 0]])
+
+    iou = span_iou_matrix(ann_starts, ann_ends, pred_starts, pred_ends)
+
+    assert iou.shape == (2, 2, 2)
+    np.testing.assert_array_equal(iou[0], [[1.0, 0.0], [0.0, 0.5]])
+    np.testing.assert_array_equal(iou[1], [[0.5, 0.0], [0.0, 0.0]])
+
+
+def test_optimal_matching_maximizes_matches():
+    def span(start, end):
+        return Span(
+            entity_type="PERSON",
+            entity_value="x",
+            start_position=start,
+            end_position=end,
+            normalized_tokens=["x"],
+            normalized_start_index=start,
+            normalized_end_index=end,
+        )
+
+    # Greedy matches the first annotation with the only prediction
+    # the second annotation can match
+    ann_spans = [span(0, 10), span(4, 10)]
+    pred_spans = [span(3, 10), span(0, 5)]
+
+    greedy = SpanEvaluator(model=MockModel(), iou_threshold=0.5)
+    optimal = SpanEvaluator(model=MockModel(), iou_threshold=0.5, matching="optimal")
+
+    greedy_result = greedy._match_predictions_with_annotations(
+        ann_spans, pred_spans, EvaluationResult()
+    )
+    optimal_result = optimal._match_predictions_with_annotations(
+        ann_spans, pred_spans, EvaluationResult()
+    )
+
+    assert greedy_result.pii_true_positives == 1
+    assert optimal_result.pii_true_positives == 2
+
+
+@pytest.mark.parametrize("char_based", [True, False])
+def test_optimal_matching_per_cluster_equals_global_assignment(char_based):
+    rnd = random.Random(7)
+    threshold = 0.3
+    evaluator = SpanEvaluator(
+        model=MockModel(),
+        iou_threshold=threshold,
+        matching="optimal",
+        char_based=char_based,
+    )
+    for _ in range(50):
+        ann_spans = _random_document_spans(rnd, number_of_spans=30, text_length=200)
+        pred_spans = _random_document_spans(rnd, number_of_spans=30, text_length=200)
+
+        matches = evaluator._match_spans(ann_spans, pred_spans)
+
+        iou = np.array(
+            [
+                [
+                    SpanEvaluator.calculate_iou(ann, pred, char_based=char_based)
+                    for pred in pred_spans
+                ]
+                for ann in ann_spans
+            ]
+        )
+        weights = np.where(iou >= threshold, iou, 0.0)
+        rows, columns = linear_sum_assignment(weights, maximize=True)
+        expected_total = weights[rows, columns].sum()
+        total = sum(best_iou for _, best_iou, is_match in matches if is_match)
+        assert total == pytest.approx(expected_total)
+
+
+@pytest.mark.parametrize("matching", ["greedy", "optimal"])
+def test_match_spans_memory_grows_with_overlaps(matching):
+    rnd = random.Random(0)
+    evaluator = SpanEvaluator(model=MockModel(), iou_threshold=0.5, matching=matching)
+    ann_spans = _random_document_spans(rnd, number_of_spans=10000, text_length=100000)
+    pred_spans = _random_document_spans(rnd, number_of_spans=10000, text_length=100000)
+
+    tracemalloc.start()
+    try:
+        evaluator._match_spans(ann_spans, pred_spans)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # A dense annotations x predictions IoU matrix alone would take 800 MB
+    assert peak < 50 * 2**20
+
+
+@pytest.mark.slow
+def test_match_predictions_benchmark():
+    rnd = random.Random(0)
+    evaluator = SpanEvaluator(model=MockModel(), iou_threshold=0.5)
+    ann_spans = _random_document_spans(rnd, number_of_spans=3000, text_length=100000)
+    pred_spans = _random_document_spans(rnd, number_of_spans=3000, text_length=100000)
+
+    start_time = time.perf_counter()
+    _quadratic_best_matches(evaluator, ann_spans, pred_spans)
+    quadratic_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    evaluator._match_predictions_with_annotations(
+        ann_spans, pred_spans, EvaluationResult()
+    )
+    matrix_time = time.perf_counter() - start_time
+
+    print(f"quadratic: {quadratic_time:.4f}s, IoU matrix: {matrix_time:.4f}s")
+    assert matrix_time < quadratic_time
+
+
 # ===== Error Analysis Tests =====
 
 
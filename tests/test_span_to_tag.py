@@ -1,6 +1,18 @@
+import json
+import os
+import random
+import time
+
 import pytest
 
-from presidio_evaluator import span_to_tag, io_to_scheme
+from presidio_evaluator import (
+    span_to_tag,
+    span_to_tag_batch,
+    io_to_scheme,
+    tokenize,
+    TagRuns,
+)
+from presidio_evaluator.span_to_tag import _assign_io_tags, _handle_overlaps
 
 BILUO_SCHEME = "BILUO"
 BIO_SCHEME = "BIO"
@@ -257,3 +269,278 @@ def test_io_to_scheme(tags, expected_tags, scheme):
 # fmt: on
 
 
+
+
+def _nested_loop_io_tags(tokens, starts, ends, tags):
+    """Reference implementation: check every token against every span."""
+    io_tags = []
+    for token in tokens:
+        found = False
+        for span_index in range(0, len(starts)):
+            span_start_in_token = (
+                token.idx <= starts[span_index] <= token.idx + len(token.text)
+            )
+            span_end_in_token = (
+                token.idx <= ends[span_index] <= token.idx + len(token.text)
+            )
+            if starts[span_index] <= token.idx < ends[span_index]:
+                io_tags.append(tags[span_index])
+                found = True
+            elif span_start_in_token and span_end_in_token:
+                io_tags.append(tags[span_index])
+                found = True
+            if found:
+                break
+
+        if not found:
+            io_tags.append("O")
+    return io_tags
+
+
+def _perturbed_spans(sample, rnd):
+    """Original spans plus randomly shifted/overlapping copies to stress the sweep."""
+    starts, ends, tags, scores = [], [], [], []
+    for span in sample["spans"]:
+        for _ in range(rnd.randint(1, 3)):
+            start = max(0, span["start_position"] + rnd.randint(-3, 3))
+            end = max(start, span["end_position"] + rnd.randint(-3, 3))
+            starts.append(start)
+            ends.append(end)
+            tags.append(span["entity_type"])
+            scores.append(rnd.choice([0.3, 0.5, 0.5, 0.8]))
+    return starts, ends, tags, scores
+
+
+def test_span_to_tag_sweep_matches_nested_loop_on_synth_dataset():
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    with open(
+        os.path.join(dir_path, "..", "data", "synth_dataset_v2.json"), encoding="utf-8"
+    ) as f:
+        dataset = json.load(f)
+
+    rnd = random.Random(42)
+    for sample in dataset:
+        tokens = tokenize(sample["full_text"])
+        candidates = [
+            (
+                [span["start_position"] for span in sample["spans"]],
+                [span["end_position"] for span in sample["spans"]],
+                [span["entity_type"] for span in sample["spans"]],
+                [0.5 for _ in sample["spans"]],
+            ),
+            _perturbed_spans(sample, rnd),
+        ]
+        for starts, ends, tags, scores in candidates:
+            starts, ends, tags, scores = _handle_overlaps(starts, ends, tags, scores)
+            expected = _nested_loop_io_tags(tokens, starts, ends, tags)
+            assert _assign_io_tags(tokens, starts, ends, tags) == expected
+
+
+def test_span_to_tag_batch_simple():
+    text = "My name is Josh or David"
+    tokens = tokenize(text)
+    token_starts = [token.idx for token in tokens] * 2
+    token_ends = [token.idx + len(token) for token in tokens] * 2
+
+    tags = span_to_tag_batch(
+        BILUO_SCHEME,
+        token_starts=token_starts,
+        token_ends=token_ends,
+        token_offsets=[0, len(tokens), 2 * len(tokens)],
+        starts=[11, 19, 11],
+        ends=[15, 26, 18],
+        tags=["NAME", "NAME", "NAME"],
+        span_offsets=[0, 2, 3],
+    )
+
+    assert tags == [
+        ["O", "O", "O", "U-NAME", "O", "U-NAME"],
+        ["O", "O", "O", "B-NAME", "L-NAME", "O"],
+    ]
+
+
+@pytest.mark.parametrize("scheme", [IO_SCHEME, BIO_SCHEME, BILUO_SCHEME])
+def test_span_to_tag_batch_matches_span_to_tag_on_synth_dataset(scheme):
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    with open(
+        os.path.join(dir_path, "..", "data", "synth_dataset_v2.json"), encoding="utf-8"
+    ) as f:
+        dataset = json.load(f)
+
+    rnd = random.Random(1)
+    token_starts, token_ends, token_offsets = [], [], [0]
+    starts, ends, tags, scores, span_offsets = [], [], [], [], [0]
+    expected = []
+    for sample in dataset:
+        tokens = tokenize(sample["full_text"])
+        sample_starts, sample_ends, sample_tags, sample_scores = _perturbed_spans(
+            sample, rnd
+        )
+        expected.append(
+            span_to_tag(
+                scheme,
+                sample["full_text"],
+                list(sample_starts),
+                list(sample_ends),
+                list(sample_tags),
+                list(sample_scores),
+                tokens=tokens,
+            )
+        )
+
+        token_starts.extend(token.idx for token in tokens)
+        token_ends.extend(token.idx + len(token) for token in tokens)
+        token_offsets.append(len(token_starts))
+        starts.extend(sample_starts)
+        ends.extend(sample_ends)
+        tags.extend(sample_tags)
+        scores.extend(sample_scores)
+        span_offsets.append(len(starts))
+
+    actual = span_to_tag_batch(
+        scheme,
+        token_starts=token_starts,
+        token_ends=token_ends,
+        token_offsets=token_offsets,
+        starts=starts,
+        ends=ends,
+        tags=tags,
+        span_offsets=span_offsets,
+        scores=scores,
+    )
+    assert actual == expected
+
+
+def _quadratic_handle_overlaps(start, end, tag, score):
+    """Reference implementation: previous pairwise overlap resolution."""
+
+    def _sort(start, end, tag, score):
+        if len(start) > 0:
+            tpl = sorted(zip(start, end, tag, score), key=lambda pair: pair[0])
+            start, end, tag, score = [[x[i] for x in tpl] for i in range(4)]
+        return start, end, tag, score
+
+    start, end, tag, score = _sort(start, end, tag, score)
+    number_of_spans = len(start)
+    i = 0
+    while i < number_of_spans - 1:
+        for j in range(i + 1, number_of_spans):
+            if start[i] <= start[j] <= end[i]:
+                if score[i] > score[j]:
+                    if start[i] <= end[j] <= end[i]:
+                        score[j] = 0
+                    else:
+                        start[j] = end[i] + 1
+                else:
+                    if end[j] < end[i]:
+                        start.append(end[j] + 1)
+                        end.append(end[i])
+                        score.append(score[i])
+                        tag.append(tag[i])
+                        number_of_spans += 1
+                        end[i] = start[j] - 1
+                    else:
+                        end[i] = start[j] - 1
+        i += 1
+    return _sort(start, end, tag, score)
+
+
+def _segmentation(starts, ends, tags, scores):
+    """The (tag, score) owning each position, ignoring removed or empty spans."""
+    owners = {}
+    for start, end, tag, score in zip(starts, ends, tags, scores):
+        if score == 0:
+            continue
+        for position in range(start, end + 1):
+            assert position not in owners, "resolved spans should not overlap"
+            owners[position] = (tag, score)
+    return owners
+
+
+def _random_spans(rnd, number_of_spans, text_length=30):
+    starts, ends, tags, scores = [], [], [], []
+    for _ in range(number_of_spans):
+        start = rnd.randint(0, text_length)
+        starts.append(start)
+        ends.append(rnd.randint(start, text_length))
+        tags.append(rnd.choice(["A", "B", "C"]))
+        scores.append(rnd.choice([0.3, 0.5, 0.85, 1.0]))
+    return starts, ends, tags, scores
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_handle_overlaps_matches_quadratic_resolution_for_pairs(seed):
+    rnd = random.Random(seed)
+    for _ in range(500):
+        spans = _random_spans(rnd, number_of_spans=2)
+        expected = _quadratic_handle_overlaps(*[list(x) for x in spans])
+        actual = _handle_overlaps(*[list(x) for x in spans])
+        assert _segmentation(*actual) == _segmentation(*expected)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_handle_overlaps_gives_each_position_to_highest_score(seed):
+    rnd = random.Random(seed)
+    for _ in range(500):
+        starts, ends, tags, scores = _random_spans(rnd, rnd.randint(0, 8))
+        # spans sorted by start, ties are won by the span starting later
+        ranked = sorted(
+            zip(starts, ends, tags, scores), key=lambda span: span[0]
+        )
+        expected = {}
+        for position in range(31):
+            covering = [
+                (score, rank, tag)
+                for rank, (start, end, tag, score) in enumerate(ranked)
+                if start <= position <= end
+            ]
+            if covering:
+                score, _, tag = max(covering)
+                expected[position] = (tag, score)
+
+        resolved = _handle_overlaps(starts, ends, tags, scores)
+        assert resolved[0] == sorted(resolved[0])
+        assert _segmentation(*resolved) == expected
+
+
+@pytest.mark.slow
+def test_handle_overlaps_benchmark():
+    rnd = random.Random(0)
+    spans = _random_spans(rnd, number_of_spans=2000, text_length=20000)
+
+    start_time = time.perf_counter()
+    _quadratic_handle_overlaps(*[list(x) for x in spans])
+    quadratic_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    _handle_overlaps(*[list(x) for x in spans])
+    sweep_time = time.perf_counter() - start_time
+
+    print(f"quadratic: {quadratic_time:.4f}s, sweep: {sweep_time:.4f}s")
+    assert sweep_time < quadratic_time
+
+
+# fmt: off
+@pytest.mark.parametrize(
+    "tags, scheme, expected_tags",
+    [
+        (["O", "B-name", "I-name", "L-name", "U-phone"], "BIO", ["O", "B-name", "I-name", "I-name", "B-phone"]),
+        (["B-name", "I-name", "B-name", "O"], "BILUO", ["B-name", "L-name", "U-name", "O"]),
+        (["U-name", "U-name"], "BIO", ["B-name", "B-name"]),
+        (["U-name", "U-name"], "IO", ["name", "name"]),
+        (["name", "name", "O", "phone"], "BILUO", ["B-name", "L-name", "O", "U-phone"]),
+        ([], "BIO", []),
+    ],
+)
+def test_tag_runs_round_trip(tags, scheme, expected_tags):
+    runs = TagRuns.from_tags(tags)
+    assert len(runs) == len(tags)
+    assert runs.to_tags(scheme) == expected_tags
+# fmt: on
+
+
+def test_tag_runs_ignore_prefixes_merges_adjacent_entities():
+    runs = TagRuns.from_tags(["U-name", "B-name", "L-name"], ignore_prefixes=True)
+    assert runs.starts == [0]
+    assert runs.lengths == [3]
+    assert runs.to_tags("BILUO") == ["B-name", "I-name", "L-name"]
@@ -1,4 +1,5 @@
 from collections import Counter
+from itertools import permutations
 
 import numpy as np
 import pytest
@@ -246,6 +247,36 @@ def test_dataset_to_metric_50_50_model():
     assert metrics.pii_recall > 0.25
 
 
+def test_evaluate_stream_equals_evaluate_all():
+    import os
+
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    input_samples = InputSample.read_dataset_json(
+        "{}/data/generated_small.json".format(dir_path), length=100
+    )
+
+    evaluator = TokenEvaluator(model=FiftyFiftyIdentityTokensMockModel())
+    expected = evaluator.calculate_score(evaluator.evaluate_all(input_samples))
+
+    evaluator = TokenEvaluator(model=FiftyFiftyIdentityTokensMockModel())
+    streamed, kept_samples = evaluator.evaluate_stream(
+        (sample for sample in input_samples), chunk_size=7, n_samples_to_keep=5
+    )
+
+    assert streamed.results == expected.results
+    assert streamed.entity_recall_dict == expected.entity_recall_dict
+    assert streamed.entity_precision_dict == expected.entity_precision_dict
+    assert (streamed.pii_precision, streamed.pii_recall) == (
+        expected.pii_precision,
+        expected.pii_recall,
+    )
+    assert [str(e) for e in streamed.model_errors] == [
+        str(e) for e in expected.model_errors
+    ]
+    assert len(kept_samples) == 5
+    assert all(sample.tokens for sample in kept_samples)
+
+
 @pytest.mark.parametrize(
     "tokens, tags, predicted_tags, precision, recall",
     [
@@ -302,6 +333,44 @@ def test_skip_words_are_not_counted_as_errors(
 
 
 
+def test_negative_counts_of_a_sample_do_not_cancel_other_samples():
+    # Reverting a skip word predicted as a generic entity leaves a negative count
+    reverted = EvaluationResult(
+        Counter({("PERSON", "PERSON"): 1, ("PERSON", "PII"): -1, ("O", "O"): 2})
+    )
+    other = EvaluationResult(Counter({("PERSON", "PII"): 1, ("O", "O"): 3}))
+
+    evaluator = TokenEvaluator(model=MockTokensModel(prediction=None))
+    score = evaluator.calculate_score([other, reverted])
+    streamed = evaluator._score_counts(
+        evaluator._count_sample(other) + evaluator._count_sample(reverted), beta=2
+    )
+
+    expected = Counter({("PERSON", "PERSON"): 1, ("PERSON", "PII"): 1, ("O", "O"): 5})
+    assert score.results == streamed.results == expected
+    assert score.n_dict["PERSON"] == 2
+
+
+def test_merged_counts_are_independent_of_sample_order():
+    samples = [
+        EvaluationResult(
+            Counter({("PERSON", "PERSON"): 1, ("PERSON", "PII"): -1, ("O", "O"): 2})
+        ),
+        EvaluationResult(Counter({("PERSON", "PII"): 1, ("O", "O"): 3})),
+        EvaluationResult(Counter({("PERSON", "PII"): 2, ("O", "PERSON"): -1})),
+    ]
+
+    evaluator = TokenEvaluator(model=MockTokensModel(prediction=None))
+    scores = [
+        evaluator.calculate_score(list(ordered)) for ordered in permutations(samples)
+    ]
+
+    assert all(score.results == scores[0].results for score in scores)
+    assert scores[0].results == Counter(
+        {("PERSON", "PERSON"): 1, ("PERSON", "PII"): 3, ("O", "O"): 5}
+    )
+
+
 def test_results_to_dataframe():
     prediction = ["O", "EMAIL", "PHONE", "LOCATION", "PERSON"]
     tokens = ["John", "details", "john@mail.com", "123-456-7890", "today"]
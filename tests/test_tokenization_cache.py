@@ -0,0 +1,104 @@
+import gc
+import weakref
+from pathlib import Path
+
+import pytest
+import spacy
+
+from presidio_evaluator import (
+    InputSample,
+    TokenizationCache,
+    set_tokenization_cache,
+    tokenize,
+)
+from presidio_evaluator.span_to_tag import get_spacy
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = set_tokenization_cache(tmp_path / "cache")
+    yield cache
+    set_tokenization_cache(None)
+
+
+def test_tokenize_uses_cache(cache):
+    text = "Dan Smith lives in Paris, France."
+
+    first = tokenize(text)
+    cache.flush()
+    second = tokenize(text)
+
+    assert cache.misses == 1
+    assert cache.hits == 1
+    assert [token.text for token in second] == [token.text for token in first]
+    assert [token.idx for token in second] == [token.idx for token in first]
+
+
+def test_read_dataset_json_hits_cache_on_second_read(cache):
+    path = Path(__file__).parent / "data" / "generated_small.json"
+
+    first = InputSample.read_dataset_json(path)
+    # Simulate a new process by reading the shards from disk
+    reloaded = set_tokenization_cache(TokenizationCache(cache.cache_dir))
+    second = InputSample.read_dataset_json(path)
+
+    assert reloaded.misses == 0
+    assert reloaded.hits == len(first)
+    for record, expected in zip(second, first):
+        assert record.tags == expected.tags
+        assert record.start_indices == expected.start_indices
+
+
+def test_stale_spacy_version_is_removed(tmp_path):
+    stale_dir = tmp_path / "en_core_web_sm-spacy0.0.0"
+    stale_dir.mkdir()
+
+    cache = TokenizationCache(tmp_path)
+    nlp = get_spacy()
+    doc = nlp.make_doc("My name is Dan")
+    cache.put(doc.text, doc, model_version="en_core_web_sm")
+    cache.flush()
+
+    assert not stale_dir.exists()
+    assert (tmp_path / f"en_core_web_sm-spacy{spacy.__version__}").exists()
+
+
+def test_evicts_least_recently_used_shards(tmp_path):
+    cache = TokenizationCache(tmp_path, max_size_bytes=None, shard_size=1)
+    nlp = get_spacy()
+    texts = [f"Sample number {i} in the cache" for i in range(5)]
+    for text in texts:
+        cache.put(text, nlp.make_doc(text), model_version="en_core_web_sm")
+
+    shard_size = next(tmp_path.glob("*/*.spacy")).stat().st_size
+    cache.max_size_bytes = 2 * shard_size
+    cache._evict()
+
+    assert len(list(tmp_path.glob("*/*.spacy"))) <= 2
+    assert cache.get(texts[0], "en_core_web_sm", nlp.vocab) is None
+    assert cache.get(texts[-1], "en_core_web_sm", nlp.vocab) is not None
+
+
+def test_cached_docs_are_copies(tmp_path):
+    cache = TokenizationCache(tmp_path)
+    nlp = spacy.blank("en")
+    doc = nlp.make_doc("My name is Dan")
+    cache.put(doc.text, doc, model_version="blank")
+    doc[3].tag_ = "NNP"
+
+    first = cache.get(doc.text, "blank", nlp.vocab)
+    first[3].tag_ = "NN"
+    second = cache.get(doc.text, "blank", nlp.vocab)
+
+    assert first is not second
+    assert not second.has_annotation("TAG")
+
+
+def test_caches_are_not_kept_alive(tmp_path):
+    cache = TokenizationCache(tmp_path)
+    cache_ref = weakref.ref(cache)
+
+    del cache
+    gc.collect()
+
+    assert cache_ref() is None